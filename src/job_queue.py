@@ -0,0 +1,374 @@
+# src/job_queue.py
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+# -------------------------
+# Settings
+# -------------------------
+DEFAULT_DB_PATH = os.path.join(tempfile.gettempdir(), "make_task_ai_jobs.sqlite3")
+DEFAULT_WORKERS = 2
+LEASE_S = 30.0  # running のジョブはこの間隔で lease を延長する。切れたら（プロセスが死んだ）別ワーカーが拾い直す
+HEARTBEAT_S = 1.0  # lease 延長と cancel 要求の確認間隔
+MAX_ATTEMPTS = 3  # lease 切れで拾い直すのはここまで（毎回プロセスを落とすジョブは failed にする）
+RETAIN_S = 7 * 24 * 3600.0  # 終わったジョブを残す期間
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE = (QUEUED, RUNNING)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload_key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    partial TEXT,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    lease_until REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+-- 同じ payload の queued / running は1件だけ（submit の重複排除をDB側でも保証する）
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_active_payload ON jobs(payload_key) WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs(status, created_at);
+"""
+
+
+class JobCancelled(RuntimeError):
+    """runner が cancel 要求を見て途中で抜けるときに投げる"""
+
+
+def payload_key(kind: str, payload: Dict[str, Any]) -> str:
+    body = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{kind}\x00{body}".encode("utf-8")).hexdigest()
+
+
+class JobContext:
+    """
+    runner に渡す実行中ジョブのハンドル
+    - set_partial(obj): 途中結果を保存（GET /jobs/{id} の partial）
+    - cancelled: cancel 要求で set される Event（ノードの切れ目などで見る）
+    - on_cancel(fn): cancel 要求時に呼ぶ（サブプロセスの kill など、ブロック中の処理を止める用）
+    attempt は claim した時の attempts。DB への書き込みはこの claim が生きている間だけ効く
+    """
+
+    def __init__(self, queue: "JobQueue", job_id: str, kind: str, payload: Dict[str, Any], *, attempt: int = 0) -> None:
+        self.queue = queue
+        self.id = job_id
+        self.kind = kind
+        self.payload = payload
+        self.attempt = int(attempt)
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+
+    def set_partial(self, partial: Dict[str, Any]) -> None:
+        self.queue._set_partial(self, partial)
+
+    def on_cancel(self, fn: Callable[[], None]) -> None:
+        with self._lock:
+            self._callbacks.append(fn)
+            fire = self.cancelled.is_set()
+        if fire:
+            fn()
+
+    def check(self) -> None:
+        if self.cancelled.is_set():
+            raise JobCancelled(f"job {self.id} cancelled")
+
+    def _cancel(self) -> None:
+        with self._lock:
+            if self.cancelled.is_set():
+                return
+            self.cancelled.set()
+            callbacks = list(self._callbacks)
+        for fn in callbacks:
+            try:
+                fn()
+            except Exception:
+                pass
+
+
+Runner = Callable[[JobContext], Dict[str, Any]]
+
+
+class JobQueue:
+    """
+    SQLite に置く永続ジョブキュー + 上限付きワーカープール（外部サービス不要）
+    - submit: 同じ (kind, payload) の queued / running があればそれを返す（重複排除）
+    - ワーカーは queued を古い順に claim して runners[kind](ctx) を実行し、結果を done / failed で残す
+    - running の間は lease を延長し続ける。再起動などで lease が切れたジョブは次に起動したワーカーが拾い直す
+    - cancel: queued はその場で cancelled、running は cancel_requested を立てて runner に伝える（別プロセスからでも効く）
+    """
+
+    def __init__(self, path: str = DEFAULT_DB_PATH, *, runners: Dict[str, Runner], workers: int = DEFAULT_WORKERS) -> None:
+        self.path = path
+        self.runners = dict(runners)
+        self.workers = max(1, int(workers))
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._running: Dict[str, JobContext] = {}
+        self._running_lock = threading.Lock()
+        d = os.path.dirname(os.path.abspath(path))
+        os.makedirs(d, exist_ok=True)
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    # -------------------------
+    # DB
+    # -------------------------
+    @contextmanager
+    def _conn(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _tx(self) -> Iterator[sqlite3.Connection]:
+        # BEGIN IMMEDIATE: claim / submit の読み→書きを他プロセスと直列化する
+        with self._conn() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _row(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "job_id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "cancel_requested": bool(row["cancel_requested"]),
+            "attempts": int(row["attempts"]),
+            "partial": json.loads(row["partial"]) if row["partial"] else None,
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+        }
+
+    # -------------------------
+    # API
+    # -------------------------
+    def submit(self, kind: str, payload: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """(job, deduplicated) を返す"""
+        if kind not in self.runners:
+            raise ValueError(f"unknown job kind: {kind}")
+        key = payload_key(kind, payload)
+        with self._tx() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE payload_key = ? AND status IN (?, ?)", (key, *ACTIVE)
+            ).fetchone()
+            if row is not None:
+                return self._row(row), True
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, kind, payload_key, payload, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, key, json.dumps(payload, ensure_ascii=False), QUEUED, time.time()),
+            )
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        self._wake.set()
+        return self._row(row), False
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._conn() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row) if row is not None else None
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._tx() as conn:
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row["status"] == QUEUED:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, cancel_requested = 1, finished_at = ? WHERE id = ?",
+                    (CANCELLED, time.time(), job_id),
+                )
+            elif row["status"] == RUNNING:
+                conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+        with self._running_lock:
+            ctx = self._running.get(job_id)
+        if ctx is not None:
+            ctx._cancel()
+        return self.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._conn() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        with self._running_lock:
+            here = len(self._running)
+        return {"workers": self.workers, "running_here": here, "by_status": {r["status"]: int(r["n"]) for r in rows}}
+
+    # -------------------------
+    # Workers
+    # -------------------------
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._stop.clear()
+        self._purge()
+        for n in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"job-worker-{n}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        t = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    def stop(self, *, timeout: float = 5.0) -> None:
+        # 実行中のジョブは止めない（lease が切れたら次の起動で拾い直される）
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout=timeout)
+        self._threads = []
+
+    def _purge(self) -> None:
+        with self._conn() as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?, ?) AND finished_at < ?",
+                (DONE, FAILED, CANCELLED, time.time() - RETAIN_S),
+            )
+
+    def _claim(self) -> Optional[JobContext]:
+        now = time.time()
+        with self._tx() as conn:
+            # lease 切れの running は前のワーカー（プロセス）が死んだもの
+            for row in conn.execute(
+                "SELECT id FROM jobs WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                (RUNNING, now, MAX_ATTEMPTS),
+            ).fetchall():
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                    (FAILED, f"abandoned after {MAX_ATTEMPTS} attempts", now, row["id"]),
+                )
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? OR (status = ? AND lease_until < ?) ORDER BY created_at LIMIT 1",
+                (QUEUED, RUNNING, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_until = ?, started_at = ? WHERE id = ?",
+                (RUNNING, now + LEASE_S, now, row["id"]),
+            )
+        ctx = JobContext(self, row["id"], row["kind"], json.loads(row["payload"]), attempt=int(row["attempts"]) + 1)
+        if row["cancel_requested"]:
+            ctx._cancel()
+        return ctx
+
+    # 書き込みは自分の claim（running かつ attempts が claim 時のまま）にだけ効かせる。
+    # lease 切れで別ワーカーが拾い直した / abandoned で failed になったジョブを、遅れて終わった前の実行が上書きしない
+    _OWNED = "id = ? AND status = 'running' AND attempts = ?"
+
+    def _finish(
+        self, ctx: JobContext, status: str, *, result: Optional[Dict[str, Any]] = None, error: str = ""
+    ) -> bool:
+        with self._conn() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_until = 0 "
+                f"WHERE {self._OWNED}",
+                (
+                    status,
+                    json.dumps(result, ensure_ascii=False) if result is not None else None,
+                    error or None,
+                    time.time(),
+                    ctx.id,
+                    ctx.attempt,
+                ),
+            )
+        return cur.rowcount > 0
+
+    def _set_partial(self, ctx: JobContext, partial: Dict[str, Any]) -> None:
+        with self._conn() as conn:
+            conn.execute(
+                f"UPDATE jobs SET partial = ? WHERE {self._OWNED}",
+                (json.dumps(partial, ensure_ascii=False), ctx.id, ctx.attempt),
+            )
+
+    def _worker(self) -> None:
+        while not self._stop.is_set():
+            try:
+                ctx = self._claim()
+            except sqlite3.Error:
+                ctx = None
+            if ctx is None:
+                self._wake.wait(HEARTBEAT_S)
+                self._wake.clear()
+                continue
+            with self._running_lock:
+                self._running[ctx.id] = ctx
+            try:
+                ctx.check()
+                result = self.runners[ctx.kind](ctx)
+                ctx.check()
+                self._finish(ctx, DONE, result=result)
+            except JobCancelled:
+                self._finish(ctx, CANCELLED)
+            except Exception as e:
+                # cancel で kill したサブプロセスの失敗は cancelled 扱い
+                if ctx.cancelled.is_set():
+                    self._finish(ctx, CANCELLED)
+                else:
+                    self._finish(ctx, FAILED, error=f"{type(e).__name__}: {e}")
+            finally:
+                with self._running_lock:
+                    self._running.pop(ctx.id, None)
+
+    def _heartbeat(self) -> None:
+        # このプロセスで実行中のジョブの lease を延長し、別プロセスからの cancel 要求を runner に伝える
+        while not self._stop.wait(HEARTBEAT_S):
+            with self._running_lock:
+                running = dict(self._running)
+            if not running:
+                continue
+            marks = ",".join("?" for _ in running)
+            lost: List[JobContext] = []
+            try:
+                with self._conn() as conn:
+                    until = time.time() + LEASE_S
+                    for ctx in running.values():
+                        cur = conn.execute(
+                            f"UPDATE jobs SET lease_until = ? WHERE {self._OWNED}", (until, ctx.id, ctx.attempt)
+                        )
+                        if cur.rowcount == 0:
+                            lost.append(ctx)
+                    rows = conn.execute(
+                        f"SELECT id FROM jobs WHERE cancel_requested = 1 AND id IN ({marks})", tuple(running)
+                    ).fetchall()
+            except sqlite3.Error:
+                continue
+            # claim を失った実行（別ワーカーが拾い直した / 終わった）は止める。結果は _finish で捨てられる
+            for ctx in lost:
+                ctx._cancel()
+            for row in rows:
+                running[row["id"]]._cancel()
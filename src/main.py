@@ -1,10 +1,13 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional, Any, Dict
+from typing import List, Optional, Any, Callable, Dict, Iterator, Tuple
 import os
 import json
 import subprocess
 import tempfile
+import threading
 
 # story_refinement 側の型
 from src.story_refinement.services.schemas.user_story import UserStory
@@ -14,9 +17,21 @@ from src.story_refinement.services.schemas.us_ac_response import UserStoryAccept
 # workflow 本体（あなたが作ったやつ）
 from src.story_refinement.workflow import build_refinement_workflow, TARGET_SCORE, MAX_ITERATIONS
 from src.story_refinement.output_log import WorkflowLogger
+from src.story_refinement.services.classifier_ai import PERSONA_CACHE
 
+# /jobs の永続キュー
+from src.job_queue import DEFAULT_DB_PATH, DEFAULT_WORKERS, JobContext, JobQueue
 
-app = FastAPI(title="make-task-AI API", version="0.1.0")
+
+@asynccontextmanager
+async def _lifespan(_app: FastAPI):
+    # 起動時にワーカーを立てる（前回のプロセスが残した queued / lease 切れの running もここから再開）
+    jobs = _job_queue()
+    yield
+    jobs.stop()
+
+
+app = FastAPI(title="make-task-AI API", version="0.1.0", lifespan=_lifespan)
 
 
 # -------------------------
@@ -35,6 +50,27 @@ class TasksResponse(BaseModel):
     meta: Optional[Dict[str, Any]] = None
 
 
+class TaskOptions(BaseModel):
+    # /tasks のクエリパラメータと同じ
+    taskgen_mode: str = "full"
+    dedup_acs: bool = False
+    dedup_tasks: bool = False
+    deadline_s: float = 0.0
+    policy_mode: str = "fixed"
+
+
+class JobRequest(BaseModel):
+    kind: str  # "tasks" | "refine"
+    story: FlatUSAC
+    options: TaskOptions = Field(default_factory=TaskOptions)  # kind=tasks のときだけ使う
+
+
+class DescribeTaskRequest(BaseModel):
+    story: FlatUSAC
+    task: Dict[str, Any]
+    model: str = "gpt-4o-mini"
+
+
 # -------------------------
 # Utils
 # -------------------------
@@ -62,19 +98,9 @@ def to_flat_dict(usac: UserStoryAcceptanceCriteria) -> Dict[str, Any]:
     }
 
 
-# -------------------------
-# Endpoints
-# -------------------------
-@app.get("/health")
-def health():
-    return {"ok": True}
-
-
-@app.post("/refine", response_model=FlatUSAC)
-def refine(payload: FlatUSAC):
+def _new_refine_run(payload: FlatUSAC) -> Tuple[WorkflowLogger, Dict[str, Any], Any, str]:
     """
-    入力US/AC(フラット) → story_refinement workflow → refined(フラット)を返す
-    out_refined.json も history_log2 に保存
+    /refine と /refine/stream 共通: logger / 初期 state / compile 済みグラフ / out_refined.json のパス
     """
     # workflow logger（API用に毎回作る）
     logger = WorkflowLogger(log_dir="history_log2", max_files=5)
@@ -86,6 +112,7 @@ def refine(payload: FlatUSAC):
     initial_state = {
         "us_ac": initial_us_ac,
         "score": None,
+        "persona_scores": None,
         "expert_feedback_text": None,
         "issues": None,
         "iteration": 0,
@@ -101,6 +128,269 @@ def refine(payload: FlatUSAC):
         "out_refined.json",
     )
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    return logger, initial_state, app_graph, out_path
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _refine_updates(payload: FlatUSAC) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    LangGraph のノード更新（stream_mode="updates"）を (event, data) に変換する
+      classifier      -> score    （全体 score と専門家ごとの score / reason）
+      issue_detection -> issues
+      suggestion      -> refined  （このラウンドの US/AC。フラット）
+      最後に done（最終 US/AC）。途中で close されたらグラフも止まる
+    """
+    logger, initial_state, app_graph, out_path = _new_refine_run(payload)
+    yield "start", {"target_score": TARGET_SCORE, "max_iterations": MAX_ITERATIONS}
+
+    state = dict(initial_state)
+    try:
+        for update in app_graph.stream(initial_state, stream_mode="updates"):
+            for node, node_state in update.items():
+                state.update(node_state or {})
+                if node == "classifier":
+                    yield "score", {
+                        "iteration": state["iteration"],
+                        "score": state["score"],
+                        "persona_scores": state.get("persona_scores") or [],
+                    }
+                elif node == "issue_detection":
+                    yield "issues", {"iteration": state["iteration"], "issues": state.get("issues") or []}
+                elif node == "suggestion":
+                    # suggestion_node が iteration を進めるので、同じラウンドの score / issues と揃える
+                    yield "refined", {"iteration": state["iteration"] - 1, "us_ac": to_flat_dict(state["us_ac"])}
+
+        # out_refined.json に保存（フラット）
+        refined_flat = to_flat_dict(state["us_ac"])
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(refined_flat, f, ensure_ascii=False, indent=2)
+        yield "done", {"score": state["score"], "iterations": state["iteration"], "us_ac": refined_flat}
+
+    except Exception as e:
+        yield "error", {"detail": f"refine failed: {e}"}
+
+    finally:
+        logger.set_cache_stats(PERSONA_CACHE.stats())
+        logger.save()
+
+
+def _refine_events(payload: FlatUSAC) -> Iterator[str]:
+    # /refine/stream: 切断されるとこの generator が close され、_refine_updates 側も止まる
+    for event, data in _refine_updates(payload):
+        yield _sse(event, data)
+
+
+def _remove_quietly(*paths: Optional[str]) -> None:
+    for path in paths:
+        try:
+            if path and os.path.exists(path):
+                os.remove(path)
+        except Exception:
+            pass
+
+
+def _check_task_options(options: TaskOptions) -> None:
+    if options.taskgen_mode not in ("full", "two_phase", "skeleton"):
+        raise HTTPException(status_code=422, detail=f"unknown taskgen_mode: {options.taskgen_mode}")
+    if options.policy_mode not in ("fixed", "throughput"):
+        raise HTTPException(status_code=422, detail=f"unknown policy_mode: {options.policy_mode}")
+
+
+def _task_planning_io(payload: FlatUSAC) -> Tuple[str, str]:
+    # 入力を一時ファイルに保存し、出力先（一時ファイルパスだけ）を用意する
+    with tempfile.NamedTemporaryFile(mode="w", delete=False, suffix=".json", encoding="utf-8") as f_in:
+        json.dump(payload.model_dump(), f_in, ensure_ascii=False, indent=2)
+        in_path = f_in.name
+    fd, out_path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    return in_path, out_path
+
+
+def _task_planning_cmd(in_path: str, out_path: str, options: TaskOptions) -> List[str]:
+    # もし export-mode 等が必要ならここに引数追加できる
+    cmd = [
+        "python3",
+        "-u",
+        "-m",
+        "src.task_planning.run",
+        "-i",
+        in_path,
+        "-o",
+        out_path,
+        "--taskgen-mode",
+        options.taskgen_mode,
+    ]
+    if options.dedup_acs:
+        cmd.append("--dedup-acs")
+    if options.dedup_tasks:
+        cmd.append("--dedup-tasks")
+    if options.deadline_s > 0:
+        cmd += ["--deadline", str(float(options.deadline_s))]
+    if options.policy_mode != "fixed":
+        cmd += ["--policy-mode", options.policy_mode]
+    # ストーリー横断のタスクテンプレ（リクエスト間で共有。パスは環境変数で指定）
+    if os.environ.get("TASK_TEMPLATE_STORE"):
+        cmd += ["--template-store", os.environ["TASK_TEMPLATE_STORE"]]
+    # LLM 呼び出しの hedging（tail latency 対策。追加コストがあるので環境変数で opt-in）
+    if os.environ.get("TASK_LLM_HEDGE") == "1":
+        cmd.append("--hedge")
+    return cmd
+
+
+def _stream_task_planning(
+    cmd: List[str],
+    *,
+    deadline_s: float,
+    tmp_paths: List[str],
+    on_start: Optional[Callable[[subprocess.Popen], None]] = None,
+) -> Iterator[str]:
+    """
+    task_planning CLI を --stream で起動し、NDJSON のイベント行をそのまま流す
+    （grouping → 完了したグループ順 → done。ヘッダ送信後なので失敗は error イベントで返す）
+    on_start には起動したプロセスを渡す（/jobs の cancel で kill する用）
+    """
+    stderr = tempfile.TemporaryFile(mode="w+", encoding="utf-8")
+    proc = subprocess.Popen(cmd + ["--stream"], stdout=subprocess.PIPE, stderr=stderr, text=True, encoding="utf-8")
+    if on_start is not None:
+        on_start(proc)
+    timed_out = threading.Event()
+
+    def _kill() -> None:
+        timed_out.set()
+        proc.kill()
+
+    # 締め切り付きでも CLI 自体が返ってこない場合の保険（非ストリームの timeout と同じ）
+    timer = threading.Timer(deadline_s + 30.0, _kill) if deadline_s > 0 else None
+    if timer is not None:
+        timer.start()
+    try:
+        assert proc.stdout is not None
+        for line in proc.stdout:
+            if line.strip():
+                yield line
+        returncode = proc.wait()
+        if returncode != 0:
+            stderr.seek(0)
+            message = (
+                f"task_planning exceeded deadline_s={deadline_s}" if timed_out.is_set() else "task_planning failed"
+            )
+            event = {"event": "error", "message": message, "returncode": returncode, "stderr": stderr.read()[-4000:]}
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+    finally:
+        if timer is not None:
+            timer.cancel()
+        # クライアントが途中で切断した場合も CLI を止める
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        stderr.close()
+        _remove_quietly(*tmp_paths)
+
+
+# -------------------------
+# Jobs (POST /jobs の実行本体。JobQueue のワーカースレッドで動く)
+# -------------------------
+_jobs: Optional[JobQueue] = None
+_jobs_lock = threading.Lock()
+
+
+def _run_tasks_job(ctx: JobContext) -> Dict[str, Any]:
+    """
+    /tasks?stream=true と同じ CLI 実行。イベントごとに partial（grouping と完了済みグループ）を更新し、
+    結果は /tasks と同じ出力 JSON
+    """
+    payload = FlatUSAC(**ctx.payload["story"])
+    options = TaskOptions(**ctx.payload["options"])
+    in_path, out_path = _task_planning_io(payload)
+    partial: Dict[str, Any] = {"grouping": None, "group_results": [], "groups_done": 0}
+    done: Dict[int, Dict[str, Any]] = {}
+    try:
+        lines = _stream_task_planning(
+            _task_planning_cmd(in_path, out_path, options),
+            deadline_s=options.deadline_s,
+            tmp_paths=[in_path, out_path + ".ckpt.jsonl"],
+            on_start=lambda proc: ctx.on_cancel(proc.kill),
+        )
+        for line in lines:
+            event = json.loads(line)
+            if event["event"] == "error":
+                raise RuntimeError(f"{event['message']}: {event.get('stderr', '')[-1000:]}")
+            if event["event"] == "grouping":
+                partial["grouping"] = event["grouping"]
+            elif event["event"] == "group":
+                done[int(event["index"])] = event["group_result"]
+            else:
+                continue
+            n_groups = len((partial["grouping"] or {}).get("groups") or [])
+            partial["group_results"] = [done.get(k) for k in range(max(n_groups, len(done)))]
+            partial["groups_done"] = len(done)
+            ctx.set_partial(partial)
+        ctx.check()
+        with open(out_path, encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        _remove_quietly(out_path)
+
+
+def _run_refine_job(ctx: JobContext) -> Dict[str, Any]:
+    """
+    /refine/stream と同じイベントを partial に積む（種類ごとに最新のもの）。結果は done イベントの中身
+    cancel はノードの切れ目で効く（実行中の LLM 呼び出しは待つ）
+    """
+    partial: Dict[str, Any] = {}
+    for event, data in _refine_updates(FlatUSAC(**ctx.payload["story"])):
+        ctx.check()
+        if event == "error":
+            raise RuntimeError(data["detail"])
+        partial[event] = data
+        ctx.set_partial(partial)
+        if event == "done":
+            return data
+    raise RuntimeError("refine finished without a result")
+
+
+def _job_queue() -> JobQueue:
+    global _jobs
+    with _jobs_lock:
+        if _jobs is None:
+            _jobs = JobQueue(
+                os.environ.get("JOB_QUEUE_DB", DEFAULT_DB_PATH),
+                runners={"tasks": _run_tasks_job, "refine": _run_refine_job},
+                workers=int(os.environ.get("JOB_WORKERS", DEFAULT_WORKERS)),
+            )
+            _jobs.start()
+        return _jobs
+
+
+# -------------------------
+# Endpoints
+# -------------------------
+@app.get("/health")
+def health():
+    return {"ok": True}
+
+
+@app.get("/health/llm")
+def health_llm():
+    """
+    task_planning の LLM circuit breaker の状態（closed / open / half_open と直近の失敗率）
+    状態ファイルは /tasks のサブプロセスと共有している
+    """
+    from src.task_planning.circuit_breaker import shared_breaker
+
+    return shared_breaker().snapshot()
+
+
+@app.post("/refine", response_model=FlatUSAC)
+def refine(payload: FlatUSAC):
+    """
+    入力US/AC(フラット) → story_refinement workflow → refined(フラット)を返す
+    out_refined.json も history_log2 に保存
+    """
+    logger, initial_state, app_graph, out_path = _new_refine_run(payload)
 
     try:
         result = app_graph.invoke(initial_state)
@@ -117,43 +407,77 @@ def refine(payload: FlatUSAC):
         raise HTTPException(status_code=500, detail=f"refine failed: {e}")
 
     finally:
+        logger.set_cache_stats(PERSONA_CACHE.stats())
         logger.save()
 
 
+@app.post("/refine/stream")
+def refine_stream(payload: FlatUSAC):
+    """
+    /refine のストリーミング版（text/event-stream）
+    classifier / issue_detection / suggestion の各ノードが終わるたびに score / issues / refined を送る
+    十分なスコアが見えたらクライアントは切断してよい（以降のラウンドは走らない）
+    """
+    return StreamingResponse(
+        _refine_events(payload),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.post("/tasks", response_model=TasksResponse)
-def generate_tasks(payload: FlatUSAC):
+def generate_tasks(
+    payload: FlatUSAC,
+    taskgen_mode: str = "full",
+    dedup_acs: bool = False,
+    dedup_tasks: bool = False,
+    deadline_s: float = 0.0,
+    policy_mode: str = "fixed",
+    stream: bool = False,
+):
     """
     フラットUS/AC → task_planning CLI (python -m src.task_planning.run) → tasks を返す
+    taskgen_mode=skeleton なら description は後から /tasks/describe で必要な分だけ生成
+    dedup_acs=true なら言い回し違いの重複 AC を畳んでから計画する（重複 AC も同じタスクに載る）
+    dedup_tasks=true ならグループ間で重複したタスクを1つにまとめる（ac_ids は和集合）
+    deadline_s>0 なら全体の時間予算。間に合わない部分は縮退し、meta.deadline に記録される
+    policy_mode=throughput ならワーカー数とコストモデルから群数/サイズを選ぶ（根拠は meta.policy_tuning）
+    stream=true なら application/x-ndjson で grouping → 完了したグループ順 → trace/meta を逐次返す
     """
+    options = TaskOptions(
+        taskgen_mode=taskgen_mode,
+        dedup_acs=dedup_acs,
+        dedup_tasks=dedup_tasks,
+        deadline_s=deadline_s,
+        policy_mode=policy_mode,
+    )
+    _check_task_options(options)
+
     in_path = None
     out_path = None
 
     try:
-        # 入力を一時ファイルに保存
-        with tempfile.NamedTemporaryFile(
-            mode="w", delete=False, suffix=".json", encoding="utf-8"
-        ) as f_in:
-            json.dump(payload.model_dump(), f_in, ensure_ascii=False, indent=2)
-            in_path = f_in.name
-
-        # 出力先（一時ファイルパスだけ用意）
-        fd, out_path = tempfile.mkstemp(suffix=".json")
-        os.close(fd)
+        in_path, out_path = _task_planning_io(payload)
 
         # task_planning 実行
-        # もし export-mode 等が必要ならここに引数追加できる
-        cmd = [
-            "python3",
-            "-u",
-            "-m",
-            "src.task_planning.run",
-            "-i",
-            in_path,
-            "-o",
-            out_path,
-        ]
-
-        p = subprocess.run(cmd, capture_output=True, text=True)
+        cmd = _task_planning_cmd(in_path, out_path, options)
+
+        if stream:
+            # 一時ファイルの後始末はストリーム側（finally では消さない）
+            tmp_paths = [in_path, out_path, out_path + ".ckpt.jsonl"]
+            in_path = out_path = None
+            return StreamingResponse(
+                _stream_task_planning(cmd, deadline_s=deadline_s, tmp_paths=tmp_paths),
+                media_type="application/x-ndjson",
+            )
+
+        try:
+            # 締め切り付きでも CLI 自体が返ってこない場合の保険（起動/書き出し分の余裕を足す）
+            p = subprocess.run(
+                cmd, capture_output=True, text=True, timeout=(deadline_s + 30.0) if deadline_s > 0 else None
+            )
+        except subprocess.TimeoutExpired:
+            raise HTTPException(status_code=504, detail=f"task_planning exceeded deadline_s={deadline_s}")
 
         if p.returncode != 0:
             raise HTTPException(
@@ -178,14 +502,70 @@ def generate_tasks(payload: FlatUSAC):
         raise HTTPException(status_code=500, detail=f"task generation failed: {e}")
 
     finally:
-        # 一時ファイル削除
-        try:
-            if in_path and os.path.exists(in_path):
-                os.remove(in_path)
-        except Exception:
-            pass
-        try:
-            if out_path and os.path.exists(out_path):
-                os.remove(out_path)
-        except Exception:
-            pass
\ No newline at end of file
+        # 一時ファイル削除（失敗時に残るチェックポイントも。一時出力なので resume はしない）
+        _remove_quietly(in_path, out_path, out_path + ".ckpt.jsonl" if out_path else None)
+
+
+@app.post("/jobs", status_code=202)
+def submit_job(payload: JobRequest):
+    """
+    /tasks（kind=tasks）/ /refine（kind=refine）を非同期ジョブとして受け付け、job_id をすぐ返す
+    ジョブは SQLite の永続キューに入り、上限付きのワーカー（JOB_WORKERS）が順に実行する（再起動しても続きから）
+    同じ内容のジョブが queued / running なら新しく作らずそれを返す（deduplicated=true）
+    """
+    if payload.kind not in ("tasks", "refine"):
+        raise HTTPException(status_code=422, detail=f"unknown job kind: {payload.kind}")
+    if payload.kind == "tasks":
+        _check_task_options(payload.options)
+    body = {
+        "story": payload.story.model_dump(),
+        "options": payload.options.model_dump() if payload.kind == "tasks" else {},
+    }
+    job, deduplicated = _job_queue().submit(payload.kind, body)
+    return {"job_id": job["job_id"], "kind": job["kind"], "status": job["status"], "deduplicated": deduplicated}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """
+    ジョブの状態（queued / running / done / failed / cancelled）
+    running の間は partial に途中結果（tasks: grouping と完了済みグループ / refine: 最新の score・issues・refined）
+    done なら result に /tasks・/refine と同じ中身
+    """
+    job = _job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"job not found: {job_id}")
+    return job
+
+
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    """
+    queued ならその場で cancelled。running なら中断を要求する
+    （tasks は CLI を kill、refine はノードの切れ目で止まる。status は少し遅れて cancelled になる）
+    """
+    job = _job_queue().cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"job not found: {job_id}")
+    return job
+
+
+@app.post("/tasks/describe")
+def describe_task_endpoint(payload: DescribeTaskRequest):
+    """
+    skeleton タスク1件の description をオンデマンド生成する（2段階 taskgen の2段目）
+    task.ac_ids は /tasks と同じ採番（AC-001..）で story.acceptance_criteria を指す
+    （空の AC を詰めてから採番するので run.py と同じ extract_story_and_acs を通す）
+    """
+    # task_planning 側は必要になってから import する
+    from src.task_planning.run import build_ac_map, extract_story_and_acs
+    from src.task_planning.grouped_taskgen.describe_agent import describe_task
+
+    story, acs = extract_story_and_acs(payload.story.model_dump())
+    ac_map = build_ac_map(acs, ac_prefix="AC")
+
+    try:
+        task = describe_task(model=payload.model, story=story, task=dict(payload.task), ac_map=ac_map)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"describe failed: {e}")
+    return {"task": task}
@@ -12,7 +12,8 @@ class WorkflowLogger:
         self.current_log = {
             "setting": {},
             "input_us_ac": {},
-            "loops": []
+            "loops": [],
+            "cache_stats": {}
         }
         
         if not os.path.exists(self.log_dir):
@@ -41,6 +42,10 @@ class WorkflowLogger:
         }
         self.current_log["loops"].append(loop_entry)
 
+    def set_cache_stats(self, stats):
+        """LLM キャッシュの集計（stage ごとの hit / miss）を記録"""
+        self.current_log["cache_stats"] = stats
+
     def save(self):
         """ファイル保存と古いファイルの削除"""
         # ファイル名の生成: YYYY_MM_DD_HH_MM_SS_output.json
@@ -20,21 +20,48 @@ from src.story_refinement.services.prompts.classifier_ai_prompt import (
     CLASSIFIER_FINAL_INSTRUCTION,
     PERSONA_PROMPTS
 )
+from src.task_planning.llm_cache import LLMCache, StagePolicy
+from src.task_planning.model_cascade import cascade_from_env
 
 load_dotenv()
 
+CLASSIFIER_MODEL = "gpt-4o-mini"
+
+# REFINE_MODEL_CASCADE="refine_classify=gpt-4.1-nano>gpt-4o-mini" のように安いモデルから試せる
+# （未指定なら CLASSIFIER_MODEL のみ）
+CLASSIFIER_CASCADE = cascade_from_env("REFINE_MODEL_CASCADE", default_model=CLASSIFIER_MODEL)
+
+# 近似再利用したスコアが本物とこの差以内なら「再利用して問題なし」とみなす（audit 用）
+PERSONA_SCORE_TOLERANCE = 5
+
+
+def _same_persona_score(cached: dict, fresh: dict) -> bool:
+    return abs(int(cached.get("score", 0)) - int(fresh.get("score", 0))) <= PERSONA_SCORE_TOLERANCE
+
+
+# ペルソナ評価は suggest_improvements で1語だけ変わったような US/AC なら再利用してよい
+# → このステージだけ近似 tier を opt-in（閾値と audit 率は環境変数で調整）
+PERSONA_CACHE = LLMCache(
+    policies={
+        "persona_score": StagePolicy(
+            near=os.getenv("PERSONA_CACHE_NEAR", "1") != "0",
+            threshold=float(os.getenv("PERSONA_CACHE_NEAR_THRESHOLD", "0.9")),
+            audit_rate=float(os.getenv("PERSONA_CACHE_AUDIT_RATE", "0.1")),
+            same=_same_persona_score,
+        )
+    }
+)
+
 def classify_us_ac(us_ac: UserStoryAcceptanceCriteria) -> ClassifierResponse:
     """
     US / AC を受け取り、5人の専門家による詳細評価を統合して返す
     """
 
-    llm = ChatOpenAI(
-        model="gpt-4o-mini",
-        temperature=0.0,
-    )
-
-    # PersonaFeedback モデルの形式で出力を強制する
-    structured_llm = llm.with_structured_output(PersonaFeedback)
+    # PersonaFeedback モデルの形式で出力を強制する（tier ごとに1つ作っておく）
+    structured_llms = {
+        m: ChatOpenAI(model=m, temperature=0.0).with_structured_output(PersonaFeedback)
+        for m in CLASSIFIER_CASCADE.tiers("refine_classify")
+    }
 
     # 評価対象のテキスト化
     us_ac_text = f"""
@@ -74,7 +101,24 @@ def classify_us_ac(us_ac: UserStoryAcceptanceCriteria) -> ClassifierResponse:
         ]
 
         # AIの実行（構造化された PersonaFeedback オブジェクトが返る）
-        feedback: PersonaFeedback = structured_llm.invoke(messages)
+        # 同一/ほぼ同一の US/AC は PERSONA_CACHE から再利用する
+        # 構造化出力にできなかった（None / 例外）ら cascade の上位モデルでやり直す
+        def _score(msgs=messages) -> dict:
+            fb = CLASSIFIER_CASCADE.run(
+                "refine_classify",
+                lambda m: structured_llms[m].invoke(msgs),
+                valid=lambda r: r is not None,
+            )
+            return fb.model_dump()
+
+        # cascade 構成が変わればキャッシュも別物
+        cached = PERSONA_CACHE.call(
+            "persona_score",
+            context=f"{CLASSIFIER_CASCADE.route_key('refine_classify')}\n{system_content}",
+            body=human_content,
+            compute=_score,
+        )
+        feedback = PersonaFeedback(**cached)
         
         # どのペルソナの回答か明示的にセット
         feedback.persona = persona_key
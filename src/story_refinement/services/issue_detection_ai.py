@@ -9,6 +9,8 @@ from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage
 from dotenv import load_dotenv
 
+from src.task_planning.model_cascade import cascade_from_env
+
 from src.story_refinement.services.schemas.us_ac_response import UserStoryAcceptanceCriteria
 from src.story_refinement.services.schemas.issue_response import IssueResponse
 from src.story_refinement.services.prompts.issue_detection_ai_prompt import (
@@ -22,19 +24,14 @@ from src.story_refinement.services.prompts.issue_detection_ai_prompt import (
 
 load_dotenv()
 
+# REFINE_MODEL_CASCADE="refine_issues=gpt-4.1-nano>gpt-4o-mini" のように安いモデルから試せる（既定は gpt-4o-mini のみ）
+ISSUE_DETECTION_CASCADE = cascade_from_env("REFINE_MODEL_CASCADE", default_model="gpt-4o-mini")
+
 def detect_issues(us_ac: UserStoryAcceptanceCriteria, expert_feedback: str) -> IssueResponse:
     """
     US / AC と専門家からのダメ出しを受け取り、構造化された指摘リストを返す
     """
 
-    llm = ChatOpenAI(
-        model="gpt-4o-mini",
-        temperature=0.3, # 専門家の意見を解釈するため、少し柔軟性を持たせる
-    )
-
-    # 構造化出力を有効化 (IssueResponse: List[str])
-    structured_llm = llm.with_structured_output(IssueResponse)
-
     # システムプロンプトの組み立て
     system_prompt = (
         ISSUE_DETECTION_SYSTEM_PROMPT_START
@@ -72,7 +69,17 @@ def detect_issues(us_ac: UserStoryAcceptanceCriteria, expert_feedback: str) -> I
     ]
 
     # 直接 IssueResponse オブジェクト（指摘事項のリスト）が返ってくる
-    return structured_llm.invoke(messages)
+    # 構造化出力にできなかった（None / 例外）ら上位モデルでやり直す
+    def _attempt(model: str) -> IssueResponse:
+        llm = ChatOpenAI(
+            model=model,
+            temperature=0.3, # 専門家の意見を解釈するため、少し柔軟性を持たせる
+        )
+        # 構造化出力を有効化 (IssueResponse: List[str])
+        structured_llm = llm.with_structured_output(IssueResponse)
+        return structured_llm.invoke(messages)
+
+    return ISSUE_DETECTION_CASCADE.run("refine_issues", _attempt, valid=lambda r: r is not None)
 
 
 if __name__ == "__main__":
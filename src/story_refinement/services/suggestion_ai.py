@@ -9,6 +9,8 @@ from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage
 from dotenv import load_dotenv
 
+from src.task_planning.model_cascade import cascade_from_env
+
 from src.story_refinement.services.schemas.us_ac_response import UserStoryAcceptanceCriteria
 from src.story_refinement.services.schemas.issue_response import IssueResponse
 from src.story_refinement.services.prompts.suggestion_ai_prompt import (
@@ -24,6 +26,9 @@ from src.story_refinement.services.prompts.suggestion_ai_prompt import (
 
 load_dotenv()
 
+# REFINE_MODEL_CASCADE="refine_suggest=gpt-4.1-nano>gpt-4o-mini" のように安いモデルから試せる（既定は gpt-4o-mini のみ）
+SUGGESTION_CASCADE = cascade_from_env("REFINE_MODEL_CASCADE", default_model="gpt-4o-mini")
+
 def suggest_improvements(
     us_ac: UserStoryAcceptanceCriteria,
     issues: IssueResponse,
@@ -32,14 +37,6 @@ def suggest_improvements(
     改善された UserStoryAcceptanceCriteria オブジェクトを返す
     """
 
-    llm = ChatOpenAI(
-        model="gpt-4o-mini",
-        temperature=0.4,
-    )
-
-    # 【重要】構造化出力を定義
-    structured_llm = llm.with_structured_output(UserStoryAcceptanceCriteria)
-
     system_prompt = (
         SUGGESTION_SYSTEM_PROMPT_START
         + SUGGESTION_SYSTEM_PROMPT_END
@@ -76,7 +73,17 @@ def suggest_improvements(
     ]
 
     # invokeの結果は自動的に UserStoryAcceptanceCriteria オブジェクトになる
-    return structured_llm.invoke(messages)
+    # 構造化出力にできなかった（None / 例外）ら上位モデルでやり直す
+    def _attempt(model: str) -> UserStoryAcceptanceCriteria:
+        llm = ChatOpenAI(
+            model=model,
+            temperature=0.4,
+        )
+        # 【重要】構造化出力を定義
+        structured_llm = llm.with_structured_output(UserStoryAcceptanceCriteria)
+        return structured_llm.invoke(messages)
+
+    return SUGGESTION_CASCADE.run("refine_suggest", _attempt, valid=lambda r: r is not None)
 
 if __name__ == "__main__":
     # テスト実行用のコード（略）
@@ -5,7 +5,7 @@ workflow.py
 US / AC を多角的な視点でブラッシュアップする LangGraph ワークフロー
 """
 
-from typing import TypedDict, Optional, List
+from typing import Any, Dict, TypedDict, Optional, List
 
 from langgraph.graph import StateGraph, END
 
@@ -13,7 +13,7 @@ from src.story_refinement.services.schemas.us_ac_response import UserStoryAccept
 from src.story_refinement.services.schemas.issue_response import IssueResponse
 from src.story_refinement.services.schemas.class_response import ClassifierResponse
 
-from src.story_refinement.services.classifier_ai import classify_us_ac
+from src.story_refinement.services.classifier_ai import PERSONA_CACHE, classify_us_ac
 from src.story_refinement.services.issue_detection_ai import detect_issues
 from src.story_refinement.services.suggestion_ai import suggest_improvements
 
@@ -30,6 +30,7 @@ class RefinementState(TypedDict):
     """
     us_ac: UserStoryAcceptanceCriteria
     score: Optional[int]
+    persona_scores: Optional[List[Dict[str, Any]]]  # 専門家ごとの score / reason（/refine/stream で逐次返す）
     expert_feedback_text: Optional[str]  # 専門家たちの詳細な言い分
     issues: Optional[List[str]]          # 整理された課題リスト
     iteration: int
@@ -60,6 +61,7 @@ def classifier_node(state: RefinementState) -> RefinementState:
     return { 
         **state, 
         "score": result.score, 
+        "persona_scores": [fb.model_dump() for fb in result.feedback_list],
         "expert_feedback_text": result.aggregated_reasons 
     }
 
@@ -184,6 +186,7 @@ if __name__ == "__main__":
     initial_state: RefinementState = {
         "us_ac": initial_us_ac,
         "score": None,
+        "persona_scores": None,
         "expert_feedback_text": None,
         "issues": None,
         "iteration": 0,
@@ -200,4 +203,6 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"Error during workflow: {e}")
     finally:
+        # キャッシュ統計は毎回 print せず、実行全体の分をログに 1 回だけ残す
+        logger.set_cache_stats(PERSONA_CACHE.stats())
         logger.save()
\ No newline at end of file
@@ -0,0 +1,110 @@
+# src/task_planning/ac_dedup.py
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, List, Tuple
+
+from .similarity import content_text, jaccard, normalize_text, only_wording_differs, shingles
+
+
+# 内容語の文字 3-gram Jaccard の下限（これ以上 かつ 語の差分が言い回しだけなら重複とみなす）
+NEAR_DUP_THRESHOLD = 0.7
+
+
+def _prefix(sh: List[str], threshold: float) -> List[str]:
+    # prefix filtering: Jaccard >= t なら、希少順に並べた先頭 |x| - ceil(t|x|) + 1 個に必ず共通要素がある
+    return sh[: len(sh) - math.ceil(threshold * len(sh)) + 1]
+
+
+def dedup_ac_map(
+    ac_map: Dict[str, str],
+    *,
+    threshold: float = NEAR_DUP_THRESHOLD,
+) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    ストーリー内の AC を正規化テキスト + shingle 類似で畳み込む
+    - 完全一致（正規化後、空白は無視）: 常に重複
+    - 近似: 内容語 shingle の Jaccard >= threshold かつ only_wording_differs
+    代表は先に出た AC（ID 順を保つ）。
+    候補は prefix filtering（希少な shingle だけの転置インデックス）で絞るので全ペア比較しない。
+    戻り値: (reduced_ac_map, duplicate_of)  duplicate_of = {dup_id: canonical_id}
+    """
+    norms = {a: normalize_text(t) for a, t in ac_map.items()}
+    sh_sets = {a: shingles(content_text(n), normalized=True) for a, n in norms.items() if n}
+
+    df: Dict[str, int] = {}
+    for sh in sh_sets.values():
+        for g in sh:
+            df[g] = df.get(g, 0) + 1
+
+    reduced: Dict[str, str] = {}
+    duplicate_of: Dict[str, str] = {}
+    by_key: Dict[str, str] = {}
+    postings: Dict[str, List[str]] = {}
+
+    for ac_id, text in ac_map.items():
+        norm = norms[ac_id]
+        key = norm.replace(" ", "")
+        hit = by_key.get(key)
+
+        sh = sh_sets.get(ac_id, frozenset())
+        ordered = sorted(sh, key=lambda g: (df[g], g))
+        if hit is None and sh:
+            cands = {c for g in _prefix(ordered, threshold) for c in postings.get(g, ())}
+            best_score = 0.0
+            for c in sorted(cands):
+                score = jaccard(sh, sh_sets[c])
+                if score >= threshold and score > best_score and only_wording_differs(norm, norms[c]):
+                    hit, best_score = c, score
+
+        if hit is not None:
+            duplicate_of[ac_id] = hit
+            continue
+
+        reduced[ac_id] = text
+        if norm:
+            by_key[key] = ac_id
+            for g in _prefix(ordered, threshold):
+                postings.setdefault(g, []).append(ac_id)
+
+    return reduced, duplicate_of
+
+
+def expand_duplicates(
+    *,
+    grouping: Dict[str, Any],
+    group_results: List[Dict[str, Any]],
+    duplicate_of: Dict[str, str],
+) -> None:
+    """
+    計画は代表 AC だけで行い、重複 AC を代表と同じグループ/タスクへ戻す（in-place）
+    これで traceability からは元の全 AC ID がカバー済みに見える
+    """
+    if not duplicate_of:
+        return
+
+    dups_by_canon: Dict[str, List[str]] = {}
+    for dup, canon in duplicate_of.items():
+        dups_by_canon.setdefault(canon, []).append(dup)
+
+    def _expand(ids: Any) -> Any:
+        if not isinstance(ids, list):
+            return ids
+        out: List[str] = []
+        for a in ids:
+            out.append(a)
+            out.extend(d for d in dups_by_canon.get(a, []) if d not in ids)
+        return out
+
+    for g in (grouping.get("groups") or []) if isinstance(grouping, dict) else []:
+        if isinstance(g, dict):
+            g["ac_ids"] = _expand(g.get("ac_ids"))
+
+    for gr in group_results or []:
+        if not isinstance(gr, dict):
+            continue
+        if "ac_ids" in gr:
+            gr["ac_ids"] = _expand(gr.get("ac_ids"))
+        for t in gr.get("tasks") or []:
+            if isinstance(t, dict):
+                t["ac_ids"] = _expand(t.get("ac_ids"))
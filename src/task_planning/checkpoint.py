@@ -0,0 +1,104 @@
+# src/task_planning/checkpoint.py
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+
+# run.py の途中経過を JSONL に追記していくジャーナル
+# 1行 = 1レコード:
+#   {"kind": "header",   "key": ...}         入力（ac_map + 方針）の識別子。違えば resume しない
+#   {"kind": "grouping", "grouping": {...}}  確定した grouping（incremental のマージ後）
+#   {"kind": "group",    "group_id": ..., "result": {...}}  完了したグループ結果（後の行が優先）
+# 途中で落ちて最終行が壊れていても、その行だけ読み飛ばす
+
+CHECKPOINT_SUFFIX = ".ckpt.jsonl"
+
+
+def checkpoint_key(*, fingerprint: str, ac_map: Dict[str, str]) -> str:
+    raw = json.dumps({"fingerprint": fingerprint, "ac_map": ac_map}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CheckpointState:
+    grouping: Optional[Dict[str, Any]] = None
+    results: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+
+class CheckpointJournal:
+    """
+    追記専用のチェックポイント（1レコードごとに flush + fsync）
+    - load(): key が一致すれば CheckpointState、無い/不一致なら None
+    - open(resume=...): resume なら追記、そうでなければ作り直して header を書く
+    - finish(): 出力を書けたら消す
+    """
+
+    def __init__(self, path: str, *, key: str) -> None:
+        self.path = path
+        self.key = key
+        self._lock = threading.Lock()
+        self._f = None
+
+    def load(self) -> Optional[CheckpointState]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+        except OSError:
+            return None
+
+        state = CheckpointState()
+        header_ok = False
+        for line in lines:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(rec, dict):
+                continue
+            kind = rec.get("kind")
+            if kind == "header":
+                header_ok = rec.get("key") == self.key
+            elif not header_ok:
+                continue
+            elif kind == "grouping" and isinstance(rec.get("grouping"), dict):
+                state.grouping = rec["grouping"]
+            elif kind == "group" and isinstance(rec.get("result"), dict):
+                state.results[str(rec.get("group_id"))] = rec["result"]
+        return state if header_ok else None
+
+    def open(self, *, resume: bool) -> None:
+        d = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(d, exist_ok=True)
+        self._f = open(self.path, "a" if resume else "w", encoding="utf-8")
+        if not resume:
+            self._write({"kind": "header", "key": self.key})
+
+    def _write(self, rec: Dict[str, Any]) -> None:
+        if self._f is None:
+            return
+        line = json.dumps(rec, ensure_ascii=False)
+        with self._lock:
+            # 前回が行の途中で落ちていても次の行から読めるように、改行で始める
+            self._f.write("\n" + line + "\n")
+            self._f.flush()
+            os.fsync(self._f.fileno())
+
+    def record_grouping(self, grouping: Dict[str, Any]) -> None:
+        self._write({"kind": "grouping", "grouping": grouping})
+
+    def record_group(self, group_result: Dict[str, Any]) -> None:
+        self._write({"kind": "group", "group_id": str(group_result.get("group_id")), "result": group_result})
+
+    def finish(self) -> None:
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,199 @@
+# src/task_planning/circuit_breaker.py
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+try:  # /tasks は1リクエスト=1プロセスなので、状態はファイルでプロセス間共有する（Windows ではロック無し）
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore
+
+
+# -------------------------
+# Settings
+# -------------------------
+DEFAULT_STATE_PATH = os.path.join(tempfile.gettempdir(), "task_planning_llm_breaker.json")
+WINDOW_S = 60.0  # この期間の呼び出し結果で失敗率を見る
+MIN_CALLS = 5  # これ未満の呼び出し数では開かない
+FAILURE_RATE = 0.5  # 失敗率がこれ以上で open
+COOLDOWN_S = 30.0  # open からこの時間が経ったら half_open で1回だけ試す
+PROBE_TIMEOUT_S = 90.0  # probe が結果を返さないまま（プロセスが死んだ等）これを過ぎたら次の probe を許す
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """breaker が open の間は LLM を呼ばずにこれを投げる（既存の failsafe 経路がすぐ動く）"""
+
+
+@contextmanager
+def _file_lock(path: str) -> Iterator[None]:
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", "a+") as lf:
+        fcntl.flock(lf, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lf, fcntl.LOCK_UN)
+
+
+def _empty_state() -> Dict[str, Any]:
+    return {"state": CLOSED, "events": [], "opened_at": 0.0, "probe_at": 0.0, "opens": 0}
+
+
+class CircuitBreaker:
+    """
+    失敗率ベースのサーキットブレーカー（closed → open → half_open → closed/open）
+    - closed   : 直近 WINDOW_S の失敗率が FAILURE_RATE 以上（MIN_CALLS 以上）で open
+    - open     : before_call() が即 CircuitOpenError。COOLDOWN_S 後に half_open
+    - half_open: probe を1本だけ通す。成功で closed、失敗で再び open
+    path があれば状態を JSON ファイルに置き、別プロセスの /tasks 実行とも共有する
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        *,
+        window_s: float = WINDOW_S,
+        min_calls: int = MIN_CALLS,
+        failure_rate: float = FAILURE_RATE,
+        cooldown_s: float = COOLDOWN_S,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.path = path
+        self.window_s = float(window_s)
+        self.min_calls = max(1, int(min_calls))
+        self.failure_rate = float(failure_rate)
+        self.cooldown_s = float(cooldown_s)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._mem = _empty_state()
+
+    # -------------------------
+    # State I/O
+    # -------------------------
+    def _read(self) -> Dict[str, Any]:
+        if not self.path:
+            return self._mem
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                obj = json.load(f)
+        except (OSError, ValueError):
+            return _empty_state()
+        return {**_empty_state(), **obj} if isinstance(obj, dict) else _empty_state()
+
+    def _write(self, st: Dict[str, Any]) -> None:
+        if not self.path:
+            self._mem = st
+            return
+        d = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(d, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=d, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(st, f)
+        os.replace(tmp, self.path)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with self._lock:
+            if self.path:
+                with _file_lock(self.path):
+                    yield
+            else:
+                yield
+
+    def _trim(self, events: List[List[Any]], now: float) -> List[List[Any]]:
+        return [e for e in events if now - float(e[0]) <= self.window_s]
+
+    # -------------------------
+    # API
+    # -------------------------
+    def before_call(self) -> None:
+        """LLM を呼ぶ前に呼ぶ。open（または probe 中の half_open）なら CircuitOpenError"""
+        now = self._clock()
+        with self._locked():
+            st = self._read()
+            if st["state"] == CLOSED:
+                return
+            if st["state"] == OPEN:
+                wait = self.cooldown_s - (now - float(st["opened_at"]))
+                if wait > 0:
+                    raise CircuitOpenError(f"LLM circuit open (retry in {wait:.0f}s)")
+                st["state"] = HALF_OPEN
+                st["probe_at"] = 0.0
+            # half_open: probe は1本だけ
+            if float(st["probe_at"]) and now - float(st["probe_at"]) < PROBE_TIMEOUT_S:
+                raise CircuitOpenError("LLM circuit half-open (probe in flight)")
+            st["probe_at"] = now
+            self._write(st)
+
+    def record(self, ok: bool) -> None:
+        """呼び出し結果を記録する（プロバイダ側の障害だけを失敗として渡す）"""
+        now = self._clock()
+        with self._locked():
+            st = self._read()
+            if st["state"] == HALF_OPEN:
+                if ok:
+                    st.update({"state": CLOSED, "events": [], "probe_at": 0.0})
+                else:
+                    st.update({"state": OPEN, "opened_at": now, "probe_at": 0.0, "opens": int(st["opens"]) + 1})
+                self._write(st)
+                return
+            if st["state"] == OPEN:
+                # open になる前に出ていた呼び出しの結果。状態は変えない
+                return
+
+            events = self._trim(list(st["events"]), now)
+            events.append([now, bool(ok)])
+            fails = sum(1 for e in events if not e[1])
+            if len(events) >= self.min_calls and fails / float(len(events)) >= self.failure_rate:
+                st.update({"state": OPEN, "opened_at": now, "events": [], "opens": int(st["opens"]) + 1})
+            else:
+                st["events"] = events
+            self._write(st)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """監視用（/health/llm）"""
+        now = self._clock()
+        with self._locked():
+            st = self._read()
+        events = self._trim(list(st["events"]), now)
+        fails = sum(1 for e in events if not e[1])
+        state = st["state"]
+        if state == OPEN and now - float(st["opened_at"]) >= self.cooldown_s:
+            state = HALF_OPEN  # 次の呼び出しが probe になる
+        return {
+            "state": state,
+            "recent_calls": len(events),
+            "recent_failures": fails,
+            "failure_rate": round(fails / float(len(events)), 4) if events else 0.0,
+            "opened_at": float(st["opened_at"]) or None,
+            "opens": int(st["opens"]),
+            "window_s": self.window_s,
+            "cooldown_s": self.cooldown_s,
+        }
+
+
+_SHARED: Optional[CircuitBreaker] = None
+
+
+def shared_breaker() -> CircuitBreaker:
+    """
+    LLM 層で共有する breaker（状態ファイルは LLM_BREAKER_STATE、既定は一時ディレクトリ）
+    LLM_BREAKER_STATE=off ならプロセス内だけで持つ
+    """
+    global _SHARED
+    if _SHARED is None:
+        path = os.getenv("LLM_BREAKER_STATE", DEFAULT_STATE_PATH)
+        _SHARED = CircuitBreaker(None if path == "off" else path)
+    return _SHARED
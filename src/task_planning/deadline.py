@@ -0,0 +1,76 @@
+# src/task_planning/deadline.py
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, Optional
+
+
+# -------------------------
+# Settings
+# -------------------------
+# LLM 1回に最低これだけ残っていなければ呼ばずに DeadlineExceeded
+MIN_CALL_S = 2.0
+# 出力の組み立て（traceability / 書き出し）用に残しておく時間
+RESERVE_S = 1.0
+# clustering に使ってよい割合（残りは taskgen）
+CLUSTER_SHARE = 0.4
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class Deadline:
+    """
+    実行全体の締め切り（monotonic clock）
+    sub() で「今から残り時間の一部」だけの子 deadline を作れる（親より後にはならない）
+    """
+
+    def __init__(self, seconds: float, *, clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self.seconds = float(seconds)
+        self.started = clock()
+        self.ends = self.started + self.seconds
+
+    def remaining(self) -> float:
+        return self.ends - self._clock()
+
+    def elapsed(self) -> float:
+        return self._clock() - self.started
+
+    def expired(self, *, margin: float = 0.0) -> bool:
+        return self.remaining() <= margin
+
+    def sub(self, fraction: float) -> "Deadline":
+        child = Deadline(0.0, clock=self._clock)
+        child.ends = min(self.ends, child.started + max(0.0, self.remaining()) * float(fraction))
+        child.seconds = child.ends - child.started
+        return child
+
+    def call_timeout(self, default: float) -> float:
+        """
+        LLM 1回分の timeout（default と「残り - RESERVE_S」の小さい方）
+        MIN_CALL_S も残っていなければ呼ぶ前に DeadlineExceeded
+        """
+        left = self.remaining() - RESERVE_S
+        if left < MIN_CALL_S:
+            raise DeadlineExceeded(f"deadline budget exhausted ({self.seconds:.1f}s)")
+        return min(float(default), left)
+
+
+# -------------------------
+# Thread scope
+# -------------------------
+# taskgen の各ワーカースレッドに bind_deadline で deadline を張ると、
+# その中の call_llm_json が締め切りに合わせて timeout を縮める
+_local = threading.local()
+
+
+def current_deadline() -> Optional[Deadline]:
+    return getattr(_local, "deadline", None)
+
+
+def bind_deadline(deadline: Optional[Deadline]) -> None:
+    """ThreadPoolExecutor(initializer=...) 用: ワーカースレッドの寿命いっぱい deadline を張る"""
+    _local.deadline = deadline
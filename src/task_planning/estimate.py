@@ -0,0 +1,341 @@
+# src/task_planning/estimate.py
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+from .grouping.cluster_agent import FAST_PATH_MAX_GROUPS
+from .grouping.cluster_support import (
+    CLUSTER_SYSTEM,
+    EDIT_SYSTEM,
+    REPAIR_SYSTEM as CLUSTER_REPAIR_SYSTEM,
+    build_cluster_prompt,
+    build_edit_prompt,
+    build_repair_prompt,
+    derive_effective_policy,
+    split_issues,
+)
+from .grouping.local_cluster import local_constrained_grouping
+from .grouping.policy import lpt_makespan
+from .grouping.schema import normalize_grouping_obj, simple_fallback_grouping, validate_grouping
+from .grouped_taskgen.describe_agent import DESCRIBE_SYSTEM, DESCRIBE_USER
+from .grouped_taskgen.packer import group_prompt_tokens, pack_small_groups
+from .grouped_taskgen.taskgen_agent import (
+    GROUP_PACK_USER,
+    GROUP_SKELETON_USER,
+    GROUP_TASKGEN_SYSTEM,
+    GROUP_TASKGEN_USER,
+    REPAIR_SYSTEM as TASK_REPAIR_SYSTEM,
+    REPAIR_USER as TASK_REPAIR_USER,
+    _task_bounds,
+)
+from .token_estimate import estimate_tokens
+
+
+# -------------------------
+# Settings（履歴が無いときの既定値）
+# -------------------------
+BASE_LATENCY_S = 1.5  # 1呼び出しの固定分（接続 + prompt 処理）
+OUTPUT_TOKENS_PER_S = 60.0  # 出力速度
+TASKS_PER_AC = 1.5
+OUT_TOKENS_PER_TASK = {"full": 220, "skeleton": 60}
+DEFAULT_OUT_TOKENS = {
+    "cluster": 900,
+    "cluster_repair": 900,
+    "cluster_edit": 250,
+    "describe": 180,
+}
+DEFAULT_REPAIR_RATE = {"cluster": 0.25, "taskgen": 0.15}  # 1呼び出しあたりの平均 repair 回数
+WORKER_TABLE = (1, 2, 4, 8, 16, 32)
+
+
+# -------------------------
+# History
+# -------------------------
+def load_history(paths: Iterable[str]) -> Dict[str, Any]:
+    """
+    過去の run.py 出力 JSON（meta.hedging / meta.llm_usage / validate.repairs_used）から
+    ステージ別の p50/p90 レイテンシ、1呼び出しあたりの出力トークン、repair 率、AC あたりのタスク数を集める。
+    読めないファイルは無視する。
+    """
+    lat: Dict[str, Dict[str, float]] = {}
+    usage: Dict[str, Dict[str, float]] = {}
+    repairs = {"cluster": [0, 0], "taskgen": [0, 0]}  # [repairs, calls]
+    tasks = acs = 0
+    files = 0
+
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                obj = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if not isinstance(obj, dict):
+            continue
+        files += 1
+        meta = obj.get("meta") or {}
+
+        for stage, st in ((meta.get("hedging") or {}).get("stages") or {}).items():
+            n = int(st.get("calls", 0) or 0)
+            if n <= 0:
+                continue
+            acc = lat.setdefault(stage, {"calls": 0, "p50_sum": 0.0, "p90_sum": 0.0})
+            acc["calls"] += n
+            acc["p50_sum"] += float(st.get("p50_s", 0.0)) * n
+            acc["p90_sum"] += float(st.get("p90_s", 0.0)) * n
+
+        for stage, st in (meta.get("llm_usage") or {}).items():
+            acc = usage.setdefault(stage, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+            for k in acc:
+                acc[k] += int(st.get(k, 0) or 0)
+
+        gmeta = (obj.get("grouping") or {}).get("meta") or {}
+        if "repairs_used" in gmeta and not (gmeta.get("fast_path") or {}).get("used"):
+            repairs["cluster"][0] += int(gmeta.get("repairs_used") or 0)
+            repairs["cluster"][1] += 1
+        for gr in obj.get("group_results") or []:
+            v = gr.get("validate") if isinstance(gr, dict) else None
+            if isinstance(v, dict) and "template_reuse" not in (gr.get("meta") or {}):
+                repairs["taskgen"][0] += int(v.get("repairs_used") or 0)
+                repairs["taskgen"][1] += 1
+        ac_map = obj.get("ac_map") or {}
+        if isinstance(ac_map, dict) and ac_map:
+            acs += len(ac_map)
+            tasks += sum(len(gr.get("tasks") or []) for gr in obj.get("group_results") or [] if isinstance(gr, dict))
+
+    stages: Dict[str, Dict[str, float]] = {}
+    for stage, acc in lat.items():
+        stages.setdefault(stage, {}).update(
+            {"p50_s": acc["p50_sum"] / acc["calls"], "p90_s": acc["p90_sum"] / acc["calls"], "calls": acc["calls"]}
+        )
+    for stage, acc in usage.items():
+        if acc["calls"]:
+            stages.setdefault(stage, {})["out_tokens"] = acc["completion_tokens"] / float(acc["calls"])
+
+    return {
+        "files": files,
+        "stages": stages,
+        "repair_rate": {k: (r / float(n)) for k, (r, n) in repairs.items() if n},
+        "tasks_per_ac": (tasks / float(acs)) if acs else None,
+    }
+
+
+# -------------------------
+# Estimation
+# -------------------------
+class _Tally:
+    def __init__(self, history: Dict[str, Any]) -> None:
+        self.hist = history.get("stages") or {}
+        self.by_stage: Dict[str, Dict[str, float]] = {}
+
+    def out_tokens(self, stage: str, default: float) -> float:
+        return float((self.hist.get(stage) or {}).get("out_tokens") or default)
+
+    def latency(self, stage: str, out_tokens: float, *, q: str = "p50_s") -> float:
+        h = self.hist.get(stage) or {}
+        if h.get(q):
+            return float(h[q])
+        return BASE_LATENCY_S + out_tokens / OUTPUT_TOKENS_PER_S
+
+    def add(self, stage: str, *, calls: float, in_tokens: float, out_tokens: float) -> None:
+        st = self.by_stage.setdefault(stage, {"calls": 0.0, "input_tokens": 0.0, "output_tokens": 0.0})
+        st["calls"] += calls
+        st["input_tokens"] += calls * in_tokens
+        st["output_tokens"] += calls * out_tokens
+
+
+def estimate_run(
+    *,
+    story: Dict[str, Any],
+    ac_map: Dict[str, str],
+    tuned: Dict[str, int],
+    max_tasks_per_ac: int,
+    max_repairs: int,
+    cluster_mode: str = "full",
+    taskgen_mode: str = "full",
+    fast_path: bool = True,
+    pack_small_groups_enabled: bool = False,
+    pack_max_acs: int = 4,
+    pack_token_budget: int = 1500,
+    workers: int = 4,
+    history: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    API を呼ばずに LLM 呼び出し数 / トークン / 所要時間を見積もる（run.py --dry-run）
+    - グループ構成はローカルクラスタリングで代用（edit モードの seed と同じもの）
+    - repair は「期待値」（1呼び出しあたりの平均 repair 回数。max_repairs で頭打ち）として小数で数える
+    - 所要時間は clustering（直列）+ taskgen / describe（workers 並列の makespan）
+    history は load_history() の戻り値。あればステージ別の実測値を既定値より優先する
+    """
+    history = history or {"files": 0, "stages": {}, "repair_rate": {}, "tasks_per_ac": None}
+    tally = _Tally(history)
+    repair_rate = {**DEFAULT_REPAIR_RATE, **(history.get("repair_rate") or {})}
+    tasks_per_ac = float(history.get("tasks_per_ac") or TASKS_PER_AC)
+    max_repairs = max(0, int(max_repairs))
+    story_json = json.dumps(story, ensure_ascii=False)
+
+    eff = derive_effective_policy(
+        n_acs=len(ac_map),
+        target_groups_min=tuned["target_groups_min"],
+        target_groups_max=tuned["target_groups_max"],
+        max_groups=tuned["max_groups"],
+        min_group_size=tuned["min_group_size"],
+    )
+    max_ac_per_group = int(tuned["max_ac_per_group"])
+    try:
+        seed = local_constrained_grouping(
+            ac_map,
+            max_ac_per_group=max_ac_per_group,
+            min_group_size=eff.min_group_size,
+            target_groups_min=eff.target_min,
+            target_groups_max=eff.target_max,
+            max_groups=eff.max_groups,
+        )
+    except Exception:
+        seed = simple_fallback_grouping(ac_map, max_ac_per_group=max_ac_per_group, min_group_size=eff.min_group_size)
+    seed = normalize_grouping_obj(seed)
+    groups = [g for g in seed.get("groups") or [] if isinstance(g, dict) and g.get("ac_ids")]
+
+    # 1) clustering
+    fast = False
+    if fast_path and cluster_mode != "local" and eff.max_groups <= FAST_PATH_MAX_GROUPS:
+        ok, issues = validate_grouping(
+            seed,
+            ac_map=ac_map,
+            max_ac_per_group=max_ac_per_group,
+            target_groups_min=eff.target_min,
+            target_groups_max=eff.target_max,
+            max_groups=eff.max_groups,
+            min_group_size=eff.min_group_size,
+            require_log_split=True,
+        )
+        fast = ok and not split_issues(issues)[0]
+
+    cluster_s = 0.0
+    if not fast and cluster_mode != "local" and ac_map:
+        policy_args = dict(
+            max_ac_per_group=max_ac_per_group,
+            effective_target_min=eff.target_min,
+            effective_target_max=eff.target_max,
+            effective_max_groups=eff.max_groups,
+            min_group_size=eff.min_group_size,
+        )
+        exp_repairs = min(float(max_repairs), repair_rate["cluster"])
+        if cluster_mode == "edit":
+            in_tok = estimate_tokens(EDIT_SYSTEM) + estimate_tokens(
+                build_edit_prompt(story=story, ac_map=ac_map, seed_obj=seed, **policy_args)
+            )
+            out = tally.out_tokens("cluster_edit", DEFAULT_OUT_TOKENS["cluster_edit"])
+            tally.add("cluster_edit", calls=1.0 + exp_repairs, in_tokens=in_tok, out_tokens=out)
+            cluster_s = (1.0 + exp_repairs) * tally.latency("cluster_edit", out)
+        else:
+            in_tok = estimate_tokens(CLUSTER_SYSTEM) + estimate_tokens(
+                build_cluster_prompt(story=story, ac_map=ac_map, **policy_args)
+            )
+            out = tally.out_tokens("cluster", DEFAULT_OUT_TOKENS["cluster"])
+            tally.add("cluster", calls=1.0, in_tokens=in_tok, out_tokens=out)
+            cluster_s = tally.latency("cluster", out)
+            if exp_repairs:
+                rin = estimate_tokens(CLUSTER_REPAIR_SYSTEM) + estimate_tokens(
+                    build_repair_prompt(issues_text="- (issues)", grouping_obj=seed)
+                )
+                rout = tally.out_tokens("cluster_repair", DEFAULT_OUT_TOKENS["cluster_repair"])
+                tally.add("cluster_repair", calls=exp_repairs, in_tokens=rin, out_tokens=rout)
+                cluster_s += exp_repairs * tally.latency("cluster_repair", rout)
+
+    # 2) taskgen（実行単位ごと）
+    skeleton = taskgen_mode != "full"
+    per_task_out = OUT_TOKENS_PER_TASK["skeleton" if skeleton else "full"]
+    single_tpl = GROUP_SKELETON_USER if skeleton else GROUP_TASKGEN_USER
+    fixed_in = estimate_tokens(GROUP_TASKGEN_SYSTEM) + estimate_tokens(story_json)
+
+    def _n_tasks(g: Dict[str, Any]) -> int:
+        lo, hi = _task_bounds(len(g["ac_ids"]), max_tasks_per_ac)
+        return min(hi, max(lo, round(tasks_per_ac * len(g["ac_ids"]))))
+
+    units = [[i] for i in range(len(groups))]
+    if pack_small_groups_enabled:
+        units = pack_small_groups(groups, ac_map, max_group_acs=int(pack_max_acs), token_budget=int(pack_token_budget))
+
+    unit_s: List[float] = []
+    total_tasks = 0
+    exp_task_repairs = min(float(max_repairs), repair_rate["taskgen"])
+    for unit in units:
+        ugroups = [groups[i] for i in unit]
+        n_tasks = sum(_n_tasks(g) for g in ugroups)
+        total_tasks += n_tasks
+        in_tok = fixed_in + estimate_tokens(single_tpl if len(unit) == 1 else GROUP_PACK_USER) + sum(
+            group_prompt_tokens(g, ac_map) for g in ugroups
+        )
+        stage = "taskgen" if len(unit) == 1 else "taskgen_pack"
+        cap = 700.0 if skeleton else 1800.0
+        out = tally.out_tokens(stage, min(cap, float(n_tasks * per_task_out)))
+        tally.add(stage, calls=1.0, in_tokens=in_tok, out_tokens=out)
+        secs = tally.latency(stage, out)
+        # max_tokens に収まらない群は出力が切れるので repair を使い切る前提
+        unit_repairs = float(max_repairs) if n_tasks * per_task_out > cap else exp_task_repairs
+        if unit_repairs and len(unit) == 1:
+            rin = estimate_tokens(TASK_REPAIR_SYSTEM) + estimate_tokens(TASK_REPAIR_USER) + in_tok + out
+            tally.add("taskgen_repair", calls=unit_repairs, in_tokens=rin, out_tokens=out)
+            secs += unit_repairs * tally.latency("taskgen_repair", out)
+        unit_s.append(secs)
+
+    # 3) description（two_phase のみ。skeleton は後から API で埋める）
+    desc_s: List[float] = []
+    if taskgen_mode == "two_phase" and total_tasks:
+        d_in = estimate_tokens(DESCRIBE_SYSTEM) + estimate_tokens(DESCRIBE_USER) + estimate_tokens(story_json)
+        d_in += round(sum(group_prompt_tokens(g, ac_map) for g in groups) / max(1, total_tasks))
+        d_out = tally.out_tokens("describe", DEFAULT_OUT_TOKENS["describe"])
+        tally.add("describe", calls=float(total_tasks), in_tokens=d_in, out_tokens=d_out)
+        desc_s = [tally.latency("describe", d_out)] * total_tasks
+
+    def _wall(w: int) -> float:
+        return cluster_s + lpt_makespan(unit_s, w) + lpt_makespan(desc_s, w)
+
+    by_stage = {
+        k: {"calls": round(v["calls"], 2), "input_tokens": round(v["input_tokens"]), "output_tokens": round(v["output_tokens"])}
+        for k, v in tally.by_stage.items()
+    }
+    w = max(1, int(workers))
+    return {
+        "dry_run": True,
+        "ac_count": len(ac_map),
+        "policy": {
+            **tuned,
+            "effective": {
+                "target_groups": [eff.target_min, eff.target_max],
+                "max_groups": eff.max_groups,
+                "min_group_size": eff.min_group_size,
+                "relaxations": list(eff.relaxations),
+            },
+        },
+        "cluster_mode": cluster_mode,
+        "taskgen_mode": taskgen_mode,
+        "fast_path": fast,
+        "groups_estimated": len(groups),
+        "taskgen_units": len(units),
+        "tasks_estimated": total_tasks,
+        "llm_calls": {
+            "total": round(sum(v["calls"] for v in tally.by_stage.values()), 2),
+            "by_stage": by_stage,
+        },
+        "tokens": {
+            "input": sum(v["input_tokens"] for v in by_stage.values()),
+            "output": sum(v["output_tokens"] for v in by_stage.values()),
+        },
+        "wall_clock_s": {
+            "workers": w,
+            "clustering": round(cluster_s, 1),
+            "taskgen": round(lpt_makespan(unit_s, w), 1),
+            "describe": round(lpt_makespan(desc_s, w), 1),
+            "total": round(_wall(w), 1),
+            # workers を増やしても units 数を超えると頭打ち
+            "by_workers": {str(n): round(_wall(n), 1) for n in WORKER_TABLE},
+        },
+        "history": {
+            "files": int(history.get("files") or 0),
+            "stages": sorted((history.get("stages") or {}).keys()),
+            "repair_rate": {k: round(v, 3) for k, v in repair_rate.items()},
+            "tasks_per_ac": round(tasks_per_ac, 3),
+        },
+    }
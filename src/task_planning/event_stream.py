@@ -0,0 +1,54 @@
+# src/task_planning/event_stream.py
+from __future__ import annotations
+
+import json
+import threading
+from typing import Any, Dict, List, TextIO
+
+
+class EventStream:
+    """
+    --stream の NDJSON 出力（1行1イベント。stdout はイベント専用）
+      {"event": "grouping", "grouping": {...}}                      … grouping が確定した時点
+      {"event": "group", "index": k, "group_result": {...}}         … future が終わった順
+      {"event": "group", "index": k, "group_result": {...}, "revised": true}
+                                                                    … 後処理（description 埋め / dedup 等）で変わった分
+      {"event": "done", "trace": {...}, "meta": {...}}              … 最後に1回
+    index は最終 group_results の位置。クライアントは index ごとに上書きすれば -o のファイルと一致する
+    """
+
+    def __init__(self, out: TextIO) -> None:
+        self._out = out
+        self._lock = threading.Lock()
+        self._grouping = ""
+        self._groups: Dict[int, str] = {}  # index -> 送った時点の group_result（後処理で変わったか見る）
+
+    def _emit(self, event: str, **payload: Any) -> None:
+        line = json.dumps({"event": event, **payload}, ensure_ascii=False)
+        with self._lock:
+            self._out.write(line + "\n")
+            self._out.flush()
+
+    def grouping(self, grouping: Dict[str, Any]) -> None:
+        self._grouping = json.dumps(grouping, ensure_ascii=False, sort_keys=True)
+        self._emit("grouping", grouping=grouping)
+
+    def group(self, index: int, group_result: Dict[str, Any]) -> None:
+        self._groups[int(index)] = json.dumps(group_result, ensure_ascii=False, sort_keys=True)
+        self._emit("group", index=int(index), group_result=group_result)
+
+    def finish(
+        self,
+        *,
+        grouping: Dict[str, Any],
+        group_results: List[Dict[str, Any]],
+        trace: Dict[str, Any],
+        meta: Dict[str, Any],
+    ) -> None:
+        # 送った内容と最終結果が違うものだけ送り直してから done
+        if json.dumps(grouping, ensure_ascii=False, sort_keys=True) != self._grouping:
+            self._emit("grouping", grouping=grouping, revised=True)
+        for k, gr in enumerate(group_results):
+            if json.dumps(gr, ensure_ascii=False, sort_keys=True) != self._groups.get(k):
+                self._emit("group", index=k, group_result=gr, revised=k in self._groups)
+        self._emit("done", trace=trace, meta=meta)
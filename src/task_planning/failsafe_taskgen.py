@@ -3,24 +3,11 @@ from __future__ import annotations
 
 from typing import Any, Dict, List
 
+from .keywords import FAILSAFE_SUBCATEGORY, classify
+
 
 def _guess_subcategory(ac_text: str) -> str:
-    t = (ac_text or "").lower()
-    if any(k in t for k in ["sql injection", "sqli", "xss", "sanitize", "csrf", "security"]):
-        return "Security"
-    if any(k in t for k in ["audit", "tamper", "監査", "改ざん", "耐改ざん"]):
-        return "Audit"
-    if any(k in t for k in ["log", "ログ", "history"]):
-        return "Logging"
-    if any(k in t for k in ["db", "schema", "migration", "index", "table"]):
-        return "DB"
-    if any(k in t for k in ["ui", "screen", "responsive", "layout", "widget"]):
-        return "UI"
-    if any(k in t for k in ["api", "rest", "endpoint", "rate limit", "caching", "cache", "performance", "ms", "sec"]):
-        return "API"
-    if any(k in t for k in ["validation", "invalid", "format", "error when", "must reject"]):
-        return "Validation"
-    return "General"
+    return classify(ac_text, FAILSAFE_SUBCATEGORY)
 
 
 def ac_map_to_min_tasks(ac_map: Dict[str, str]) -> List[Dict[str, Any]]:
@@ -0,0 +1,149 @@
+# src/task_planning/grouped_taskgen/describe_agent.py
+from __future__ import annotations
+
+import concurrent.futures
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..llm import call_llm_json
+from ..model_cascade import ModelCascade
+
+
+DESCRIBE_SYSTEM = """You are a senior software engineer.
+You write the description of ONE implementation task.
+Output JSON only. No markdown. No extra text.
+"""
+
+DESCRIBE_USER = """Write the description for this task.
+
+Hard constraints:
+- Output JSON only with schema: {{"description":"Goal:...\\nChanges:...\\nAcceptance checks:..."}}.
+- The description MUST contain the three sections "Goal:", "Changes:", "Acceptance checks:".
+- Acceptance checks must verify the ACs listed below.
+- Be concrete (modules, endpoints, tables, tests). No filler.
+
+Story (context):
+{story_json}
+
+Task:
+{task_json}
+
+ACs covered by this task:
+{ac_subset_json}
+"""
+
+_SECTIONS = ["Goal:", "Changes:", "Acceptance checks:"]
+
+
+def _template_description(task: Dict[str, Any], ac_subset: Dict[str, str]) -> str:
+    """
+    LLM が失敗した時のテンプレ description（validate_tasks_obj は通る形）
+    """
+    checks = "; ".join(f"{a}: {t}" for a, t in ac_subset.items()) or "(no ACs)"
+    return (
+        f"Goal: {task.get('title', '')}\n"
+        f"Changes: Implement the change described by the title ({task.get('subcategory', '')}).\n"
+        f"Acceptance checks: {checks}"
+    )
+
+
+def describe_task(
+    *,
+    model: str,
+    story: Dict[str, Any],
+    task: Dict[str, Any],
+    ac_map: Dict[str, str],
+    cascade: Optional[ModelCascade] = None,
+) -> Dict[str, Any]:
+    """
+    タスク1件の description を生成し、埋めたタスクのコピーを返す（2段階 taskgen の2段目）
+    - 渡された task は書き換えない（締め切りで待つのをやめたワーカーが出力中の dict を触らないように）
+    - cascade があれば安いモデルから試し、3セクションが揃わなければ上位モデルで再生成
+    - 失敗/形式不正ならテンプレ description（description_status="fallback"）
+    """
+    task = dict(task)
+    ac_ids = [a for a in (task.get("ac_ids") or []) if isinstance(a, str)]
+    ac_subset = {a: ac_map.get(a, "") for a in ac_ids}
+    brief = {k: task.get(k) for k in ["title", "subcategory", "priority", "estimate_hours", "ac_ids"]}
+
+    prompt = DESCRIBE_USER.format(
+        story_json=json.dumps(story, ensure_ascii=False),
+        task_json=json.dumps(brief, ensure_ascii=False),
+        ac_subset_json=json.dumps(ac_subset, ensure_ascii=False, indent=2),
+    )
+
+    def _attempt(m: str) -> str:
+        raw = call_llm_json(
+            model=m,
+            messages=[
+                {"role": "system", "content": DESCRIBE_SYSTEM},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=0.1,
+            max_tokens=400,
+            stage="describe",
+        )
+        return str(raw.get("description") or "").strip()
+
+    def _complete(desc: str) -> bool:
+        return all(k in desc for k in _SECTIONS)
+
+    try:
+        desc = cascade.run("describe", _attempt, valid=_complete) if cascade is not None else _attempt(model)
+        if not _complete(desc):
+            raise ValueError("description is missing required sections")
+        task["description"] = desc
+        task["description_status"] = "generated"
+    except Exception as e:
+        task["description"] = _template_description(task, ac_subset)
+        task["description_status"] = "fallback"
+        task["description_error"] = f"{type(e).__name__}: {e}"
+
+    return task
+
+
+def fill_group_descriptions(
+    *,
+    model: str,
+    story: Dict[str, Any],
+    group_result: Dict[str, Any],
+    ac_map: Dict[str, str],
+    executor: Optional[concurrent.futures.Executor] = None,
+    cascade: Optional[ModelCascade] = None,
+) -> List[Tuple[Dict[str, Any], concurrent.futures.Future]]:
+    """
+    group_result 内の description_status="pending" なタスクを並列に埋める。
+    executor を渡すとそこへ submit して (task, future) を返す。future の結果（埋めたコピー）を
+    task に反映するのは呼び出し側（終わった分だけ apply_descriptions で反映する）。
+    渡さない場合は同期実行してその場で反映し、空リストを返す。
+    """
+    pending = [
+        t
+        for t in (group_result.get("tasks") or [])
+        if isinstance(t, dict) and t.get("description_status") == "pending"
+    ]
+    if executor is None:
+        for t in pending:
+            t.update(describe_task(model=model, story=story, task=t, ac_map=ac_map, cascade=cascade))
+        return []
+
+    return [
+        (t, executor.submit(describe_task, model=model, story=story, task=dict(t), ac_map=ac_map, cascade=cascade))
+        for t in pending
+    ]
+
+
+def apply_descriptions(
+    submitted: List[Tuple[Dict[str, Any], concurrent.futures.Future]],
+    done: Any,
+) -> int:
+    """
+    done に含まれる future の結果だけを元の task に反映する（未完了のタスクは pending のまま）
+    戻り値: 反映した件数
+    """
+    applied = 0
+    for task, fut in submitted:
+        if fut in done and not fut.cancelled() and fut.exception() is None:
+            task.update(fut.result())
+            applied += 1
+    return applied
@@ -4,6 +4,8 @@ from __future__ import annotations
 import re
 from typing import Any, Dict, List, Tuple
 
+from ..keywords import FALLBACK_SUBCATEGORY, classify
+
 
 _SPACE_RE = re.compile(r"\s+")
 
@@ -26,50 +28,10 @@ def _short_title(ac_text: str, max_len: int = 80) -> str:
 
 def _guess_subcategory(ac_text: str) -> str:
     """
-    最低限のキーワード分類（あとで辞書を増やすだけで強化できる）。
+    最低限のキーワード分類（辞書は keywords.FALLBACK_SUBCATEGORY に集約）。
     ※ 判定順が重要：より「強い意味」を先に置く。
     """
-    t = (ac_text or "").lower()
-
-    # logging / audit（強い意味）
-    if any(k in t for k in ["tamper", "immutable", "audit log", "audit", "監査", "耐改ざん", "改ざん"]):
-        return "Logging/Audit"
-    if any(k in t for k in ["security log", "セキュリティログ"]):
-        return "Logging/Audit"
-    if "log" in t or "logging" in t or "ログ" in t:
-        return "Logging/Audit"
-
-    # auth / permission
-    if any(k in t for k in ["authenticated", "authentication", "auth", "login", "jwt", "session"]):
-        return "Auth/Permission"
-    if any(k in t for k in ["permission", "role", "rbac", "authorize", "authorization"]):
-        return "Auth/Permission"
-
-    # security / validation
-    if any(k in t for k in ["sql injection", "sqli", "xss", "sanitize", "sanitise", "csrf", "validation"]):
-        return "Security/Validation"
-    if any(k in t for k in ["rate limit", "ratelimit", "throttle", "brute"]):
-        return "Security/Validation"
-
-    # performance / cache
-    if any(k in t for k in ["cache", "caching", "latency", "performance", "throughput", "p95"]):
-        return "Performance/Cache"
-    if any(k in t for k in [" ms", "ms.", "milliseconds", " second", "seconds", "1 second"]):
-        return "Performance/Cache"
-
-    # api / integration
-    if any(k in t for k in ["api", "rest", "endpoint", "http", "response"]):
-        return "API"
-
-    # ui / ux
-    if any(k in t for k in ["responsive", "mobile", "layout", "widget", "screen", "ui", "ux"]):
-        return "UI/UX"
-
-    # export / report
-    if any(k in t for k in ["export", "csv", "pdf", "report"]):
-        return "Export/Report"
-
-    return "General"
+    return classify(ac_text, FALLBACK_SUBCATEGORY)
 
 
 def _sort_ac_items(ac_map: Dict[str, str]) -> List[Tuple[str, str]]:
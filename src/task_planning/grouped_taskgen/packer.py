@@ -0,0 +1,57 @@
+# src/task_planning/grouped_taskgen/packer.py
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List
+
+from ..token_estimate import estimate_tokens
+
+
+def group_prompt_tokens(group: Dict[str, Any], ac_map: Dict[str, str]) -> int:
+    """
+    グループをプロンプトに載せた時の概算トークン（AC本文 + ID）
+    """
+    ac_ids = [a for a in (group.get("ac_ids") or []) if isinstance(a, str)]
+    subset = {a: ac_map.get(a, "") for a in ac_ids}
+    return estimate_tokens(json.dumps(subset, ensure_ascii=False)) + 16
+
+
+def pack_small_groups(
+    groups: List[Dict[str, Any]],
+    ac_map: Dict[str, str],
+    *,
+    max_group_acs: int = 4,
+    token_budget: int = 1500,
+    max_groups_per_pack: int = 4,
+) -> List[List[int]]:
+    """
+    小さいグループ（ac_ids <= max_group_acs）を token_budget 以内で束ねる。
+    戻り値は groups の index のリスト（1件だけのリスト = 単独で taskgen）
+    - 並び順は元の groups 順を保つ（first-fit）
+    - 大きいグループは常に単独
+    """
+    units: List[List[int]] = []
+    open_pack: List[int] = []
+    open_tokens = 0
+
+    def _flush() -> None:
+        nonlocal open_pack, open_tokens
+        if open_pack:
+            units.append(open_pack)
+        open_pack = []
+        open_tokens = 0
+
+    for i, g in enumerate(groups):
+        ac_ids = g.get("ac_ids") if isinstance(g, dict) else None
+        if not isinstance(ac_ids, list) or len(ac_ids) > int(max_group_acs):
+            units.append([i])
+            continue
+
+        tok = group_prompt_tokens(g, ac_map)
+        if open_pack and (open_tokens + tok > int(token_budget) or len(open_pack) >= int(max_groups_per_pack)):
+            _flush()
+        open_pack.append(i)
+        open_tokens += tok
+
+    _flush()
+    return units
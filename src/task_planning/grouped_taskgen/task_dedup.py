@@ -0,0 +1,165 @@
+# src/task_planning/grouped_taskgen/task_dedup.py
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, FrozenSet, List, Tuple
+
+from ..similarity import jaccard, lsh_keys, minhash_signature, normalize_text, only_wording_differs, shingles
+
+
+# タイトル + description の shingle Jaccard がこれ以上、かつ subcategory 一致
+# かつタイトルの語の差分が言い回しだけなら同一タスクとみなす（"CSV export"/"PDF export" は別物）
+TASK_DUP_THRESHOLD = 0.8
+
+# 120 perm を 20 band x 6 row に分ける: Jaccard 0.8 のペアは ~99.8% 候補に上がり、0.4 だと ~8%
+TASK_MINHASH_PERM = 120
+TASK_LSH_BANDS = 20
+
+_PRIORITY_RANK = {"low": 0, "medium": 1, "high": 2}
+# description の定型見出しは全タスク共通なので類似度から外す
+_SECTION_RE = re.compile(r"\b(goal|changes|acceptance checks)\b")
+
+
+def _task_text(task: Dict[str, Any]) -> str:
+    # 2段階生成で description がまだプレースホルダなら title だけで比べる
+    desc = "" if task.get("description_status") == "pending" else str(task.get("description") or "")
+    t = normalize_text(f"{task.get('title', '')} {desc}")
+    return _SECTION_RE.sub(" ", t)
+
+
+class _UnionFind:
+    def __init__(self, n: int) -> None:
+        self.parent = list(range(n))
+
+    def find(self, x: int) -> int:
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> None:
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # 小さい index（先に出たタスク）を代表にする
+            if rb < ra:
+                ra, rb = rb, ra
+            self.parent[rb] = ra
+
+
+def dedup_tasks_across_groups(
+    group_results: List[Dict[str, Any]],
+    *,
+    threshold: float = TASK_DUP_THRESHOLD,
+    max_ac_per_task: int = 0,
+) -> Dict[str, Any]:
+    """
+    並列 taskgen でグループ間に出来た近似重複タスクを1つにまとめる（in-place）
+    - 候補: タイトル+description の MinHash/LSH（全ペア比較しない）
+    - 確認: shingle Jaccard >= threshold かつ subcategory 一致 かつ only_wording_differs(title)
+    - 連結成分（union-find）ごとに先頭タスクを残し、ac_ids を和集合にする
+      estimate_hours は最大、priority は高い方。残したタスクに merged_from を残す
+    - 和集合が max_ac_per_task（>0 のとき）を超える統合と、グループのタスクを0件にする統合はしない
+      （その重複タスクは元のグループに残す）
+    ac_ids は残したタスクへ移るので traceability のカバレッジは変わらない
+    戻り値: meta 用の dict（merges に統合内容）
+    """
+    refs: List[Tuple[int, Dict[str, Any]]] = []
+    for gi, gr in enumerate(group_results or []):
+        for t in (gr.get("tasks") or []) if isinstance(gr, dict) else []:
+            if isinstance(t, dict):
+                refs.append((gi, t))
+
+    n = len(refs)
+    sh: List[FrozenSet[str]] = [shingles(_task_text(t), k=4, normalized=True) for _gi, t in refs]
+    buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+    for i, s in enumerate(sh):
+        if not s:
+            continue
+        for band in lsh_keys(minhash_signature(s, num_perm=TASK_MINHASH_PERM), bands=TASK_LSH_BANDS):
+            buckets.setdefault(band, []).append(i)
+
+    uf = _UnionFind(n)
+    checked = set()
+    comparisons = 0
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        for x in range(len(members)):
+            for y in range(x + 1, len(members)):
+                a, b = members[x], members[y]
+                if (a, b) in checked:
+                    continue
+                checked.add((a, b))
+                comparisons += 1
+                ta, tb = refs[a][1], refs[b][1]
+                if ta.get("subcategory") != tb.get("subcategory"):
+                    continue
+                if jaccard(sh[a], sh[b]) < threshold:
+                    continue
+                if only_wording_differs(normalize_text(str(ta.get("title", ""))), normalize_text(str(tb.get("title", "")))):
+                    uf.union(a, b)
+
+    clusters: Dict[int, List[int]] = {}
+    for i in range(n):
+        clusters.setdefault(uf.find(i), []).append(i)
+
+    merges: List[Dict[str, Any]] = []
+    drop = set()
+    remaining: Dict[int, int] = {}  # グループごとの残りタスク数（0 にする統合はしない）
+    for gi, _t in refs:
+        remaining[gi] = remaining.get(gi, 0) + 1
+    skipped = 0
+    for root, members in clusters.items():
+        if len(members) < 2:
+            continue
+        keep_gi, keep = refs[root]
+        merged_from: List[Dict[str, Any]] = []
+        ac_ids = [a for a in (keep.get("ac_ids") or []) if isinstance(a, str)]
+        for m in members:
+            if m == root:
+                continue
+            gi, t = refs[m]
+            union = ac_ids + [a for a in (t.get("ac_ids") or []) if isinstance(a, str) and a not in ac_ids]
+            if (int(max_ac_per_task) > 0 and len(union) > int(max_ac_per_task)) or remaining[gi] <= 1:
+                skipped += 1
+                continue
+            ac_ids = union
+            remaining[gi] -= 1
+            try:
+                keep["estimate_hours"] = max(int(keep.get("estimate_hours", 1)), int(t.get("estimate_hours", 1)))
+            except (TypeError, ValueError):
+                pass
+            if _PRIORITY_RANK.get(str(t.get("priority", "")).lower(), -1) > _PRIORITY_RANK.get(
+                str(keep.get("priority", "")).lower(), -1
+            ):
+                keep["priority"] = t.get("priority")
+            merged_from.append(
+                {"group_id": str(group_results[gi].get("group_id", "")), "title": str(t.get("title", ""))}
+            )
+            drop.add(id(t))
+        if not merged_from:
+            continue
+        keep["ac_ids"] = ac_ids
+        keep["merged_from"] = list(keep.get("merged_from") or []) + merged_from
+        merges.append(
+            {
+                "kept": {"group_id": str(group_results[keep_gi].get("group_id", "")), "title": str(keep.get("title", ""))},
+                "merged": merged_from,
+                "ac_ids": ac_ids,
+            }
+        )
+
+    for gr in group_results or []:
+        if isinstance(gr, dict) and isinstance(gr.get("tasks"), list):
+            gr["tasks"] = [t for t in gr["tasks"] if id(t) not in drop]
+
+    return {
+        "enabled": True,
+        "threshold": float(threshold),
+        "tasks_before": n,
+        "tasks_after": n - len(drop),
+        "tasks_merged": len(drop),
+        "merges_skipped": skipped,
+        "comparisons": comparisons,
+        "merges": merges,
+    }
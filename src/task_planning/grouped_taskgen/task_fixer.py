@@ -0,0 +1,99 @@
+# src/task_planning/grouped_taskgen/task_fixer.py
+from __future__ import annotations
+
+import copy
+from typing import Any, Dict, List, Tuple
+
+from ..validate import (
+    AC_IDS_EMPTY,
+    ESTIMATE_NOT_NUMBER,
+    ESTIMATE_OUT_OF_RANGE,
+    RELATED_NOT_LIST,
+    TOO_MANY_ACS,
+    UNKNOWN_AC,
+    TaskIssue,
+)
+
+
+# 機械的に直せるものだけをローカルで直す（ac_ids の重複/未知 ID の除去、hours の丸めなど）。
+# 未カバー AC（COVERAGE_MISSING）は「どのタスクが担うか」の判断なので LLM repair に回す。
+# title/description の中身が悪いもの（section 欠落など）も同様。
+LOCALLY_FIXABLE = frozenset(
+    {
+        AC_IDS_EMPTY,
+        TOO_MANY_ACS,
+        UNKNOWN_AC,
+        ESTIMATE_NOT_NUMBER,
+        ESTIMATE_OUT_OF_RANGE,
+        RELATED_NOT_LIST,
+    }
+)
+
+
+def can_fix_locally(issues: List[TaskIssue]) -> bool:
+    return bool(issues) and all(x.code in LOCALLY_FIXABLE for x in issues)
+
+
+def local_fix_tasks(
+    tasks_obj: Dict[str, Any],
+    issues: List[TaskIssue],
+    *,
+    group_ac_ids: List[str],
+    max_ac_per_task: int,
+) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    structured issue を見て、LLM を呼ばずに決定的に直す
+    - unknown AC / 重複 AC は ac_ids から除去
+    - max_ac_per_task 超過分は切り離す（他のタスクが同じ AC を担っている場合だけ通る）
+    - ac_ids が空になったタスクは削除
+    結果に未カバー AC が残る場合や、直せない issue が1つでもあれば何もしない（fixes=[]）。
+    未カバー AC を別タスクへ割り当てることはしない（意味の違うタスクに紐づくため）。
+    戻り値: (tasks_obj, fixes)  fixes は適用内容の短い説明（meta 用）
+    """
+    if not can_fix_locally(issues):
+        return tasks_obj, []
+
+    # 直せなかった時に元の tasks_obj を壊さないようコピーに対して作業する
+    tasks: List[Dict[str, Any]] = [copy.deepcopy(t) for t in tasks_obj.get("tasks") or [] if isinstance(t, dict)]
+    group_set = set(group_ac_ids)
+    cap = max(1, int(max_ac_per_task))
+    fixes: List[str] = []
+
+    for i, t in enumerate(tasks, start=1):
+        ac_ids = t.get("ac_ids")
+        if not isinstance(ac_ids, list):
+            ac_ids = []
+        kept = [a for a in ac_ids if a in group_set]
+        if len(kept) != len(ac_ids):
+            fixes.append(f"tasks[{i}]: dropped unknown ac_ids {[a for a in ac_ids if a not in group_set]}")
+        if len(set(kept)) != len(kept):
+            kept = list(dict.fromkeys(kept))
+            fixes.append(f"tasks[{i}]: removed duplicate ac_ids")
+        if len(kept) > cap:
+            fixes.append(f"tasks[{i}]: detached {kept[cap:]} (max_ac_per_task={cap})")
+            kept = kept[:cap]
+        t["ac_ids"] = kept
+
+        eh = t.get("estimate_hours")
+        if not isinstance(eh, (int, float)) or not (1 <= float(eh) <= 4):
+            try:
+                h = int(eh)
+            except Exception:
+                h = 2
+            t["estimate_hours"] = min(4, max(1, h))
+            fixes.append(f"tasks[{i}]: clamped estimate_hours to {t['estimate_hours']}")
+        if not isinstance(t.get("related_task_titles"), list):
+            t["related_task_titles"] = []
+
+    covered = {a for t in tasks for a in t["ac_ids"]}
+    if any(a not in covered for a in group_ac_ids):
+        # 未カバーが残る → どのタスクに載せるかは LLM repair に任せる
+        return tasks_obj, []
+
+    kept_tasks = [t for t in tasks if t["ac_ids"]]
+    if len(kept_tasks) != len(tasks):
+        fixes.append(f"dropped {len(tasks) - len(kept_tasks)} task(s) without ac_ids")
+    if not kept_tasks:
+        return tasks_obj, []
+
+    return {"tasks": kept_tasks}, fixes
@@ -2,10 +2,12 @@
 from __future__ import annotations
 
 import json
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
 
 from ..llm import call_llm_json
-from ..validate import validate_tasks_obj
+from ..model_cascade import ModelCascade
+from ..validate import COVERAGE_MISSING, UNKNOWN_AC, TaskIssue, issue_messages, validate_group_tasks
+from .task_fixer import local_fix_tasks
 
 
 ALLOWED_SUBCATS = {"[Code][BE]", "[Code][FE]", "[Code][DB]", "[Test]", "[Doc]", "[Ops]"}
@@ -59,6 +61,74 @@ AC texts (ac_map subset):
 {ac_subset_json}
 """
 
+GROUP_SKELETON_USER = """Create task SKELETONS for this AC group (no descriptions yet).
+
+Hard constraints:
+- Output JSON only with schema: {{"tasks":[...]}}.
+- Task count must be between {min_tasks} and {max_tasks}.
+- Each task must be 1-4 hours (integer).
+- Each task MUST include "ac_ids": list of AC IDs that this task covers.
+- Each task may cover 1..{max_ac_per_task} ACs (avoid messy mixing).
+- Coverage rule: every AC ID in this group must appear in at least one task's ac_ids.
+- Prefer stable grouping by implementation touchpoint (same module/endpoint/middleware/db/etc).
+- Subcategory must be one of: [Code][BE], [Code][FE], [Code][DB], [Test], [Doc], [Ops].
+- Titles must be concrete (avoid "refine/clarify/define").
+- Do NOT write descriptions. Keep the output short.
+
+Task schema:
+{{
+  "tasks":[
+    {{
+      "title":"...",
+      "subcategory":"[Code][BE]|[Code][FE]|[Code][DB]|[Test]|[Doc]|[Ops]",
+      "priority":"Low|Medium|High",
+      "estimate_hours":2,
+      "ac_ids":["AC-001","AC-002"]
+    }}
+  ]
+}}
+
+Story (context):
+{story_json}
+
+AC group:
+group_id: {group_id}
+label: {group_label}
+ac_ids: {ac_ids_json}
+
+AC texts (ac_map subset):
+{ac_subset_json}
+"""
+
+GROUP_PACK_USER = """Create tasks for EACH of the following AC GROUPS (several small groups in one request).
+Treat every group independently: a task belongs to exactly one group and may only use that group's AC IDs.
+
+Hard constraints (per group):
+- Output JSON only with schema: {{"groups":[{{"group_id":"G01","tasks":[...]}}]}} with one entry per group below.
+- Task count per group must be between the group's min_tasks and max_tasks.
+- Each task must be 1-4 hours (integer).
+- Each task MUST include "ac_ids": list of AC IDs that this task covers (1..{max_ac_per_task} ids).
+- Coverage rule: every AC ID of a group must appear in at least one of that group's tasks.
+- Category must be "Task", status must be "Todo".
+- Subcategory must be one of: [Code][BE], [Code][FE], [Code][DB], [Test], [Doc], [Ops].
+- Titles must be concrete (avoid "refine/clarify/define").
+{extra_rules}
+Task schema:
+{task_schema}
+
+Story (context):
+{story_json}
+
+AC GROUPS:
+{groups_text}
+
+AC texts (ac_map subset, all groups):
+{ac_subset_json}
+"""
+
+_FULL_TASK_SCHEMA = """{"title":"...","category":"Task","subcategory":"[Code][BE]","status":"Todo","priority":"Low|Medium|High","estimate_hours":2,"ac_ids":["AC-001"],"related_task_titles":[],"description":"Goal:...\\nChanges:...\\nAcceptance checks:..."}"""
+_SKELETON_TASK_SCHEMA = """{"title":"...","subcategory":"[Code][BE]","priority":"Low|Medium|High","estimate_hours":2,"ac_ids":["AC-001"]}"""
+
 REPAIR_SYSTEM = """You fix tasks based on issues.
 Output JSON only. No extra text.
 """
@@ -74,6 +144,7 @@ Hard constraints:
 - category="Task", status="Todo"
 - subcategory must be in allowed set.
 
+{extra_rules}
 Issues:
 {issues_text}
 
@@ -81,6 +152,9 @@ Current tasks JSON:
 {tasks_json}
 """
 
+# skeleton モードで description が未生成であることを示すプレースホルダ
+PENDING_DESCRIPTION = "Goal:...\nChanges:...\nAcceptance checks:..."
+
 
 def _normalize_tasks(tasks: Any, *, max_tasks: int) -> Dict[str, Any]:
     if not isinstance(tasks, list):
@@ -95,7 +169,7 @@ def _normalize_tasks(tasks: Any, *, max_tasks: int) -> Dict[str, Any]:
         t.setdefault("status", "Todo")
         t.setdefault("priority", "Medium")
         t.setdefault("related_task_titles", [])
-        t.setdefault("description", "Goal:...\nChanges:...\nAcceptance checks:...")
+        t.setdefault("description", PENDING_DESCRIPTION)
 
         # subcategory normalize
         sub = str(t.get("subcategory") or "[Code][BE]").strip()
@@ -127,45 +201,61 @@ def _normalize_tasks(tasks: Any, *, max_tasks: int) -> Dict[str, Any]:
     return {"tasks": fixed[:max_tasks]}
 
 
-def _validate_group_coverage(
+def _check_tasks(
     tasks_obj: Dict[str, Any],
     *,
+    max_tasks: int,
     group_ac_ids: List[str],
+    group_set: FrozenSet[str],
     max_ac_per_task: int,
-) -> Tuple[bool, List[str]]:
-    issues: List[str] = []
-
-    tasks = tasks_obj.get("tasks", [])
-    if not isinstance(tasks, list) or not tasks:
-        return False, ["tasks must be a non-empty list"]
-
-    group_set = set(group_ac_ids)
-    seen: List[str] = []
-
-    for i, t in enumerate(tasks, start=1):
-        if not isinstance(t, dict):
-            issues.append(f"tasks[{i}] must be object")
-            continue
-
-        ac_ids = t.get("ac_ids")
-        if not isinstance(ac_ids, list) or not ac_ids:
-            issues.append(f"tasks[{i}].ac_ids must be non-empty list")
-            continue
-
-        if len(ac_ids) > int(max_ac_per_task):
-            issues.append(f"tasks[{i}].ac_ids exceeds max_ac_per_task ({len(ac_ids)} > {max_ac_per_task})")
-
-        for a in ac_ids:
-            if a not in group_set:
-                issues.append(f"tasks[{i}].ac_ids contains unknown id: {a}")
-            else:
-                seen.append(a)
+) -> Tuple[bool, List[TaskIssue], List[str]]:
+    """
+    1パス validate → 不合格ならローカル修正して再 validate
+    tasks_obj はローカル修正が効いた場合その場で置き換える。
+    戻り値: (ok, issues, local_fixes)
+    """
+    kw = dict(
+        max_tasks=int(max_tasks),
+        group_ac_ids=group_ac_ids,
+        group_set=group_set,
+        max_ac_per_task=int(max_ac_per_task),
+    )
+    ok, issues = validate_group_tasks(tasks_obj, **kw)
+    if ok:
+        return ok, issues, []
+
+    fixed, fixes = local_fix_tasks(tasks_obj, issues, group_ac_ids=group_ac_ids, max_ac_per_task=int(max_ac_per_task))
+    if not fixes:
+        return ok, issues, []
+    ok2, issues2 = validate_group_tasks(fixed, **kw)
+    if not ok2:
+        return ok, issues, []
+    tasks_obj["tasks"] = fixed["tasks"]
+    return ok2, issues2, fixes
+
+
+def _repair_issues_text(issues: List[TaskIssue], *, group_ac_ids: List[str]) -> str:
+    lines = [f"- {x.message}" for x in issues]
+    codes = {x.code for x in issues}
+    if UNKNOWN_AC in codes:
+        lines.append(f"- Only these AC IDs are allowed: {group_ac_ids}")
+    if COVERAGE_MISSING in codes:
+        missing = [a for x in issues if x.code == COVERAGE_MISSING for a in x.detail]
+        lines.append(f"- Add tasks (or extend ac_ids) so that these ACs are covered: {missing}")
+    return "\n".join(lines)
+
+
+def _task_bounds(n_acs: int, max_tasks_per_ac: int) -> Tuple[int, int]:
+    # 目標: 1ACあたり最小1タスク、最大 max_tasks_per_ac タスク
+    min_tasks = max(1, int(n_acs))
+    max_tasks = max(min_tasks, min(20, int(int(n_acs) * float(max_tasks_per_ac))))
+    return min_tasks, max_tasks
 
-    missing = [a for a in group_ac_ids if a not in set(seen)]
-    if missing:
-        issues.append(f"coverage missing ACs: {missing}")
 
-    return (len(issues) == 0), issues
+def _mark_pending(tasks: List[Dict[str, Any]]) -> None:
+    for t in tasks:
+        if t.get("description") == PENDING_DESCRIPTION:
+            t["description_status"] = "pending"
 
 
 def generate_tasks_for_group(
@@ -177,6 +267,8 @@ def generate_tasks_for_group(
     max_ac_per_task: int = 2,
     max_tasks_per_ac: int = 2,
     max_repairs: int = 1,
+    skeleton_only: bool = False,
+    cascade: Optional[ModelCascade] = None,
 ) -> Dict[str, Any]:
     """
     group (dict):
@@ -185,6 +277,13 @@ def generate_tasks_for_group(
       - ac_ids: list[str]
     output:
       - group_id, label, ac_ids, tasks, validate/meta
+    skeleton_only:
+      True なら title/subcategory/estimate/ac_ids だけ生成する（2段階 taskgen の1段目）。
+      description はプレースホルダのまま description_status="pending" を付ける。
+      （2段目は describe_agent.fill_group_descriptions / API から必要な分だけ）
+    cascade:
+      "taskgen" の tier を安い順に試す。下位 tier が検証（ローカル修正込み）に落ちたら
+      repair せず上位 tier で生成し直し、repair は最上位 tier でだけ行う。
     """
     group_id = str(group.get("group_id", "") or "").strip() or "G??"
     label = str(group.get("label", "") or "").strip()
@@ -199,17 +298,20 @@ def generate_tasks_for_group(
         }
 
     group_ac_ids = [str(x).strip() for x in ac_ids if str(x).strip()]
+    group_set = frozenset(group_ac_ids)
     ac_subset = {a: ac_map.get(a, "") for a in group_ac_ids}
 
-    # 目標: 1ACあたり最小1タスク、最大 max_tasks_per_ac タスク
-    min_tasks = max(1, len(group_ac_ids))
-    max_tasks = max(min_tasks, min(20, int(len(group_ac_ids) * float(max_tasks_per_ac))))
+    min_tasks, max_tasks = _task_bounds(len(group_ac_ids), max_tasks_per_ac)
 
     story_json = json.dumps(story, ensure_ascii=False)
     ac_ids_json = json.dumps(group_ac_ids, ensure_ascii=False)
     ac_subset_json = json.dumps(ac_subset, ensure_ascii=False, indent=2)
 
-    prompt = GROUP_TASKGEN_USER.format(
+    user_template = GROUP_SKELETON_USER if skeleton_only else GROUP_TASKGEN_USER
+    out_tokens = 700 if skeleton_only else 1800
+    extra_rules = "- Do NOT write descriptions (skeleton mode).\n" if skeleton_only else ""
+
+    prompt = user_template.format(
         min_tasks=int(min_tasks),
         max_tasks=int(max_tasks),
         max_ac_per_task=int(max_ac_per_task),
@@ -220,33 +322,53 @@ def generate_tasks_for_group(
         ac_subset_json=ac_subset_json,
     )
 
-    raw = call_llm_json(
-        model=model,
-        messages=[
-            {"role": "system", "content": GROUP_TASKGEN_SYSTEM},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=0.1,
-        max_tokens=1800,
+    # validate（形式 + group coverage を1パス）→ ac_ids 系だけならローカル修正
+    check = dict(
+        max_tasks=int(max_tasks),
+        group_ac_ids=group_ac_ids,
+        group_set=group_set,
+        max_ac_per_task=int(max_ac_per_task),
     )
-    tasks_obj = _normalize_tasks(raw.get("tasks", []), max_tasks=int(max_tasks))
 
-    # validate (既存validate + group coverage)
-    ok1, issues1 = validate_tasks_obj(tasks_obj, max_tasks=int(max_tasks))
-    ok2, issues2 = _validate_group_coverage(tasks_obj, group_ac_ids=group_ac_ids, max_ac_per_task=int(max_ac_per_task))
+    tiers = cascade.tiers("taskgen") if cascade is not None else (model,)
+    for tier, model in enumerate(tiers):
+        last = tier == len(tiers) - 1
+        try:
+            raw = call_llm_json(
+                model=model,
+                messages=[
+                    {"role": "system", "content": GROUP_TASKGEN_SYSTEM},
+                    {"role": "user", "content": prompt},
+                ],
+                temperature=0.1,
+                max_tokens=out_tokens,
+                stage="taskgen",
+            )
+        except Exception:
+            if cascade is None or last:
+                raise
+            cascade.record("taskgen", model, False)
+            cascade.escalate("taskgen")
+            continue
+        tasks_obj = _normalize_tasks(raw.get("tasks", []), max_tasks=int(max_tasks))
+        ok, issues, local_fixes = _check_tasks(tasks_obj, **check)
+        if cascade is not None:
+            cascade.record("taskgen", model, ok)
+            if not ok and not last:
+                cascade.escalate("taskgen")
+        if ok:
+            break
 
     repairs = 0
-    issues = issues1 + issues2
-    ok = bool(ok1 and ok2)
-
     while (not ok) and repairs < int(max_repairs):
-        issues_text = "\n".join([f"- {x}" for x in issues])
+        issues_text = _repair_issues_text(issues, group_ac_ids=group_ac_ids)
         tasks_json = json.dumps(tasks_obj, ensure_ascii=False, indent=2)
 
         rep_prompt = REPAIR_USER.format(
             min_tasks=int(min_tasks),
             max_tasks=int(max_tasks),
             max_ac_per_task=int(max_ac_per_task),
+            extra_rules=extra_rules,
             issues_text=issues_text,
             tasks_json=tasks_json,
         )
@@ -257,20 +379,164 @@ def generate_tasks_for_group(
                 {"role": "user", "content": rep_prompt},
             ],
             temperature=0.0,
-            max_tokens=1800,
+            max_tokens=out_tokens,
+            stage="taskgen_repair",
         )
         tasks_obj = _normalize_tasks(rep_raw.get("tasks", []), max_tasks=int(max_tasks))
 
-        ok1, issues1 = validate_tasks_obj(tasks_obj, max_tasks=int(max_tasks))
-        ok2, issues2 = _validate_group_coverage(tasks_obj, group_ac_ids=group_ac_ids, max_ac_per_task=int(max_ac_per_task))
-        issues = issues1 + issues2
-        ok = bool(ok1 and ok2)
+        ok, issues, fixes = _check_tasks(tasks_obj, **check)
+        local_fixes.extend(fixes)
         repairs += 1
 
-    return {
+    tasks = tasks_obj.get("tasks", [])
+    if skeleton_only:
+        _mark_pending(tasks)
+
+    out = {
         "group_id": group_id,
         "label": label,
         "ac_ids": group_ac_ids,
-        "validate": {"pass": ok, "issues": issues, "repairs_used": repairs},
-        "tasks": tasks_obj.get("tasks", []),
-    }
\ No newline at end of file
+        "validate": {
+            "pass": ok,
+            "issues": issue_messages(issues),
+            "issue_codes": sorted({x.code for x in issues}),
+            "repairs_used": repairs,
+            "local_fixes": local_fixes,
+        },
+        "tasks": tasks,
+    }
+    if cascade is not None:
+        out["meta"] = {"model": model, "cascade_tier": tier}
+    return out
+
+
+def generate_tasks_for_group_pack(
+    *,
+    model: str,
+    story: Dict[str, Any],
+    groups: List[Dict[str, Any]],
+    ac_map: Dict[str, str],
+    max_ac_per_task: int = 2,
+    max_tasks_per_ac: int = 2,
+    max_repairs: int = 1,
+    skeleton_only: bool = False,
+    cascade: Optional[ModelCascade] = None,
+) -> List[Dict[str, Any]]:
+    """
+    小さいグループを1回の LLM 呼び出しでまとめて taskgen する（packer.pack_small_groups 用）
+    - 出力はグループごとに分割し、グループ単位で validate / coverage を確認
+    - 不合格 or 欠落したグループだけ generate_tasks_for_group で単独再実行
+    戻り値は groups と同じ順の group result（generate_tasks_for_group と同じ形）
+    cascade があればパック呼び出しは "taskgen" の最下位 tier で行い、
+    不合格グループの単独再実行は cascade の昇格に任せる
+    """
+    if len(groups) == 1:
+        return [
+            generate_tasks_for_group(
+                model=model,
+                story=story,
+                group=groups[0],
+                ac_map=ac_map,
+                max_ac_per_task=max_ac_per_task,
+                max_tasks_per_ac=max_tasks_per_ac,
+                max_repairs=max_repairs,
+                skeleton_only=skeleton_only,
+                cascade=cascade,
+            )
+        ]
+
+    specs: List[Dict[str, Any]] = []
+    all_ids: List[str] = []
+    for g in groups:
+        gid = str(g.get("group_id", "") or "").strip() or "G??"
+        ids = [str(x).strip() for x in (g.get("ac_ids") or []) if str(x).strip()]
+        lo, hi = _task_bounds(len(ids), max_tasks_per_ac)
+        specs.append({"group_id": gid, "label": str(g.get("label", "") or "").strip(), "ac_ids": ids, "min": lo, "max": hi})
+        all_ids.extend(ids)
+
+    groups_text = "\n\n".join(
+        f"group_id: {sp['group_id']}\nlabel: {sp['label']}\nac_ids: {json.dumps(sp['ac_ids'], ensure_ascii=False)}\n"
+        f"min_tasks: {sp['min']}\nmax_tasks: {sp['max']}"
+        for sp in specs
+    )
+    prompt = GROUP_PACK_USER.format(
+        max_ac_per_task=int(max_ac_per_task),
+        extra_rules="- Do NOT write descriptions (skeleton mode).\n" if skeleton_only else "",
+        task_schema=_SKELETON_TASK_SCHEMA if skeleton_only else _FULL_TASK_SCHEMA,
+        story_json=json.dumps(story, ensure_ascii=False),
+        groups_text=groups_text,
+        ac_subset_json=json.dumps({a: ac_map.get(a, "") for a in all_ids}, ensure_ascii=False, indent=2),
+    )
+
+    pack_model = cascade.tiers("taskgen")[0] if cascade is not None else model
+    by_gid: Dict[str, Any] = {}
+    try:
+        per_group_tokens = 400 if skeleton_only else 1200
+        raw = call_llm_json(
+            model=pack_model,
+            messages=[
+                {"role": "system", "content": GROUP_TASKGEN_SYSTEM},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=0.1,
+            max_tokens=min(4000, per_group_tokens * len(specs)),
+            stage="taskgen_pack",
+        )
+        for item in raw.get("groups") or []:
+            if isinstance(item, dict) and isinstance(item.get("group_id"), str):
+                by_gid[item["group_id"].strip()] = item.get("tasks")
+    except Exception:
+        by_gid = {}
+
+    results: List[Dict[str, Any]] = []
+    for g, sp in zip(groups, specs):
+        tasks_obj = _normalize_tasks(by_gid.get(sp["group_id"], []), max_tasks=int(sp["max"]))
+        ok, _, local_fixes = _check_tasks(
+            tasks_obj,
+            max_tasks=int(sp["max"]),
+            group_ac_ids=sp["ac_ids"],
+            group_set=frozenset(sp["ac_ids"]),
+            max_ac_per_task=int(max_ac_per_task),
+        )
+        if cascade is not None:
+            cascade.record("taskgen_pack", pack_model, ok)
+
+        if ok:
+            tasks = tasks_obj.get("tasks", [])
+            if skeleton_only:
+                _mark_pending(tasks)
+            results.append(
+                {
+                    "group_id": sp["group_id"],
+                    "label": sp["label"],
+                    "ac_ids": sp["ac_ids"],
+                    "validate": {
+                        "pass": True,
+                        "issues": [],
+                        "issue_codes": [],
+                        "repairs_used": 0,
+                        "local_fixes": local_fixes,
+                    },
+                    "tasks": tasks,
+                    "meta": {"packed": True, "pack_size": len(specs)},
+                }
+            )
+            continue
+
+        # パック結果が不合格 → このグループだけ単独で作り直す（repair 込み）
+        solo = generate_tasks_for_group(
+            model=model,
+            story=story,
+            group=g,
+            ac_map=ac_map,
+            max_ac_per_task=max_ac_per_task,
+            max_tasks_per_ac=max_tasks_per_ac,
+            max_repairs=max_repairs,
+            skeleton_only=skeleton_only,
+            cascade=cascade,
+        )
+        solo.setdefault("meta", {})
+        solo["meta"].update({"packed": True, "pack_size": len(specs), "rerun_alone": True})
+        results.append(solo)
+
+    return results
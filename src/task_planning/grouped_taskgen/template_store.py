@@ -0,0 +1,332 @@
+# src/task_planning/grouped_taskgen/template_store.py
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ..similarity import (
+    content_text,
+    jaccard,
+    lsh_keys,
+    minhash_signature,
+    normalize_text,
+    only_wording_differs,
+    shingles,
+)
+from ..validate import validate_group_tasks
+
+try:  # ストアファイルをプロセス間で共有する時のロック（Windows では無効）
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore
+
+
+STORE_VERSION = 1
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_NEAR_THRESHOLD = 0.7
+MAX_TEMPLATES_PER_AC = 4
+
+# 再利用するタスクのフィールド（ac_ids はグループごとに付け直す）
+_TEMPLATE_KEYS = [
+    "title",
+    "category",
+    "subcategory",
+    "status",
+    "priority",
+    "estimate_hours",
+    "related_task_titles",
+    "description",
+]
+
+
+def _ac_key(norm: str) -> str:
+    return hashlib.sha1(norm.encode("utf-8")).hexdigest()
+
+
+def _template_id(task: Dict[str, Any]) -> str:
+    raw = json.dumps([task.get("title", ""), task.get("description", "")], ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+@contextmanager
+def _file_lock(path: str) -> Iterator[None]:
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", "a+") as lf:
+        fcntl.flock(lf, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lf, fcntl.LOCK_UN)
+
+
+class TemplateStore:
+    """
+    ストーリーをまたいで「正規化 AC 文 → 検証済みタスク」を覚えておく永続ストア（JSON 1ファイル）
+    - 完全一致: 正規化テキストの sha1
+    - 近似一致: MinHash/LSH で候補を引き、Jaccard + only_wording_differs で確認
+    - 退避: max_entries を超えたら last_used の古いものから捨てる（LRU）
+    - スレッド内は Lock、プロセス間は save 時のファイルロック + 読み直しマージで共有
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        near_threshold: float = DEFAULT_NEAR_THRESHOLD,
+    ) -> None:
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        self.near_threshold = float(near_threshold)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._bands: Dict[Tuple[int, Tuple[int, ...]], List[str]] = {}
+        self._shingles: Dict[str, Any] = {}
+        self._dirty: Dict[str, Dict[str, Any]] = {}
+        self.stats: Dict[str, int] = {
+            "lookups": 0,
+            "exact_hits": 0,
+            "near_hits": 0,
+            "misses": 0,
+            "groups_reused": 0,
+            "groups_partial": 0,
+            "groups_reuse_rejected": 0,
+            "stored": 0,
+            "evicted": 0,
+        }
+        self._load()
+
+    # -------------------------
+    # Persistence
+    # -------------------------
+    def _read_disk(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                obj = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(obj, dict) or obj.get("version") != STORE_VERSION:
+            return {}
+        entries = obj.get("entries")
+        return entries if isinstance(entries, dict) else {}
+
+    def _index(self, key: str, entry: Dict[str, Any]) -> None:
+        sh = shingles(content_text(entry.get("norm", "")), normalized=True)
+        self._shingles[key] = sh
+        for band in lsh_keys(minhash_signature(sh)):
+            self._bands.setdefault(band, []).append(key)
+
+    def _load(self) -> None:
+        self._entries = self._read_disk()
+        self._bands = {}
+        self._shingles = {}
+        for key, entry in self._entries.items():
+            self._index(key, entry)
+
+    def save(self) -> None:
+        """
+        変更分だけをディスクの最新版にマージして書き戻す（他プロセスの追記を消さない）
+        書き込みは一時ファイル + os.replace で原子的に行う
+        """
+        with self._lock:
+            dirty = dict(self._dirty)
+            self._dirty = {}
+        if not dirty:
+            return
+
+        d = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(d, exist_ok=True)
+        with _file_lock(self.path):
+            entries = self._read_disk()
+            for key, entry in dirty.items():
+                cur = entries.get(key)
+                if cur is None or float(entry.get("last_used", 0)) >= float(cur.get("last_used", 0)):
+                    if cur is not None:
+                        entry = {**entry, "hits": max(int(entry.get("hits", 0)), int(cur.get("hits", 0)))}
+                    entries[key] = entry
+
+            if len(entries) > self.max_entries:
+                ordered = sorted(entries.items(), key=lambda kv: float(kv[1].get("last_used", 0)), reverse=True)
+                self.count("evicted", len(entries) - self.max_entries)
+                entries = dict(ordered[: self.max_entries])
+
+            fd, tmp = tempfile.mkstemp(dir=d, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"version": STORE_VERSION, "entries": entries}, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+
+    # -------------------------
+    # Lookup
+    # -------------------------
+    def _find(self, ac_text: str) -> Tuple[Optional[str], str]:
+        norm = normalize_text(ac_text)
+        if not norm:
+            return None, "miss"
+        key = _ac_key(norm)
+        if key in self._entries:
+            return key, "exact"
+
+        sh = shingles(content_text(norm), normalized=True)
+        cands = {k for band in lsh_keys(minhash_signature(sh)) for k in self._bands.get(band, ())}
+        best, best_score = None, 0.0
+        for k in sorted(cands):
+            e = self._entries.get(k)
+            if e is None:
+                continue
+            score = jaccard(sh, self._shingles[k])
+            if score >= self.near_threshold and score > best_score and only_wording_differs(norm, e["norm"]):
+                best, best_score = k, score
+        return best, ("near" if best else "miss")
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.stats[name] += int(n)
+
+    def lookup(self, ac_text: str) -> Optional[Tuple[Tuple[str, str], List[Dict[str, Any]]]]:
+        """
+        AC 文に対応する ((key, "exact"|"near"), タスクテンプレ)（無ければ None）
+        ヒットの計上と last_used/hits の更新は、再利用が確定してから accept_hits で行う
+        """
+        with self._lock:
+            self.stats["lookups"] += 1
+            key, kind = self._find(ac_text)
+            if key is None:
+                self.stats["misses"] += 1
+                return None
+            return (key, kind), copy.deepcopy(self._entries[key].get("tasks") or [])
+
+    def accept_hits(self, hits: List[Tuple[str, str]]) -> None:
+        """
+        実際に使ったテンプレだけをヒットとして数える（検証で捨てた再利用は hit_rate に入れない）
+        """
+        now = time.time()
+        with self._lock:
+            for key, kind in hits:
+                self.stats["exact_hits" if kind == "exact" else "near_hits"] += 1
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                entry["last_used"] = now
+                entry["hits"] = int(entry.get("hits", 0)) + 1
+                self._dirty[key] = entry
+
+    # -------------------------
+    # Record
+    # -------------------------
+    def record_group(self, group_result: Dict[str, Any], ac_map: Dict[str, str]) -> int:
+        """
+        検証済み（validate.pass）のグループ結果からテンプレを登録する
+        - description が pending/fallback のタスクは登録しない
+        - 既に登録済みの AC は上書きしない（最初に検証を通ったものを使い続ける）
+        戻り値: 新規登録した AC 数
+        """
+        if not bool((group_result.get("validate") or {}).get("pass")):
+            return 0
+
+        per_ac: Dict[str, List[Dict[str, Any]]] = {}
+        for t in group_result.get("tasks") or []:
+            if not isinstance(t, dict) or t.get("description_status") in ("pending", "fallback"):
+                continue
+            tpl = {k: copy.deepcopy(t.get(k)) for k in _TEMPLATE_KEYS}
+            tpl["template_id"] = _template_id(t)
+            for a in t.get("ac_ids") or []:
+                if a in ac_map:
+                    per_ac.setdefault(a, []).append(tpl)
+
+        added = 0
+        now = time.time()
+        with self._lock:
+            for a, tpls in per_ac.items():
+                norm = normalize_text(ac_map[a])
+                if not norm:
+                    continue
+                key = _ac_key(norm)
+                if key in self._entries:
+                    continue
+                entry = {
+                    "norm": norm,
+                    "ac_text": ac_map[a],
+                    "tasks": tpls[:MAX_TEMPLATES_PER_AC],
+                    "hits": 0,
+                    "created": now,
+                    "last_used": now,
+                }
+                self._entries[key] = entry
+                self._index(key, entry)
+                self._dirty[key] = entry
+                added += 1
+            self.stats["stored"] += added
+        return added
+
+    def meta(self) -> Dict[str, Any]:
+        with self._lock:
+            s = dict(self.stats)
+        s["hit_rate"] = round((s["exact_hits"] + s["near_hits"]) / s["lookups"], 4) if s["lookups"] else 0.0
+        s["entries"] = len(self._entries)
+        return s
+
+
+# -------------------------
+# Reuse for a group
+# -------------------------
+def reuse_group_tasks(
+    store: TemplateStore,
+    group: Dict[str, Any],
+    ac_map: Dict[str, str],
+    *,
+    max_tasks: int,
+    max_ac_per_task: int,
+) -> Tuple[List[Dict[str, Any]], List[str], List[Tuple[str, str]]]:
+    """
+    グループの AC ごとにテンプレを引いてタスクを組み立てる
+    - 同じ template_id のタスクは1つにまとめて ac_ids を合わせる（max_ac_per_task まで）
+    - 組み立てたタスクが validate を通らなければ再利用しない（全 AC を novel 扱い）
+    戻り値: (reused_tasks, novel_ac_ids, hits)  novel_ac_ids だけ LLM に回す。
+    hits は再利用が確定したら store.accept_hits に渡す（ここではまだ数えない）
+    """
+    ac_ids = [a for a in (group.get("ac_ids") or []) if isinstance(a, str)]
+    by_tpl: Dict[str, Dict[str, Any]] = {}
+    covered: List[str] = []
+    novel: List[str] = []
+    hits: List[Tuple[str, str]] = []
+
+    for a in ac_ids:
+        found = store.lookup(ac_map.get(a, ""))
+        if found is None or not found[1]:
+            novel.append(a)
+            continue
+        hit, tpls = found
+        hits.append(hit)
+        covered.append(a)
+        for tpl in tpls:
+            tid = tpl.get("template_id") or _template_id(tpl)
+            t = by_tpl.get(tid)
+            if t is not None and len(t["ac_ids"]) < int(max_ac_per_task):
+                t["ac_ids"].append(a)
+                continue
+            if t is not None:
+                tid = f"{tid}:{a}"
+            by_tpl[tid] = {**{k: v for k, v in tpl.items() if k != "template_id"}, "ac_ids": [a], "template_id": tid}
+
+    tasks = list(by_tpl.values())
+    if not tasks:
+        return [], ac_ids, []
+
+    ok, _ = validate_group_tasks(
+        {"tasks": tasks},
+        max_tasks=int(max_tasks),
+        group_ac_ids=covered,
+        max_ac_per_task=int(max_ac_per_task),
+    )
+    if not ok:
+        return [], ac_ids, []
+    return tasks, novel, hits
@@ -1,9 +1,11 @@
 # src/task_planning/grouping/cluster_agent.py
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional, Set
 
 from .schema import (
+    ac_log_kinds,
+    build_grouping_index,
     normalize_grouping_obj,
     validate_grouping,
     simple_fallback_grouping,
@@ -13,13 +15,20 @@ from .schema import (
     DEFAULT_MAX_GROUPS,
     DEFAULT_MIN_GROUP_SIZE,
 )
-from ..llm import call_llm_json
+from ..deadline import MIN_CALL_S, RESERVE_S, Deadline, DeadlineExceeded
+from ..llm import call_llm_json, stream_llm_text
+from ..model_cascade import ModelCascade
 
+from .edit_ops import apply_grouping_edits
+from .local_cluster import local_constrained_grouping
+from .stream_parse import GroupStreamParser, check_streamed_group
 from .cluster_support import (
     CLUSTER_SYSTEM,
     REPAIR_SYSTEM,
+    EDIT_SYSTEM,
     build_cluster_prompt,
     build_repair_prompt,
+    build_edit_prompt,
     split_issues,
     policy_meta,
     derive_effective_policy,
@@ -27,6 +36,36 @@ from .cluster_support import (
 )
 
 
+# 実現可能な最大群数がこれ以下なら「群の選択肢が自明」とみなし LLM を省略する
+FAST_PATH_MAX_GROUPS = 2
+
+
+def _local_grouping(
+    ac_map: Dict[str, str],
+    *,
+    max_ac_per_group: int,
+    eff: Any,
+) -> Dict[str, Any]:
+    """
+    ローカルクラスタリング（LLM不要）。万一失敗したらキーワードバケットに落とす。
+    """
+    try:
+        return local_constrained_grouping(
+            ac_map,
+            max_ac_per_group=max_ac_per_group,
+            min_group_size=eff.min_group_size,
+            target_groups_min=eff.target_min,
+            target_groups_max=eff.target_max,
+            max_groups=eff.max_groups,
+        )
+    except Exception:
+        return simple_fallback_grouping(
+            ac_map,
+            max_ac_per_group=max_ac_per_group,
+            min_group_size=eff.min_group_size,
+        )
+
+
 def cluster_acs(
     *,
     model: str,
@@ -38,7 +77,36 @@ def cluster_acs(
     max_groups: int = DEFAULT_MAX_GROUPS,
     min_group_size: int = DEFAULT_MIN_GROUP_SIZE,
     max_repairs: int = 1,
+    output_mode: str = "full",
+    fast_path: bool = True,
+    deadline: Optional[Deadline] = None,
+    cascade: Optional[ModelCascade] = None,
+    on_group: Optional[Callable[[Dict[str, Any]], None]] = None,
 ) -> Dict[str, Any]:
+    """
+    output_mode:
+      - "full": LLM が groups JSON 全体を出力する（従来）
+      - "edit": ローカルクラスタリングを seed にし、LLM は edit ops だけ返す
+                （適用・検証は Python 側。出力トークン/レイテンシ削減用）
+      - "local": LLM を呼ばずローカルクラスタリングのみ（オフライン/縮退運転用）
+      - "stream": full と同じプロンプトをストリーミングで受け、groups[*] が閉じるたびに
+                  グループ単位のハード制約（サイズ/未知・重複 AC/ログ分離）を見て on_group(group) を呼ぶ
+                  （taskgen の先行 dispatch 用）。最終結果の検証/repair/fallback は full と同じ。
+    fast_path:
+      実現可能な群数が FAST_PATH_MAX_GROUPS 以下（小さいストーリー）で、
+      ローカルクラスタリングが全ハード制約を満たすなら LLM 呼び出しを省略する。
+      使ったかどうかは grouping.meta.fast_path に記録する。
+    deadline:
+      LLM 呼び出しの timeout をこの残り時間に合わせる。間に合わなければ repair を打ち切り、
+      simple_fallback_grouping（キーワードバケット）に落として meta.deadline_exceeded=True を付ける。
+    cascade:
+      "cluster" の tier を安い順に試す（full / edit / stream。local と fast_path では使わない）。下位 tier の
+      初回結果がハード制約に落ちたら repair せず上位 tier で初回からやり直し、repair は最上位 tier でだけ行う。
+      stream で昇格した場合、下位 tier で先行 dispatch 済みの group / AC は上位 tier の出力から再送しない。
+    """
+    output_mode = str(output_mode).strip().lower()
+    if output_mode not in ("full", "edit", "local", "stream"):
+        output_mode = "full"
 
     eff = derive_effective_policy(
         n_acs=len(ac_map),
@@ -48,43 +116,53 @@ def cluster_acs(
         min_group_size=min_group_size,
     )
 
-    prompt = build_cluster_prompt(
-        story=story,
-        ac_map=ac_map,
-        max_ac_per_group=max_ac_per_group,
-        effective_target_min=eff.target_min,
-        effective_target_max=eff.target_max,
-        effective_max_groups=eff.max_groups,
-        min_group_size=eff.min_group_size,
-    )
-
     last_err = ""
     warnings: List[str] = []
     grouping_obj: Dict[str, Any] = {}
+    edit_reports: List[Dict[str, Any]] = []
+    deadline_hit = False
 
-    # initial
-    try:
-        raw = call_llm_json(
-            model=model,
+    def _out_of_time() -> bool:
+        return deadline is not None and deadline.expired(margin=MIN_CALL_S + RESERVE_S)
+
+    def _call_edit(seed_obj: Dict[str, Any], m: str, issues_text: str = "") -> Dict[str, Any]:
+        edit_prompt = build_edit_prompt(
+            story=story,
+            ac_map=ac_map,
+            seed_obj=seed_obj,
+            max_ac_per_group=max_ac_per_group,
+            effective_target_min=eff.target_min,
+            effective_target_max=eff.target_max,
+            effective_max_groups=eff.max_groups,
+            min_group_size=eff.min_group_size,
+            issues_text=issues_text,
+        )
+        raw_ops = call_llm_json(
+            model=m,
             messages=[
-                {"role": "system", "content": CLUSTER_SYSTEM},
-                {"role": "user", "content": prompt},
+                {"role": "system", "content": EDIT_SYSTEM},
+                {"role": "user", "content": edit_prompt},
             ],
             temperature=0.0,
-            max_tokens=1800,
+            max_tokens=700,
+            deadline=deadline,
+            stage="cluster_edit",
         )
-        grouping_obj = normalize_grouping_obj(raw)
-    except Exception as e:
-        last_err = f"initial_call_failed: {type(e).__name__}: {e}"
-        grouping_obj = {}
+        edited, report = apply_grouping_edits(seed_obj, raw_ops, ac_map=ac_map)
+        edit_reports.append(report)
+        return edited
 
-    # validate + repair
-    for attempt in range(0, int(max_repairs) + 1):
-        if not grouping_obj:
-            break
+    # AC ごとの log kind は候補が変わっても不変なので1回だけ計算する
+    kinds = ac_log_kinds(ac_map)
 
-        ok, issues = validate_grouping(
-            grouping_obj,
+    # fast path: 群の選択肢が 1〜2 しかないなら LLM を呼ぶ意味がほぼ無い
+    fast_path_meta: Dict[str, Any] = {"used": False}
+    if fast_path and output_mode != "local" and eff.max_groups <= FAST_PATH_MAX_GROUPS:
+        local_obj = normalize_grouping_obj(
+            _local_grouping(ac_map, max_ac_per_group=max_ac_per_group, eff=eff)
+        )
+        ok_fp, issues_fp = validate_grouping(
+            local_obj,
             ac_map=ac_map,
             max_ac_per_group=max_ac_per_group,
             target_groups_min=eff.target_min,
@@ -92,21 +170,135 @@ def cluster_acs(
             max_groups=eff.max_groups,
             min_group_size=eff.min_group_size,
             require_log_split=True,
+            index=build_grouping_index(local_obj, ac_map=ac_map, log_kinds=kinds),
         )
+        hard_fp, _ = split_issues(issues_fp)
+        if ok_fp and not hard_fp:
+            grouping_obj = local_obj
+            max_repairs = 0
+            fast_path_meta = {
+                "used": True,
+                "reason": "degenerate_group_space",
+                "n_acs": len(ac_map),
+                "max_feasible_groups": eff.max_groups,
+            }
+
+    use_cascade = cascade is not None and output_mode != "local" and not fast_path_meta["used"]
+    tiers = cascade.tiers("cluster") if (cascade is not None and use_cascade) else (model,)
+    tier = 0
 
-        hard, warn = split_issues(issues)
-        warnings = warn
+    # stream: 先行 dispatch 済みの AC / group_id（cascade 昇格でやり直しても二重には流さない）
+    streamed_claimed: Set[str] = set()
+    streamed_ids: Set[str] = set()
+    streamed: List[str] = []
 
-        if ok and not hard:
+    def _initial(m: str) -> Dict[str, Any]:
+        if output_mode == "edit":
+            seed = _local_grouping(ac_map, max_ac_per_group=max_ac_per_group, eff=eff)
+            seed["meta"] = {}
+            return _call_edit(seed, m)
+        prompt = build_cluster_prompt(
+            story=story,
+            ac_map=ac_map,
+            max_ac_per_group=max_ac_per_group,
+            effective_target_min=eff.target_min,
+            effective_target_max=eff.target_max,
+            effective_max_groups=eff.max_groups,
+            min_group_size=eff.min_group_size,
+        )
+        messages = [
+            {"role": "system", "content": CLUSTER_SYSTEM},
+            {"role": "user", "content": prompt},
+        ]
+        if output_mode == "stream":
+            parser = GroupStreamParser()
+            for chunk in stream_llm_text(
+                model=m, messages=messages, temperature=0.0, max_tokens=1800, deadline=deadline, stage="cluster"
+            ):
+                for g in parser.feed(chunk):
+                    ok_g = check_streamed_group(
+                        g,
+                        ac_map=ac_map,
+                        log_kinds=kinds,
+                        claimed=streamed_claimed,
+                        seen_ids=streamed_ids,
+                        max_ac_per_group=max_ac_per_group,
+                        min_group_size=eff.min_group_size,
+                    )
+                    if ok_g is not None and on_group is not None:
+                        streamed.append(ok_g["group_id"])
+                        on_group(ok_g)
+            return normalize_grouping_obj(parser.result())
+        raw = call_llm_json(
+            model=m,
+            messages=messages,
+            temperature=0.0,
+            max_tokens=1800,
+            deadline=deadline,
+            stage="cluster",
+        )
+        return normalize_grouping_obj(raw)
+
+    # initial
+    try:
+        if fast_path_meta["used"]:
+            pass
+        elif output_mode == "local":
+            grouping_obj = normalize_grouping_obj(
+                _local_grouping(ac_map, max_ac_per_group=max_ac_per_group, eff=eff)
+            )
+            max_repairs = 0
+        else:
+            grouping_obj = _initial(tiers[tier])
+    except Exception as e:
+        deadline_hit = isinstance(e, DeadlineExceeded)
+        last_err = f"initial_call_failed: {type(e).__name__}: {e}"
+        grouping_obj = {}
+
+    # validate + (cascade 昇格) + repair
+    attempt = 0
+    first_shot = True
+    while True:
+        shot_ok = False
+        if grouping_obj:
+            # 候補ごとに1回だけ走査し、validate と self_check で共有する
+            index = build_grouping_index(grouping_obj, ac_map=ac_map, log_kinds=kinds)
+            ok, issues = validate_grouping(
+                grouping_obj,
+                ac_map=ac_map,
+                max_ac_per_group=max_ac_per_group,
+                target_groups_min=eff.target_min,
+                target_groups_max=eff.target_max,
+                max_groups=eff.max_groups,
+                min_group_size=eff.min_group_size,
+                require_log_split=True,
+                index=index,
+            )
+
+            hard, warn = split_issues(issues)
+            warnings = warn
+            shot_ok = ok and not hard
+            last_err = "" if shot_ok else ("; ".join(hard) if hard else "; ".join(issues))
+
+        if first_shot and cascade is not None and use_cascade:
+            cascade.record("cluster", tiers[tier], shot_ok)
+
+        if shot_ok:
             groups = grouping_obj.get("groups") or []
             if not isinstance(groups, list):
                 groups = []
 
             grouping_obj.setdefault("meta", {})
+            if output_mode == "edit":
+                grouping_obj["meta"]["edit_ops"] = edit_reports
             grouping_obj["meta"].update(
                 {
                     "fallback": False,
+                    "output_mode": output_mode,
+                    "fast_path": fast_path_meta,
                     "repairs_used": attempt,
+                    **({"streamed_groups": streamed} if output_mode == "stream" else {}),
+                    **({"model": tiers[tier], "cascade_tier": tier} if use_cascade else {}),
                     "warnings": warnings,
                     "policy": policy_meta(
                         max_ac_per_group=max_ac_per_group,
@@ -121,49 +313,97 @@ def cluster_acs(
                         max_ac_per_group=max_ac_per_group,
                         min_group_size=eff.min_group_size,
                         relaxations_applied=eff.relaxations,
+                        index=index,
                     ),
                 }
             )
             return grouping_obj
 
-        last_err = "; ".join(hard) if hard else "; ".join(issues)
-        if attempt >= int(max_repairs):
+        # 下位 tier の不合格（呼び出し失敗を含む）は repair せず上位 tier で初回からやり直す
+        if first_shot and tier < len(tiers) - 1 and not deadline_hit:
+            assert cascade is not None
+            cascade.escalate("cluster")
+            tier += 1
+            if _out_of_time():
+                deadline_hit = True
+                break
+            try:
+                grouping_obj = _initial(tiers[tier])
+            except Exception as e:
+                deadline_hit = isinstance(e, DeadlineExceeded)
+                last_err = f"initial_call_failed: {type(e).__name__}: {e}"
+                grouping_obj = {}
+            continue
+        first_shot = False
+
+        if not grouping_obj or attempt >= int(max_repairs):
+            break
+        if _out_of_time():
+            deadline_hit = True
             break
 
+        attempt += 1
         try:
             issues_text = "\n".join([f"- {x}" for x in hard]) if hard else "- (none)"
+            if output_mode == "edit":
+                # edit モードは repair も ops で返させる（現在の grouping を seed にする）
+                grouping_obj = _call_edit(grouping_obj, tiers[tier], issues_text)
+                continue
+
             repair_prompt = build_repair_prompt(issues_text=issues_text, grouping_obj=grouping_obj)
 
             raw2 = call_llm_json(
-                model=model,
+                model=tiers[tier],
                 messages=[
                     {"role": "system", "content": REPAIR_SYSTEM},
                     {"role": "user", "content": repair_prompt},
                 ],
                 temperature=0.0,
                 max_tokens=1800,
+                deadline=deadline,
+                stage="cluster_repair",
             )
             grouping_obj = normalize_grouping_obj(raw2)
         except Exception as e:
+            deadline_hit = isinstance(e, DeadlineExceeded)
             last_err = f"repair_call_failed: {type(e).__name__}: {e}"
             break
 
-    # fallback
-    fb = simple_fallback_grouping(
-        ac_map,
-        max_ac_per_group=max_ac_per_group,
-        min_group_size=eff.min_group_size,
-    )
+    # fallback（ローカルクラスタリング。LLMより粗いが制約は満たしやすい）
+    # 締め切り超過時は一番安いキーワードバケットにする
+    if deadline_hit:
+        fb = simple_fallback_grouping(ac_map, max_ac_per_group=max_ac_per_group, min_group_size=eff.min_group_size)
+    else:
+        fb = _local_grouping(ac_map, max_ac_per_group=max_ac_per_group, eff=eff)
 
     groups = fb.get("groups") or []
     if not isinstance(groups, list):
         groups = []
 
+    fb_index = build_grouping_index(fb, ac_map=ac_map, log_kinds=kinds)
+    ok_fb, issues_fb = validate_grouping(
+        fb,
+        ac_map=ac_map,
+        max_ac_per_group=max_ac_per_group,
+        target_groups_min=eff.target_min,
+        target_groups_max=eff.target_max,
+        max_groups=eff.max_groups,
+        min_group_size=eff.min_group_size,
+        require_log_split=True,
+        index=fb_index,
+    )
+    hard_fb, _ = split_issues(issues_fb)
+
     fb.setdefault("meta", {})
     fb["meta"].update(
         {
             "fallback": True,
-            "reason": f"cluster_failed: {last_err}",
+            # ローカルクラスタリングが制約を満たしていれば、そのまま taskgen に進める
+            "fallback_valid": bool(ok_fb and not hard_fb),
+            "deadline_exceeded": deadline_hit,
+            "output_mode": output_mode,
+            "fast_path": fast_path_meta,
+            "reason": f"{'deadline_exceeded' if deadline_hit else 'cluster_failed'}: {last_err}",
             "warnings": warnings,
             "policy": policy_meta(
                 max_ac_per_group=max_ac_per_group,
@@ -178,6 +418,7 @@ def cluster_acs(
                 max_ac_per_group=max_ac_per_group,
                 min_group_size=eff.min_group_size,
                 relaxations_applied=eff.relaxations + ["fallback_used"],
+                index=fb_index,
             ),
         }
     )
@@ -3,7 +3,9 @@ from __future__ import annotations
 
 import json
 from dataclasses import dataclass
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+
+from .schema import GroupingIndex, build_grouping_index
 
 
 # =========================
@@ -125,6 +127,44 @@ MANDATORY:
 - Return the full JSON with {{"groups":[...], "meta":{{"self_check":{{...}}}}}}
 """
 
+EDIT_SYSTEM = """You are a senior software engineer and requirements analyst.
+You improve a SEED grouping of Acceptance Criteria (ACs) by returning EDIT OPERATIONS only.
+Never rewrite the whole grouping. Return JSON only. No markdown. No extra text.
+"""
+
+EDIT_USER = """Improve the seed grouping of ACs into implementation groups for task generation.
+The seed was produced by local constrained k-medoids clustering over character n-gram similarity
+(it tries to respect group size and the audit/security split, but groups by wording, not by touchpoint).
+Keep what is already good.
+
+Rules (same priority tiers as full clustering):
+- Group by same implementation touchpoint, NOT vague topic.
+- Max ACs per group <= {max_ac_per_group}.
+- Security logs and audit/tamper-evident logs must NOT share a group.
+- Groups smaller than {min_group_size} ACs are NOT allowed (merge them).
+- Total groups should be within {target_min}..{target_max} (never more than {max_groups}).
+- Use only AC IDs and group IDs that appear below. New group IDs are allowed for split/move.
+
+Output schema (edit operations, applied in order):
+{{
+  "ops": [
+    {{"op": "move", "ac_ids": ["AC-003"], "to": "G02"}},
+    {{"op": "merge", "from": "G05", "into": "G01"}},
+    {{"op": "split", "group_id": "G03", "ac_ids": ["AC-010", "AC-011"], "new_group_id": "G09", "label": "short name"}},
+    {{"op": "rename", "group_id": "G01", "label": "short name", "tags": ["optional"], "rationale": "1 sentence"}}
+  ],
+  "labels": {{"G01": "short name"}}
+}}
+Return {{"ops": [], "labels": {{...}}}} if the seed needs no structural change.
+{issues_block}
+Seed grouping (group_id [label]: ac_ids):
+{seed_text}
+
+Input:
+story: {story_json}
+ac_map: {ac_map_json}
+"""
+
 
 # =========================
 # Issue split
@@ -249,6 +289,49 @@ def build_repair_prompt(*, issues_text: str, grouping_obj: Dict[str, Any]) -> st
     )
 
 
+def _seed_text(grouping_obj: Dict[str, Any]) -> str:
+    lines: List[str] = []
+    for g in grouping_obj.get("groups") or []:
+        if not isinstance(g, dict):
+            continue
+        ac_ids = [a for a in (g.get("ac_ids") or []) if isinstance(a, str)]
+        lines.append(f"{g.get('group_id', '?')} [{g.get('label', '')}]: {', '.join(ac_ids)}")
+    return "\n".join(lines)
+
+
+def build_edit_prompt(
+    *,
+    story: Dict[str, Any],
+    ac_map: Dict[str, str],
+    seed_obj: Dict[str, Any],
+    max_ac_per_group: int,
+    effective_target_min: int,
+    effective_target_max: int,
+    effective_max_groups: int,
+    min_group_size: int,
+    issues_text: str = "",
+) -> str:
+    """
+    seed grouping をコンパクトなテキストで渡し、LLMには edit ops だけを返させる。
+    （groups JSON 全体を書かせないので出力トークンが大幅に減る）
+    """
+    issues_block = ""
+    if issues_text.strip():
+        issues_block = f"\nValidation issues in the current seed (fix them with ops):\n{issues_text}\n"
+
+    return EDIT_USER.format(
+        max_ac_per_group=int(max_ac_per_group),
+        target_min=int(effective_target_min),
+        target_max=int(effective_target_max),
+        max_groups=int(effective_max_groups),
+        min_group_size=int(min_group_size),
+        issues_block=issues_block,
+        seed_text=_seed_text(seed_obj),
+        story_json=json.dumps(story, ensure_ascii=False),
+        ac_map_json=json.dumps(ac_map, ensure_ascii=False, indent=2),
+    )
+
+
 # =========================
 # Self-check (Python authoritative)
 # =========================
@@ -259,72 +342,20 @@ def build_self_check_py(
     max_ac_per_group: int,
     min_group_size: int,
     relaxations_applied: List[str],
+    index: Optional[GroupingIndex] = None,
 ) -> Dict[str, Any]:
-    all_ids = list(ac_map.keys())
-    all_set = set(all_ids)
-
-    assigned: List[str] = []
-    group_sizes: List[int] = []
-    orphan_groups: List[List[Any]] = []
-
-    for g in groups or []:
-        if not isinstance(g, dict):
-            continue
-        ac_ids = g.get("ac_ids") or []
-        if not isinstance(ac_ids, list):
-            ac_ids = []
-        ac_ids = [str(x) for x in ac_ids if isinstance(x, str)]
-        assigned.extend(ac_ids)
-
-        sz = len(ac_ids)
-        group_sizes.append(sz)
-        if sz < int(min_group_size):
-            orphan_groups.append([g.get("group_id", "?"), sz])
-
-    counts: Dict[str, int] = {}
-    for a in assigned:
-        counts[a] = counts.get(a, 0) + 1
-    duplicate_ids = sorted([a for a, c in counts.items() if c >= 2])
-
-    assigned_set = set(assigned)
-    missing_ids = [a for a in all_ids if a not in assigned_set]
-    unknown_ids = [a for a in assigned if a not in all_set]
-
-    def _kind(ac_text: str) -> str:
-        t = (ac_text or "").lower()
-        if "audit" in t or "tamper" in t or "改ざん" in t or "耐改ざん" in t:
-            return "audit"
-        if "security log" in t or "セキュリティログ" in t or "brute" in t or "ブルート" in t:
-            return "security"
-        if "log" in t or "ログ" in t:
-            return "log"
-        return "other"
-
-    log_split_ok = True
-    for g in groups or []:
-        if not isinstance(g, dict):
-            continue
-        ac_ids = g.get("ac_ids") or []
-        if not isinstance(ac_ids, list):
-            continue
-        kinds = set()
-        for a in ac_ids:
-            if a in ac_map:
-                kinds.add(_kind(ac_map[a]))
-        if "audit" in kinds and "security" in kinds:
-            log_split_ok = False
-            break
+    idx = index if index is not None else build_grouping_index({"groups": groups or []}, ac_map=ac_map)
 
     return {
-        "n_acs": len(all_ids),
-        "groups_count": len([g for g in groups if isinstance(g, dict)]),
-        "group_sizes": group_sizes,
+        "n_acs": idx.n_acs,
+        "groups_count": len(idx.dict_entries),
+        "group_sizes": idx.group_sizes,
         "max_ac_per_group": int(max_ac_per_group),
         "min_group_size": int(min_group_size),
-        "missing_ids": missing_ids,
-        "duplicate_ids": duplicate_ids,
-        "unknown_ids": unknown_ids,
-        "orphan_groups": orphan_groups,
-        "log_split_ok": bool(log_split_ok),
+        "missing_ids": list(idx.missing_ids),
+        "duplicate_ids": list(idx.duplicate_ids),
+        "unknown_ids": list(idx.unknown_ids),
+        "orphan_groups": idx.orphan_groups(min_group_size),
+        "log_split_ok": not idx.mixed_log_groups,
         "relaxations_applied": list(relaxations_applied or []),
-    }
\ No newline at end of file
+    }
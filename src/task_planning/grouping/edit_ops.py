@@ -0,0 +1,152 @@
+# src/task_planning/grouping/edit_ops.py
+from __future__ import annotations
+
+import copy
+from typing import Any, Dict, List, Tuple
+
+from .schema import normalize_grouping_obj
+
+
+# -------------------------
+# Helpers
+# -------------------------
+def _as_id_list(x: Any) -> List[str]:
+    if isinstance(x, str) and x.strip():
+        return [x.strip()]
+    if isinstance(x, list):
+        return [str(a).strip() for a in x if isinstance(a, str) and a.strip()]
+    return []
+
+
+def _next_group_id(groups: List[Dict[str, Any]]) -> str:
+    used = {g.get("group_id") for g in groups}
+    i = len(groups) + 1
+    while f"G{i:02d}" in used:
+        i += 1
+    return f"G{i:02d}"
+
+
+def _find(groups: List[Dict[str, Any]], gid: str) -> Dict[str, Any]:
+    for g in groups:
+        if g.get("group_id") == gid:
+            return g
+    return {}
+
+
+def _new_group(groups: List[Dict[str, Any]], gid: str, label: str = "") -> Dict[str, Any]:
+    g = {"group_id": gid or _next_group_id(groups), "ac_ids": [], "label": label, "rationale": "", "tags": []}
+    groups.append(g)
+    return g
+
+
+def _detach(groups: List[Dict[str, Any]], ac_ids: List[str]) -> None:
+    drop = set(ac_ids)
+    for g in groups:
+        g["ac_ids"] = [a for a in g.get("ac_ids", []) if a not in drop]
+
+
+# -------------------------
+# Apply
+# -------------------------
+def apply_grouping_edits(
+    seed_obj: Dict[str, Any],
+    edits_obj: Dict[str, Any],
+    *,
+    ac_map: Dict[str, str],
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    seed grouping に LLM の edit ops を順に適用する（Python側で決定的に反映）
+    - move  : ac_ids を別グループへ（存在しない to は新規作成）
+    - merge : from グループを into に吸収
+    - split : group_id から ac_ids を切り出して新グループへ
+    - rename: label/tags/rationale の更新
+    - labels: {group_id: label} の一括リネーム
+    不正な op（未知のAC/グループ等）は skip して report に残す。
+    最後に空グループを除去し normalize_grouping_obj で形を整える。
+    """
+    seed = normalize_grouping_obj(copy.deepcopy(seed_obj))
+    groups: List[Dict[str, Any]] = seed["groups"]
+
+    applied = 0
+    skipped: List[Dict[str, Any]] = []
+
+    ops = edits_obj.get("ops") if isinstance(edits_obj, dict) else None
+    if not isinstance(ops, list):
+        ops = []
+
+    for i, op in enumerate(ops, start=1):
+        if not isinstance(op, dict):
+            skipped.append({"index": i, "reason": "op must be object"})
+            continue
+        kind = str(op.get("op", "")).strip().lower()
+
+        if kind == "move":
+            ac_ids = [a for a in _as_id_list(op.get("ac_ids") or op.get("ac_id")) if a in ac_map]
+            to = str(op.get("to") or "").strip()
+            if not ac_ids or not to:
+                skipped.append({"index": i, "op": kind, "reason": "no known ac_ids or missing 'to'"})
+                continue
+            _detach(groups, ac_ids)
+            dst = _find(groups, to) or _new_group(groups, to, str(op.get("label") or ""))
+            dst["ac_ids"].extend(ac_ids)
+            applied += 1
+
+        elif kind == "merge":
+            into = str(op.get("into") or "").strip()
+            dst = _find(groups, into)
+            sources = [s for s in _as_id_list(op.get("from")) if s != into]
+            srcs = [g for g in (_find(groups, s) for s in sources) if g]
+            if not dst or not srcs:
+                skipped.append({"index": i, "op": kind, "reason": "unknown group in merge"})
+                continue
+            for src in srcs:
+                dst["ac_ids"].extend(src["ac_ids"])
+                src["ac_ids"] = []
+            applied += 1
+
+        elif kind == "split":
+            src = _find(groups, str(op.get("group_id") or "").strip())
+            ac_ids = [a for a in _as_id_list(op.get("ac_ids")) if a in set(src.get("ac_ids", []))]
+            if not src or not ac_ids:
+                skipped.append({"index": i, "op": kind, "reason": "unknown group or ac_ids not in group"})
+                continue
+            new_gid = str(op.get("new_group_id") or "").strip()
+            if new_gid and _find(groups, new_gid):
+                new_gid = ""
+            _detach(groups, ac_ids)
+            dst = _new_group(groups, new_gid, str(op.get("label") or ""))
+            dst["ac_ids"].extend(ac_ids)
+            applied += 1
+
+        elif kind == "rename":
+            g = _find(groups, str(op.get("group_id") or "").strip())
+            if not g:
+                skipped.append({"index": i, "op": kind, "reason": "unknown group"})
+                continue
+            if isinstance(op.get("label"), str) and op["label"].strip():
+                g["label"] = op["label"].strip()
+            if isinstance(op.get("rationale"), str) and op["rationale"].strip():
+                g["rationale"] = op["rationale"].strip()
+            if isinstance(op.get("tags"), list):
+                g["tags"] = _as_id_list(op["tags"])
+            applied += 1
+
+        else:
+            skipped.append({"index": i, "op": kind, "reason": "unsupported op"})
+
+    labels = edits_obj.get("labels") if isinstance(edits_obj, dict) else None
+    if isinstance(labels, dict):
+        for gid, label in labels.items():
+            g = _find(groups, str(gid))
+            if g and isinstance(label, str) and label.strip():
+                g["label"] = label.strip()
+
+    seed["groups"] = [g for g in groups if g.get("ac_ids")]
+    out = normalize_grouping_obj(seed)
+
+    report = {
+        "ops_total": len(ops),
+        "ops_applied": applied,
+        "ops_skipped": skipped,
+    }
+    return out, report
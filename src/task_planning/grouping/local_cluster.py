@@ -0,0 +1,415 @@
+# src/task_planning/grouping/local_cluster.py
+from __future__ import annotations
+
+import math
+import re
+import time
+import unicodedata
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .schema import (
+    _log_kind,
+    DEFAULT_MAX_AC_PER_GROUP,
+    DEFAULT_TARGET_GROUPS_MIN,
+    DEFAULT_TARGET_GROUPS_MAX,
+    DEFAULT_MAX_GROUPS,
+    DEFAULT_MIN_GROUP_SIZE,
+)
+
+
+# -------------------------
+# Settings
+# -------------------------
+NGRAM_SIZES = (2, 3)
+HASH_DIM = 2048
+MAX_ITER = 10
+
+# 大きなAC集合では乱択射影で次元を落とす（類似度はほぼ保存される）
+PROJECT_ABOVE_N = 512
+PROJECT_DIM = 256
+
+# 各ACの割当候補として見る近傍クラスタ数（全部埋まっていたら全クラスタを見る）
+PREF_TOP = 8
+
+_SPACE_RE = re.compile(r"\s+")
+
+# audit と security は同じグループに入れてはいけない（validate_grouping と同じ制約）
+_CONFLICT = {"audit": "security", "security": "audit"}
+
+
+# -------------------------
+# Vectorize (TF-IDF over hashed char n-grams)
+# -------------------------
+def _normalize(text: str) -> str:
+    t = unicodedata.normalize("NFKC", text or "").lower()
+    return _SPACE_RE.sub(" ", t).strip()
+
+
+def _char_ngrams(text: str) -> List[str]:
+    """
+    文字 n-gram（空白区切りに依存しないので日本語/ベトナム語もそのまま扱える）
+    """
+    t = f" {_normalize(text)} "
+    out: List[str] = []
+    for n in NGRAM_SIZES:
+        out.extend(t[i : i + n] for i in range(0, max(0, len(t) - n + 1)))
+    return out
+
+
+def vectorize_texts(texts: List[str], *, dim: int = HASH_DIM) -> np.ndarray:
+    """
+    hashed char n-gram の TF-IDF ベクトル（行は L2 正規化済み, float32）
+    """
+    n = len(texts)
+    flat: List[int] = []
+    hashes: Dict[str, int] = {}
+    for i, text in enumerate(texts):
+        base = i * dim
+        for g in _char_ngrams(text):
+            h = hashes.get(g)
+            if h is None:
+                h = hashes[g] = zlib.crc32(g.encode("utf-8")) % dim
+            flat.append(base + h)
+
+    counts = np.bincount(np.asarray(flat, dtype=np.int64), minlength=n * dim) if flat else np.zeros(n * dim)
+    x = counts.reshape(n, dim).astype(np.float32)
+
+    df = np.count_nonzero(x, axis=0).astype(np.float32)
+    idf = np.log((1.0 + n) / (1.0 + df)) + 1.0
+    x = np.log1p(x) * idf
+
+    if n > PROJECT_ABOVE_N:
+        rng = np.random.default_rng(0)
+        x = x @ rng.standard_normal((dim, PROJECT_DIM)).astype(np.float32)
+
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+# -------------------------
+# Constrained k-medoids
+# -------------------------
+def _target_group_count(
+    n: int,
+    *,
+    max_ac_per_group: int,
+    min_group_size: int,
+    target_groups_min: int,
+    target_groups_max: int,
+    max_groups: int,
+) -> int:
+    need = math.ceil(n / max(1, max_ac_per_group))
+    feasible = max(1, n // max(1, min_group_size))
+    k = min(max(int(target_groups_min), need), int(target_groups_max), int(max_groups), feasible)
+    # Tier 1 (max_ac_per_group) は群数目標より優先
+    k = max(k, need)
+    return max(1, min(k, n))
+
+
+def _init_medoids(x: np.ndarray, k: int) -> List[int]:
+    """
+    決定的な farthest-first 初期化（最も中心的なACから開始）
+    """
+    sim = x @ x.mean(axis=0)
+    medoids = [int(np.argmax(sim))]
+    closest = x @ x[medoids[0]]
+    while len(medoids) < k:
+        cand = int(np.argmin(closest))
+        if cand in medoids:
+            break
+        medoids.append(cand)
+        closest = np.maximum(closest, x @ x[cand])
+    return medoids
+
+
+def _compatible(kinds: set, kind: str) -> bool:
+    other = _CONFLICT.get(kind)
+    return other is None or other not in kinds
+
+
+def _assign(
+    x: np.ndarray,
+    kinds: List[str],
+    medoids: List[int],
+    *,
+    cap: int,
+) -> List[List[int]]:
+    """
+    容量（max_ac_per_group）と cannot-link（audit vs security）付きの貪欲割当。
+    確信度（最良類似度）が高い AC から順に、空きのある最も近いクラスタへ入れる。
+    """
+    sims = x @ x[medoids].T
+    k = sims.shape[1]
+    order = np.argsort(-sims.max(axis=1), kind="stable")
+
+    top = min(PREF_TOP, k)
+    if top < k:
+        part = np.argpartition(-sims, top - 1, axis=1)[:, :top]
+        prefs = np.take_along_axis(part, np.argsort(-np.take_along_axis(sims, part, axis=1), axis=1), axis=1)
+    else:
+        prefs = np.argsort(-sims, axis=1, kind="stable")
+
+    clusters: List[List[int]] = [[] for _ in medoids]
+    cluster_kinds: List[set] = [set() for _ in medoids]
+    for i in order.tolist():
+        placed = False
+        cands = prefs[i].tolist()
+        for _ in range(2):
+            for c in cands:
+                if len(clusters[c]) < cap and _compatible(cluster_kinds[c], kinds[i]):
+                    clusters[c].append(i)
+                    cluster_kinds[c].add(kinds[i])
+                    placed = True
+                    break
+            if placed or top >= k:
+                break
+            # 近傍が全部埋まっている → 全クラスタを類似度順に見る
+            cands = np.argsort(-sims[i], kind="stable").tolist()
+        if not placed:
+            clusters.append([i])
+            cluster_kinds.append({kinds[i]})
+            medoids.append(i)
+    return [c for c in clusters if c]
+
+
+def _medoid(x: np.ndarray, members: List[int]) -> int:
+    sub = x[members]
+    return members[int(np.argmax((sub @ sub.T).sum(axis=1)))]
+
+
+def _grow_small(
+    x: np.ndarray,
+    kinds: List[str],
+    clusters: List[List[int]],
+    *,
+    min_group_size: int,
+) -> List[List[int]]:
+    """
+    min_group_size 未満のクラスタへ、余裕のある（> min_group_size）クラスタから
+    最も近い AC を移して補充する（群数を保ったまま orphan を解消する）。
+    """
+    clusters = [list(c) for c in clusters]
+    owner = {a: ci for ci, c in enumerate(clusters) for a in c}
+    for ci in sorted(range(len(clusters)), key=lambda j: len(clusters[j])):
+        need = min_group_size - len(clusters[ci])
+        if need <= 0:
+            continue
+        my_kinds = {kinds[a] for a in clusters[ci]}
+        center = x[clusters[ci]].mean(axis=0)
+        for a in np.argsort(-(x @ center), kind="stable").tolist():
+            if need <= 0:
+                break
+            src = owner[a]
+            if src == ci or len(clusters[src]) <= min_group_size or not _compatible(my_kinds, kinds[a]):
+                continue
+            clusters[src].remove(a)
+            clusters[ci].append(a)
+            owner[a] = ci
+            my_kinds.add(kinds[a])
+            need -= 1
+    return clusters
+
+
+def _redistribute(
+    x: np.ndarray,
+    kinds: List[str],
+    clusters: List[List[int]],
+    ci: int,
+    *,
+    cap: int,
+) -> Optional[List[Tuple[int, int]]]:
+    """
+    clusters[ci] の各 AC を、空き＆互換のある最も近い他クラスタへ割り振る手順 (ac, 移動先) を返す。
+    1つでも行き先が無ければ None（解体できない）。
+    """
+    members = clusters[ci]
+    rest = [j for j in range(len(clusters)) if j != ci]
+    if not rest:
+        return None
+    centers = np.stack([x[clusters[j]].mean(axis=0) for j in rest])
+
+    moves: List[Tuple[int, int]] = []
+    sizes = {j: len(clusters[j]) for j in rest}
+    rest_kinds = {j: {kinds[a] for a in clusters[j]} for j in rest}
+    for a in members:
+        for pos in np.argsort(-(centers @ x[a]), kind="stable").tolist():
+            j = rest[pos]
+            if sizes[j] < cap and _compatible(rest_kinds[j], kinds[a]):
+                moves.append((a, j))
+                sizes[j] += 1
+                rest_kinds[j].add(kinds[a])
+                break
+        else:
+            return None
+    return moves
+
+
+def _dissolve(clusters: List[List[int]], ci: int, moves: List[Tuple[int, int]]) -> None:
+    for a, j in moves:
+        clusters[j].append(a)
+    clusters.pop(ci)
+
+
+def _absorb_orphans(
+    x: np.ndarray,
+    kinds: List[str],
+    clusters: List[List[int]],
+    *,
+    cap: int,
+    min_group_size: int,
+) -> List[List[int]]:
+    """
+    min_group_size 未満のクラスタを解体し、空き＆互換のある最も近いクラスタへ吸収。
+    吸収先が無い場合はそのまま残す（validate_grouping 側で検出される）。
+    """
+    clusters = [list(c) for c in clusters]
+    while True:
+        small = [ci for ci, c in enumerate(clusters) if len(c) < min_group_size]
+        if not small or len(clusters) <= 1:
+            return clusters
+        ci = min(small, key=lambda j: len(clusters[j]))
+        moves = _redistribute(x, kinds, clusters, ci, cap=cap)
+        if moves is None:
+            # 全員は動かせない → 解体しない（これ以上の改善は無理なので終了）
+            return clusters
+        _dissolve(clusters, ci, moves)
+
+
+def _enforce_max_groups(
+    x: np.ndarray,
+    kinds: List[str],
+    clusters: List[List[int]],
+    *,
+    cap: int,
+    max_groups: int,
+) -> List[List[int]]:
+    """
+    _assign の溢れ（どこにも入らなかった AC の新クラスタ）で max_groups を超えた分を、
+    小さいクラスタから順に解体して他クラスタの空きへ再配置する。
+    どのクラスタも解体できなければそのまま残す（validate_grouping 側で検出される）。
+    """
+    clusters = [list(c) for c in clusters]
+    while len(clusters) > max(1, int(max_groups)):
+        for ci in sorted(range(len(clusters)), key=lambda j: len(clusters[j])):
+            moves = _redistribute(x, kinds, clusters, ci, cap=cap)
+            if moves is not None:
+                _dissolve(clusters, ci, moves)
+                break
+        else:
+            return clusters
+    return clusters
+
+
+def local_constrained_grouping(
+    ac_map: Dict[str, str],
+    *,
+    max_ac_per_group: int = DEFAULT_MAX_AC_PER_GROUP,
+    min_group_size: int = DEFAULT_MIN_GROUP_SIZE,
+    target_groups_min: int = DEFAULT_TARGET_GROUPS_MIN,
+    target_groups_max: int = DEFAULT_TARGET_GROUPS_MAX,
+    max_groups: int = DEFAULT_MAX_GROUPS,
+) -> Dict[str, Any]:
+    """
+    LLM を使わないローカルクラスタリング（オフライン/縮退運転/巨大AC集合向け）
+    - AC文を hashed char n-gram TF-IDF でベクトル化
+    - 容量制約 + audit/security cannot-link 付き k-medoids
+    - orphan(< min_group_size) は近いACで補充、無理なら近いグループへ吸収
+    - 容量/cannot-link で溢れて max_groups を超えたクラスタは解体して再配置
+    validate_grouping と同じ制約を満たすことを目標にする（満たせない場合も形は返す）
+    """
+    t0 = time.perf_counter()
+    ac_ids = list(ac_map.keys())
+    n = len(ac_ids)
+    if n == 0:
+        return {"groups": [], "meta": {"engine": "local_kmedoids", "iterations": 0, "elapsed_ms": 0.0}}
+
+    cap = max(1, int(max_ac_per_group))
+    mgs = max(1, int(min_group_size))
+    texts = [str(ac_map[a] or "") for a in ac_ids]
+    kinds = [_log_kind(t) for t in texts]
+    x = vectorize_texts(texts)
+
+    k = _target_group_count(
+        n,
+        max_ac_per_group=cap,
+        min_group_size=mgs,
+        target_groups_min=target_groups_min,
+        target_groups_max=target_groups_max,
+        max_groups=max_groups,
+    )
+
+    def _run(k_: int) -> Tuple[List[List[int]], int]:
+        medoids = _init_medoids(x, k_)
+        clusters_: List[List[int]] = []
+        it = 0
+        for it in range(1, MAX_ITER + 1):
+            clusters_ = _assign(x, kinds, list(medoids), cap=cap)
+            new_medoids = [_medoid(x, c) for c in clusters_]
+            if sorted(new_medoids) == sorted(medoids):
+                break
+            medoids = new_medoids
+
+        # validate_grouping と同じ緩和条件（ACが少なすぎる場合は orphan を許容）
+        if n >= mgs + 2:
+            clusters_ = _grow_small(x, kinds, clusters_, min_group_size=mgs)
+            clusters_ = _absorb_orphans(x, kinds, clusters_, cap=cap, min_group_size=mgs)
+        clusters_ = _enforce_max_groups(x, kinds, clusters_, cap=cap, max_groups=max_groups)
+        return clusters_, it
+
+    clusters, iterations = _run(k)
+
+    # orphan 吸収で群数が target_min を割ったら k を増やして数回だけやり直す
+    upper = min(int(target_groups_max), int(max_groups), max(1, n // mgs))
+    for _ in range(3):
+        short = int(target_groups_min) - len(clusters)
+        if short <= 0 or k >= upper:
+            break
+        k = min(upper, k + short)
+        retry, it = _run(k)
+        iterations += it
+        if len(retry) <= len(clusters):
+            break
+        clusters = retry
+
+    clusters = [sorted(c) for c in clusters]
+    clusters.sort(key=lambda c: c[0])
+
+    groups: List[Dict[str, Any]] = []
+    for gi, members in enumerate(clusters, start=1):
+        med = _medoid(x, members)
+        sub = x[members]
+        cohesion = float((sub @ x[med]).mean())
+        member_kinds = {kinds[a] for a in members}
+        tags = ["local_cluster"]
+        if "audit" in member_kinds:
+            tags.append("log_audit")
+        if "security" in member_kinds:
+            tags.append("log_security")
+
+        label = _normalize(texts[med])
+        if len(label) > 40:
+            label = label[:39] + "…"
+
+        groups.append(
+            {
+                "group_id": f"G{gi:02d}",
+                "ac_ids": [ac_ids[a] for a in members],
+                "label": label,
+                "rationale": f"local k-medoids cluster around {ac_ids[med]} (mean similarity {cohesion:.2f})",
+                "tags": tags,
+            }
+        )
+
+    return {
+        "groups": groups,
+        "meta": {
+            "engine": "local_kmedoids",
+            "target_k": int(k),
+            "iterations": int(iterations),
+            "elapsed_ms": round((time.perf_counter() - t0) * 1000.0, 2),
+        },
+    }
@@ -1,7 +1,9 @@
 # src/task_planning/grouping/policy.py
 from __future__ import annotations
 
-from dataclasses import dataclass
+import heapq
+from dataclasses import asdict, dataclass, replace
+from typing import Any, Dict, List, Optional, Tuple
 
 
 @dataclass(frozen=True)
@@ -42,4 +44,211 @@ def derive_grouping_policy(n_acs: int) -> GroupingPolicy:
         max_groups=max_groups,
         min_group_size=min_group_size,
         log_groups_independent=True,
-    )
\ No newline at end of file
+    )
+
+# =========================
+# Policy engine（run.py --policy-mode）
+# =========================
+# fixed      : 従来どおり 8-12 の既定レンジを実現可能範囲に丸めるだけ
+# throughput : 下のコストモデルで「taskgen の期待 makespan が最小」になる群数を選び、
+#              target レンジと 1群あたりの AC 上限をその周りに絞る（ハード制約は fixed と同じ）
+POLICY_MODES = ("fixed", "throughput")
+MAKESPAN_TIE_RATIO = 0.01  # makespan がこの差以内なら呼び出し数（=トークン）の少ない方を選ぶ
+
+
+@dataclass(frozen=True)
+class CostModel:
+    """
+    taskgen 1呼び出し（1グループ）のコスト
+      latency(s) = (base + in_tokens/input_tps + out_tokens/output_tps) × (1 + 期待 repair 回数)
+      out_tokens = min(out_cap, s × out_tokens_per_ac)
+      期待 repair 回数 = min(max_repairs, repair_base + repair_per_ac × s)  ← 大きい群ほど coverage を落としやすい
+                        （s × out_tokens_per_ac が out_cap を超える群は出力が切れるので max_repairs）
+    """
+
+    base_latency_s: float = 1.5
+    output_tokens_per_s: float = 60.0
+    input_tokens_per_s: float = 2000.0
+    fixed_in_tokens: int = 700  # system + テンプレ + story
+    in_tokens_per_ac: int = 40
+    out_tokens_per_ac: float = 330.0  # full: 1.5 task × 220、skeleton なら 90 程度
+    out_cap: int = 1800
+    repair_base: float = 0.05
+    repair_per_ac: float = 0.02
+
+
+def cost_model_from_history(history: Dict[str, Any], *, skeleton: bool = False) -> CostModel:
+    """
+    estimate.load_history() の戻り値から taskgen の出力速度 / 1AC あたり出力 / repair 率を合わせる
+    （無い項目は既定値のまま）
+    """
+    cm = CostModel(out_tokens_per_ac=90.0 if skeleton else 330.0, out_cap=700 if skeleton else 1800)
+    st = (history.get("stages") or {}).get("taskgen") or {}
+    updates: Dict[str, Any] = {}
+    if st.get("out_tokens") and st.get("p50_s") and float(st["p50_s"]) > cm.base_latency_s:
+        updates["output_tokens_per_s"] = float(st["out_tokens"]) / (float(st["p50_s"]) - cm.base_latency_s)
+    if history.get("tasks_per_ac"):
+        updates["out_tokens_per_ac"] = float(history["tasks_per_ac"]) * (60.0 if skeleton else 220.0)
+    rate = (history.get("repair_rate") or {}).get("taskgen")
+    if rate is not None:
+        # 観測平均を「平均的な群サイズ(6)」での値とみなして切片を合わせる
+        updates["repair_base"] = max(0.0, float(rate) - cm.repair_per_ac * 6)
+    return replace(cm, **updates)
+
+
+def lpt_makespan(durations: List[float], workers: int) -> float:
+    """LPT（長い順に空いたワーカーへ）で並列実行した時の所要時間"""
+    if not durations:
+        return 0.0
+    heap = [0.0] * max(1, int(workers))
+    for d in sorted(durations, reverse=True):
+        heapq.heappush(heap, heapq.heappop(heap) + d)
+    return max(heap)
+
+
+def _expected_repairs(size: int, *, cm: CostModel, max_repairs: int) -> float:
+    # 出力が max_tokens に収まらない群は JSON が切れてほぼ確実に repair（それでも大抵は failsafe）
+    if size * cm.out_tokens_per_ac > cm.out_cap:
+        return float(max_repairs)
+    return min(float(max_repairs), cm.repair_base + cm.repair_per_ac * size)
+
+
+def _group_latency(size: int, *, cm: CostModel, max_repairs: int) -> float:
+    out = min(float(cm.out_cap), size * cm.out_tokens_per_ac)
+    inp = cm.fixed_in_tokens + size * cm.in_tokens_per_ac
+    once = cm.base_latency_s + inp / cm.input_tokens_per_s + out / cm.output_tokens_per_s
+    return once * (1.0 + _expected_repairs(size, cm=cm, max_repairs=max_repairs))
+
+
+def _balanced_sizes(n: int, k: int) -> List[int]:
+    q, r = divmod(n, k)
+    return [q + 1] * r + [q] * (k - r)
+
+
+def clamp_grouping_policy(
+    n_acs: int,
+    *,
+    max_ac_per_group: int,
+    target_groups_min: int,
+    target_groups_max: int,
+    max_groups: int,
+    min_group_size: int,
+) -> Dict[str, int]:
+    """要求された方針を実現可能範囲に丸める（fixed モード。throughput モードもハード制約はここ）"""
+    max_ac_per_group = max(1, int(max_ac_per_group))
+    min_group_size = max(2, int(min_group_size))
+
+    feasible_max_groups = max(1, n_acs // min_group_size)
+    max_groups = min(int(max_groups), feasible_max_groups)
+
+    tmin = int(target_groups_min)
+    tmax = int(target_groups_max)
+    if tmin > max_groups:
+        tmin = max(1, max_groups - 2)
+    if tmax > max_groups:
+        tmax = max_groups
+    if tmin > tmax:
+        tmin = max(1, tmax)
+
+    return {
+        "max_ac_per_group": max_ac_per_group,
+        "target_groups_min": tmin,
+        "target_groups_max": tmax,
+        "max_groups": max_groups,
+        "min_group_size": min_group_size,
+    }
+
+
+def tune_grouping_policy(
+    n_acs: int,
+    *,
+    mode: str = "fixed",
+    max_ac_per_group: int,
+    target_groups_min: int,
+    target_groups_max: int,
+    max_groups: int,
+    min_group_size: int,
+    workers: int = 4,
+    max_repairs: int = 1,
+    cost_model: Optional[CostModel] = None,
+) -> Tuple[Dict[str, int], Dict[str, Any]]:
+    """
+    戻り値: (policy, rationale)
+      policy は clamp_grouping_policy と同じキー。rationale は meta.policy_tuning にそのまま載せる
+    throughput モード:
+      群数 k を [ceil(N/max_ac_per_group), min(max_groups, N/min_group_size)] で全探索し、
+      均等分割したグループを workers 本で LPT 実行した期待 makespan が最小の k を選ぶ
+      （makespan がほぼ同じなら k が小さい方 = 呼び出し/重複 story トークンが少ない方）
+      target レンジは k±1、1群あたりの AC 上限は「target_min 群で全 AC を収められる」最小値 +1
+      （出力が max_tokens に収まる群サイズで組めるなら、上限もそのサイズまで）
+    """
+    base = clamp_grouping_policy(
+        n_acs,
+        max_ac_per_group=max_ac_per_group,
+        target_groups_min=target_groups_min,
+        target_groups_max=target_groups_max,
+        max_groups=max_groups,
+        min_group_size=min_group_size,
+    )
+    mode = mode if mode in POLICY_MODES else "fixed"
+    if mode == "fixed" or n_acs <= 0:
+        return base, {"mode": "fixed"}
+
+    cm = cost_model or CostModel()
+    w = max(1, int(workers))
+    lo = max(1, -(-n_acs // base["max_ac_per_group"]))
+    hi = base["max_groups"]
+    if lo > hi:
+        return base, {"mode": "fixed", "requested_mode": mode, "reason": "no_feasible_group_count"}
+    # 出力が max_tokens に収まる群サイズで組めるなら、それより大きい群は候補にしない
+    size_limit = max(1, int(cm.out_cap // cm.out_tokens_per_ac))
+    lo_by_output = -(-n_acs // size_limit)
+    fits_output = lo_by_output <= hi
+    if fits_output:
+        lo = max(lo, lo_by_output)
+
+    candidates: List[Dict[str, Any]] = []
+    for k in range(lo, hi + 1):
+        sizes = _balanced_sizes(n_acs, k)
+        lat = [_group_latency(s, cm=cm, max_repairs=max_repairs) for s in sizes]
+        candidates.append(
+            {
+                "groups": k,
+                "max_group_size": max(sizes),
+                "makespan_s": round(lpt_makespan(lat, w), 2),
+                "expected_calls": round(sum(1.0 + _expected_repairs(s, cm=cm, max_repairs=max_repairs) for s in sizes), 2),
+            }
+        )
+
+    best_span = min(c["makespan_s"] for c in candidates)
+    chosen = next(c for c in candidates if c["makespan_s"] <= best_span * (1.0 + MAKESPAN_TIE_RATIO))
+    k = int(chosen["groups"])
+
+    tmin = max(lo, k - 1)
+    tmax = min(hi, k + 1)
+    size_cap = min(base["max_ac_per_group"], max(base["min_group_size"], -(-n_acs // tmin) + 1))
+    if fits_output:
+        size_cap = max(min(size_cap, size_limit), -(-n_acs // tmin))
+    policy = {
+        "max_ac_per_group": size_cap,
+        "target_groups_min": tmin,
+        "target_groups_max": tmax,
+        "max_groups": base["max_groups"],
+        "min_group_size": base["min_group_size"],
+    }
+    # 比較用: fixed 方針の target_min 群で均等に割れた場合
+    k_fixed = max(1, min(base["target_groups_min"], n_acs))
+    fixed_span = round(
+        lpt_makespan([_group_latency(s, cm=cm, max_repairs=max_repairs) for s in _balanced_sizes(n_acs, k_fixed)], w), 2
+    )
+    return policy, {
+        "mode": "throughput",
+        "workers": w,
+        "chosen_groups": k,
+        "size_limit_by_output": size_limit,
+        "expected_makespan_s": chosen["makespan_s"],
+        "fixed_policy": base,
+        "fixed_expected_makespan_s": fixed_span,
+        "cost_model": asdict(cm),
+        "candidates": candidates,
+    }
@@ -1,7 +1,11 @@
 # src/task_planning/grouping/schema.py
 from __future__ import annotations
 
-from typing import Any, Dict, List, Tuple
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from ..keywords import FALLBACK_BUCKET, LOG_KIND, classify
 
 
 # -------------------------
@@ -36,17 +40,145 @@ def _dedup_preserve(xs: List[str]) -> List[str]:
 def _log_kind(ac_text: str) -> str:
     """
     audit/security/log/other をざっくり判定（ログ分離バリデーション用）
+    判定順は keywords.LOG_KIND（audit 優先 → security → log）
+    """
+    return classify(ac_text, LOG_KIND)
+
+
+# -------------------------
+# Index (single pass)
+# -------------------------
+@dataclass(frozen=True)
+class GroupEntry:
+    position: int  # groups[] 内の 1-origin 位置
+    is_dict: bool
+    group_id: str  # 不正/空なら ""
+    ac_ids: Tuple[str, ...]  # str かつ空でないものだけ
+    ac_ids_valid: bool  # non-empty list[str] か
+    raw_size: int  # ac_ids が list ならその長さ（非文字列も含む）
+    label_id: Any = "?"  # レポート表示用（元の group_id をそのまま）
+
+
+@dataclass(frozen=True)
+class GroupingIndex:
     """
-    t = (ac_text or "").lower()
-    # audit 優先
-    if "audit" in t or "tamper" in t or "改ざん" in t or "耐改ざん" in t:
-        return "audit"
-    # security 次
-    if "security log" in t or "セキュリティログ" in t or "ブルート" in t or "brute" in t:
-        return "security"
-    if "log" in t or "ログ" in t:
-        return "log"
-    return "other"
+    1つの grouping 候補に対する不変インデックス（groups を1回だけ走査して作る）
+    validate_grouping / self_check / meta はこれを読むだけにする。
+    """
+
+    n_acs: int
+    entries: Tuple[GroupEntry, ...]
+    ac_to_group: Mapping[str, str]  # 最初に割り当てられたグループ
+    counts: Mapping[str, int]
+    missing_ids: Tuple[str, ...]
+    unknown_ids: Tuple[str, ...]
+    duplicate_ids: Tuple[str, ...]
+    duplicate_group_ids: Tuple[str, ...]
+    log_kinds: Mapping[str, str]  # ac_id -> audit/security/log/other
+    mixed_log_groups: Tuple[str, ...]  # audit と security が混在するグループ
+
+    @property
+    def groups_count(self) -> int:
+        return len(self.entries)
+
+    @property
+    def dict_entries(self) -> Tuple[GroupEntry, ...]:
+        return tuple(e for e in self.entries if e.is_dict)
+
+    @property
+    def group_sizes(self) -> List[int]:
+        return [len(e.ac_ids) for e in self.entries if e.is_dict]
+
+    def orphan_groups(self, min_group_size: int) -> List[List[Any]]:
+        return [
+            [e.label_id, len(e.ac_ids)]
+            for e in self.entries
+            if e.is_dict and len(e.ac_ids) < int(min_group_size)
+        ]
+
+
+def ac_log_kinds(ac_map: Dict[str, str]) -> Dict[str, str]:
+    """
+    AC ごとの log kind（ac_map が同じなら repair ループ中も使い回せる）
+    """
+    return {a: _log_kind(t) for a, t in ac_map.items()}
+
+
+def build_grouping_index(
+    grouping_obj: Dict[str, Any],
+    *,
+    ac_map: Dict[str, str],
+    log_kinds: Optional[Dict[str, str]] = None,
+) -> GroupingIndex:
+    kinds = log_kinds if log_kinds is not None else ac_log_kinds(ac_map)
+    groups = grouping_obj.get("groups") if isinstance(grouping_obj, dict) else None
+    if not isinstance(groups, list):
+        groups = []
+
+    entries: List[GroupEntry] = []
+    ac_to_group: Dict[str, str] = {}
+    counts: Dict[str, int] = {}
+    unknown: List[str] = []
+    seen_gid: set = set()
+    dup_gid: List[str] = []
+    mixed: List[str] = []
+
+    for i, g in enumerate(groups, start=1):
+        if not isinstance(g, dict):
+            entries.append(GroupEntry(i, False, "", (), False, 0))
+            continue
+
+        gid = g.get("group_id")
+        gid = gid.strip() if isinstance(gid, str) else ""
+        if gid:
+            if gid in seen_gid:
+                dup_gid.append(gid)
+            seen_gid.add(gid)
+
+        raw = g.get("ac_ids")
+        raw_list = raw if isinstance(raw, list) else []
+        ac_ids = tuple(a for a in raw_list if isinstance(a, str) and a.strip())
+
+        has_audit = has_security = False
+        for a in ac_ids:
+            counts[a] = counts.get(a, 0) + 1
+            ac_to_group.setdefault(a, gid)
+            k = kinds.get(a)
+            if k is None:
+                if a not in ac_map:
+                    unknown.append(a)
+                continue
+            if k == "audit":
+                has_audit = True
+            elif k == "security":
+                has_security = True
+        if has_audit and has_security:
+            mixed.append(g.get("group_id", "?"))
+
+        entries.append(
+            GroupEntry(
+                position=i,
+                is_dict=True,
+                group_id=gid,
+                ac_ids=ac_ids,
+                ac_ids_valid=_is_str_list(raw),
+                raw_size=len(raw_list),
+                label_id=g.get("group_id", "?"),
+            )
+        )
+
+    return GroupingIndex(
+        n_acs=len(ac_map),
+        entries=tuple(entries),
+        ac_to_group=MappingProxyType(ac_to_group),
+        counts=MappingProxyType(counts),
+        missing_ids=tuple(a for a in ac_map if a not in counts),
+        unknown_ids=tuple(unknown),
+        duplicate_ids=tuple(sorted(a for a, c in counts.items() if c >= 2)),
+        duplicate_group_ids=tuple(dup_gid),
+        log_kinds=MappingProxyType(kinds),
+        mixed_log_groups=tuple(mixed),
+    )
 
 
 # -------------------------
@@ -128,6 +260,7 @@ def validate_grouping(
     max_groups: int = DEFAULT_MAX_GROUPS,
     min_group_size: int = DEFAULT_MIN_GROUP_SIZE,
     require_log_split: bool = True,
+    index: Optional[GroupingIndex] = None,
 ) -> Tuple[bool, List[str]]:
     """
     グルーピングの強バリデーション（安定運用向け）
@@ -145,6 +278,8 @@ def validate_grouping(
     注意(警告):
     - groups_count が 8〜12 から外れること自体は “警告” 扱いにする
       （※ただし十分なAC数があるのに極端な群数は実質NGに寄せる）
+
+    index: build_grouping_index の結果を渡すと groups を再走査しない
     """
     issues: List[str] = []
 
@@ -155,52 +290,39 @@ def validate_grouping(
     if not isinstance(groups, list) or not groups:
         return False, ["groups must be a non-empty list"]
 
+    idx = index if index is not None else build_grouping_index(grouping_obj, ac_map=ac_map)
+
     # hard: count upper bound
-    if len(groups) > int(max_groups):
-        issues.append(f"groups_count exceeds max_groups ({len(groups)} > {max_groups})")
+    if idx.groups_count > int(max_groups):
+        issues.append(f"groups_count exceeds max_groups ({idx.groups_count} > {max_groups})")
 
     # hard: group_id unique / each group shape
-    seen_gid = set()
-    for i, g in enumerate(groups, start=1):
-        if not isinstance(g, dict):
+    # 既に出てきた group_id（2回目以降の出現だけを duplicate として報告する）
+    seen_gids = set()
+    for e in idx.entries:
+        i = e.position
+        if not e.is_dict:
             issues.append(f"groups[{i}] must be object")
             continue
 
-        gid = g.get("group_id")
-        if not isinstance(gid, str) or not gid.strip():
+        if not e.group_id:
             issues.append(f"groups[{i}].group_id is missing/empty")
+        elif e.group_id in idx.duplicate_group_ids and e.group_id in seen_gids:
+            issues.append(f"duplicate group_id: {e.group_id}")
         else:
-            gid = gid.strip()
-            if gid in seen_gid:
-                issues.append(f"duplicate group_id: {gid}")
-            seen_gid.add(gid)
+            seen_gids.add(e.group_id)
 
-        ac_ids = g.get("ac_ids")
-        if not _is_str_list(ac_ids):
+        if not e.ac_ids_valid:
             issues.append(f"groups[{i}].ac_ids must be non-empty list[str]")
             continue
 
-        if len(ac_ids) > int(max_ac_per_group):
-            issues.append(f"groups[{i}] size exceeds max_ac_per_group ({len(ac_ids)} > {max_ac_per_group})")
+        if e.raw_size > int(max_ac_per_group):
+            issues.append(f"groups[{i}] size exceeds max_ac_per_group ({e.raw_size} > {max_ac_per_group})")
 
     # hard: Coverage exact once
-    all_ac_ids = list(ac_map.keys())
-    all_set = set(all_ac_ids)
-
-    assigned: List[str] = []
-    for g in groups:
-        if isinstance(g, dict) and isinstance(g.get("ac_ids"), list):
-            assigned.extend([a for a in g["ac_ids"] if isinstance(a, str) and a.strip()])
-
-    assigned_set = set(assigned)
-
-    missing = [a for a in all_ac_ids if a not in assigned_set]
-    unknown = [a for a in assigned if a not in all_set]
-
-    count: Dict[str, int] = {}
-    for a in assigned:
-        count[a] = count.get(a, 0) + 1
-    dup = sorted([a for a, c in count.items() if c >= 2])
+    missing = list(idx.missing_ids)
+    unknown = list(idx.unknown_ids)
+    dup = list(idx.duplicate_ids)
 
     if missing:
         issues.append(f"missing ACs (not assigned): {missing[:20]}{'...' if len(missing) > 20 else ''}")
@@ -209,51 +331,35 @@ def validate_grouping(
     if dup:
         issues.append(f"duplicate assignment (AC appears in multiple groups): {dup[:20]}{'...' if len(dup) > 20 else ''}")
 
-    total_acs = len(all_ac_ids)
+    total_acs = idx.n_acs
 
     # hard: orphan groups (1-2) disallow — but relax if too few ACs to satisfy
     # 例: total_acs が 1〜4 などだと 3以上のグループを作れないケースがある
     if total_acs >= int(min_group_size) + 2:
-        orphan_sizes = []
-        for g in groups:
-            ac_ids = g.get("ac_ids", [])
-            if isinstance(ac_ids, list) and 1 <= len(ac_ids) < int(min_group_size):
-                orphan_sizes.append((g.get("group_id", "?"), len(ac_ids)))
+        orphan_sizes = [
+            (e.label_id, e.raw_size)
+            for e in idx.dict_entries
+            if 1 <= e.raw_size < int(min_group_size)
+        ]
         if orphan_sizes:
             issues.append(f"orphan groups found (size < {min_group_size}): {orphan_sizes}")
 
     # hard: log split (audit vs security must not mix)
-    if require_log_split:
-        mixed = []
-        for g in groups:
-            ac_ids = g.get("ac_ids", [])
-            if not isinstance(ac_ids, list):
-                continue
-            kinds = set()
-            for a in ac_ids:
-                if a in ac_map:
-                    kinds.add(_log_kind(ac_map[a]))
-            if "audit" in kinds and "security" in kinds:
-                mixed.append(g.get("group_id", "?"))
-        if mixed:
-            issues.append(f"log groups must be split (audit vs security). mixed_groups={mixed}")
+    if require_log_split and idx.mixed_log_groups:
+        issues.append(f"log groups must be split (audit vs security). mixed_groups={list(idx.mixed_log_groups)}")
 
     # warning-like: target range (8-12)
     # ただし total_acs が少ない/制約上不可能な場合は警告を弱める
     # - 目安: 8 groups * 3 size = 24 AC 以上なら狙いを強めに見る
+    n_groups = idx.groups_count
     if total_acs >= int(target_groups_min) * int(min_group_size):
-        if not (int(target_groups_min) <= len(groups) <= int(target_groups_max)) and len(groups) <= int(max_groups):
+        if not (int(target_groups_min) <= n_groups <= int(target_groups_max)) and n_groups <= int(max_groups):
             # これは「失敗」扱いにすると壊れやすいので、prefixを warning にする
             issues.append(
-                f"warning: groups_count={len(groups)} not in target range [{target_groups_min},{target_groups_max}]"
+                f"warning: groups_count={n_groups} not in target range [{target_groups_min},{target_groups_max}]"
             )
 
-    ok = all(not str(x).startswith("warning:") for x in issues) and len(
-        [x for x in issues if not str(x).startswith("warning:")]
-    ) == 0
-
-    # ↑ ok を「warningはOK」にするならこう
-    # (warningは issues に残したまま、ok=True を返す)
+    # warning は issues に残したまま、ok=True を返す
     hard_issues = [x for x in issues if not str(x).startswith("warning:")]
     ok = len(hard_issues) == 0
     return ok, issues
@@ -275,29 +381,15 @@ def simple_fallback_grouping(
     - orphan(1-2) は近いバケットへ吸収（直前が空きある場合）
     """
     def bucket(ac_text: str) -> str:
-        t = (ac_text or "").lower()
-        if "jwt" in t or "token" in t:
-            return "token_jwt"
-        if "password" in t or "bcrypt" in t or "hash" in t or "ソルト" in t:
-            return "password_hash"
-        if "email" in t or "domain" in t:
-            return "email_validation"
-        if "lock" in t or "ロック" in t or "failed" in t or "失敗" in t:
-            return "lockout"
-        if "csrf" in t or "session fixation" in t:
-            return "session_csrf"
-        if "rate" in t or "429" in t:
-            return "rate_limit"
-        if "log" in t or "ログ" in t:
+        b = classify(ac_text, FALLBACK_BUCKET)
+        if b == "log":
             k = _log_kind(ac_text)
             if k == "audit":
                 return "log_audit"
             if k == "security":
                 return "log_security"
             return "log_misc"
-        if "ui" in t or "mask" in t or "画面" in t:
-            return "ui"
-        return "other"
+        return b
 
     buckets: Dict[str, List[str]] = {}
     for ac_id, ac_text in ac_map.items():
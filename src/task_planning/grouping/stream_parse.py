@@ -0,0 +1,119 @@
+# src/task_planning/grouping/stream_parse.py
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Optional, Set
+
+from .schema import normalize_grouping_obj
+
+
+class GroupStreamParser:
+    """
+    clustering 出力 {"groups":[{...},{...}], "meta":{...}} をトークン列のまま読み、
+    groups[*] のオブジェクトが閉じた時点で1件ずつ返す（--cluster-mode stream 用）
+    - 文字列リテラル内の括弧 / エスケープは無視する
+    - groups 以外のキー（meta など）の中身は読み飛ばす
+    全文は result() で従来どおり json.loads する（途中の判定は最終結果を変えない）
+    """
+
+    def __init__(self) -> None:
+        self._text = ""
+        self._pos = 0
+        self._depth = 0  # 全体の括弧の深さ
+        self._in_str = False
+        self._esc = False
+        self._last_key = ""  # 直近に読み終えた深さ1のキー
+        self._key_start = -1
+        self._in_groups = False  # groups 配列の中（深さ2）
+        self._obj_start = -1  # groups[*] の開始位置
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        self._text += chunk
+        out: List[Dict[str, Any]] = []
+        text = self._text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif ch == "\\":
+                    self._esc = True
+                elif ch == '"':
+                    self._in_str = False
+                    if self._key_start >= 0:
+                        self._last_key = text[self._key_start + 1 : i]
+                        self._key_start = -1
+                continue
+            if ch == '"':
+                self._in_str = True
+                if self._depth == 1:
+                    self._key_start = i  # 深さ1の文字列（キーか値。'[' の直前に来るのはキーだけ）
+                continue
+            if ch in "{[":
+                self._depth += 1
+                if self._depth == 2 and ch == "[" and self._last_key == "groups":
+                    self._in_groups = True
+                elif self._depth == 3 and self._in_groups and ch == "{":
+                    self._obj_start = i
+            elif ch in "}]":
+                if self._depth == 3 and self._in_groups and ch == "}" and self._obj_start >= 0:
+                    try:
+                        obj = json.loads(text[self._obj_start : i + 1])
+                    except ValueError:
+                        obj = None
+                    if isinstance(obj, dict):
+                        out.append(obj)
+                    self._obj_start = -1
+                elif self._depth == 2 and ch == "]":
+                    self._in_groups = False
+                self._depth -= 1
+        self._pos = len(text)
+        return out
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    def result(self) -> Dict[str, Any]:
+        try:
+            obj = json.loads(self._text)
+        except ValueError:
+            return {"_raw": self._text}
+        return obj if isinstance(obj, dict) else {}
+
+
+def check_streamed_group(
+    group: Dict[str, Any],
+    *,
+    ac_map: Dict[str, str],
+    log_kinds: Dict[str, str],
+    claimed: Set[str],
+    seen_ids: Set[str],
+    max_ac_per_group: int,
+    min_group_size: int,
+) -> Optional[Dict[str, Any]]:
+    """
+    ストリーム途中のグループ1件が「最終 grouping でもそのまま通る」見込みかを判定する
+    （validate_grouping のグループ単位のハード制約だけ。群数/全体 coverage は最後に見る）
+    通れば正規化したグループを返し claimed / seen_ids を更新する。だめなら None（先行 dispatch しない）
+    """
+    norm = normalize_grouping_obj({"groups": [group]})["groups"]
+    if not norm:
+        return None
+    g = norm[0]
+    ids = g["ac_ids"]
+    gid = str(group.get("group_id") or "").strip()
+    if not gid or gid in seen_ids:
+        return None
+    if not ids or len(ids) > int(max_ac_per_group):
+        return None
+    if len(ac_map) >= int(min_group_size) + 2 and len(ids) < int(min_group_size):
+        return None
+    if any(a not in ac_map or a in claimed for a in ids):
+        return None
+    kinds = {log_kinds.get(a, "other") for a in ids}
+    if "audit" in kinds and "security" in kinds:
+        return None
+    claimed.update(ids)
+    seen_ids.add(gid)
+    return g
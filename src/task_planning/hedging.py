@@ -0,0 +1,178 @@
+# src/task_planning/hedging.py
+from __future__ import annotations
+
+import concurrent.futures
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+
+# -------------------------
+# Settings
+# -------------------------
+HEDGE_QUANTILE = 0.9  # ステージの観測レイテンシのこの分位を超えたら複製を送る
+MIN_SAMPLES = 5  # 分位を信用するのに必要な観測数（それまでは hedge しない）
+WINDOW = 200  # ステージごとに覚えておく直近レイテンシ数
+MAX_EXTRA_RATIO = 0.1  # 追加呼び出しは全呼び出しのこの割合まで（コスト上限）
+POOL_WORKERS = 32
+
+
+def _percentile(xs: List[float], q: float) -> Optional[float]:
+    if not xs:
+        return None
+    s = sorted(xs)
+    return s[min(len(s) - 1, max(0, math.ceil(q * len(s)) - 1))]
+
+
+class Hedger:
+    """
+    LLM 呼び出しの hedging（tail latency 対策）
+    - ステージごとに直近のレイテンシを覚え、p90 を過ぎても返らない呼び出しに複製を1本送る
+    - 先に成功した方を返す（負けた方は止められないので、そのまま終わらせて捨てる）
+    - 複製の数は MAX_EXTRA_RATIO × 呼び出し数まで
+    stats() で hedge 率と「hedge しなかった場合」の tail との比較を出す
+    """
+
+    def __init__(
+        self,
+        *,
+        enabled: bool = False,
+        quantile: float = HEDGE_QUANTILE,
+        min_samples: int = MIN_SAMPLES,
+        max_extra_ratio: float = MAX_EXTRA_RATIO,
+    ) -> None:
+        self.enabled = bool(enabled)
+        self.quantile = float(quantile)
+        self.min_samples = max(1, int(min_samples))
+        self.max_extra_ratio = float(max_extra_ratio)
+        self._lock = threading.Lock()
+        self._pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._samples: Dict[str, Deque[float]] = {}
+        self._calls: Dict[str, List[Dict[str, Any]]] = {}
+        self._total_calls = 0
+        self._total_hedges = 0
+
+    def configure(self, *, enabled: bool, max_extra_ratio: Optional[float] = None) -> None:
+        with self._lock:
+            self.enabled = bool(enabled)
+            if max_extra_ratio is not None:
+                self.max_extra_ratio = float(max_extra_ratio)
+
+    # -------------------------
+    # Internals
+    # -------------------------
+    def _executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=POOL_WORKERS, thread_name_prefix="hedge")
+        return self._pool
+
+    def _observe(self, stage: str, latency: float) -> None:
+        with self._lock:
+            self._samples.setdefault(stage, deque(maxlen=WINDOW)).append(latency)
+
+    def hedge_delay(self, stage: str) -> Optional[float]:
+        with self._lock:
+            xs = list(self._samples.get(stage, ()))
+        if len(xs) < self.min_samples:
+            return None
+        return _percentile(xs, self.quantile)
+
+    def _submit(self, stage: str, fn: Callable[[], Any], rec: Dict[str, Any], key: str) -> concurrent.futures.Future:
+        def _timed() -> Any:
+            t0 = time.monotonic()
+            try:
+                return fn()
+            finally:
+                dt = time.monotonic() - t0
+                rec[key] = dt
+                self._observe(stage, dt)
+
+        return self._executor().submit(_timed)
+
+    # -------------------------
+    # API
+    # -------------------------
+    def run(self, stage: str, fn: Callable[[], Any]) -> Any:
+        t0 = time.monotonic()
+        rec: Dict[str, Any] = {"start": t0, "hedged": False, "winner": "primary"}
+        with self._lock:
+            self._total_calls += 1
+            self._calls.setdefault(stage, []).append(rec)
+        delay = self.hedge_delay(stage) if self.enabled else None
+
+        if delay is None:
+            try:
+                return fn()
+            finally:
+                rec["primary"] = rec["effective"] = time.monotonic() - t0
+                self._observe(stage, rec["effective"])
+
+        primary = self._submit(stage, fn, rec, "primary")
+        done, _ = concurrent.futures.wait([primary], timeout=delay)
+        with self._lock:
+            allow = not done and self._total_hedges + 1 <= self.max_extra_ratio * self._total_calls
+            if allow:
+                self._total_hedges += 1
+        if not allow:
+            try:
+                return primary.result()
+            finally:
+                rec["effective"] = time.monotonic() - t0
+
+        rec["hedged"] = True
+        hedge = self._submit(stage, fn, rec, "hedge")
+        pending = {primary, hedge}
+        err: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for f in done:
+                    if f.exception() is None:
+                        rec["winner"] = "primary" if f is primary else "hedge"
+                        return f.result()
+                    err = f.exception()
+            assert err is not None
+            raise err
+        finally:
+            rec["effective"] = time.monotonic() - t0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        ステージ別: calls / hedged / hedge_wins / hedge_rate と effective の p50/p90/p99、
+        p99_without_hedging（primary のレイテンシ。まだ返っていない primary は経過時間を下限として使う）
+        """
+        now = time.monotonic()
+        out: Dict[str, Any] = {
+            "enabled": self.enabled,
+            "max_extra_ratio": self.max_extra_ratio,
+            "extra_calls": self._total_hedges,
+            "stages": {},
+        }
+        with self._lock:
+            calls = {k: list(v) for k, v in self._calls.items()}
+        for stage, recs in calls.items():
+            eff = [float(r["effective"]) for r in recs if "effective" in r]
+            base = [float(r.get("primary", now - r["start"])) for r in recs if "effective" in r]
+            hedged = sum(1 for r in recs if r["hedged"])
+            p99, p99_base = _percentile(eff, 0.99), _percentile(base, 0.99)
+            out["stages"][stage] = {
+                "calls": len(recs),
+                "hedged": hedged,
+                "hedge_wins": sum(1 for r in recs if r["hedged"] and r["winner"] == "hedge"),
+                "hedge_rate": round(hedged / float(len(recs)), 4) if recs else 0.0,
+                "p50_s": round(_percentile(eff, 0.5) or 0.0, 3),
+                "p90_s": round(_percentile(eff, 0.9) or 0.0, 3),
+                "p99_s": round(p99 or 0.0, 3),
+                "p99_without_hedging_s": round(p99_base or 0.0, 3),
+                "tail_saved_s": round(max(0.0, (p99_base or 0.0) - (p99 or 0.0)), 3),
+            }
+        return out
+
+
+_SHARED = Hedger()
+
+
+def shared_hedger() -> Hedger:
+    return _SHARED
@@ -0,0 +1,226 @@
+# src/task_planning/incremental.py
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from .similarity import normalize_text
+
+
+# 前回出力の group_results をそのまま使い回すための差分計画
+# - AC は正規化テキストで突き合わせる（ID は位置で振られるので、挿入/削除でずれる）
+# - グループの全 AC が残っていて、方針（policy fingerprint）も同じなら再利用
+# - それ以外の AC だけを「影響範囲」として再 clustering / 再 taskgen する
+
+_GID_RE = re.compile(r"^G(\d+)$")
+
+# 再利用しない group_results（劣化出力は作り直す）
+_DEGRADED_MODES = ("failsafe", "failsafe_group", "empty")
+
+
+def plan_fingerprint(story: Dict[str, Any], policy: Dict[str, Any]) -> str:
+    """
+    グループ構成/タスク内容に効く入力（story + CLI の方針）のハッシュ
+    これが前回と違えば何も再利用しない
+    """
+    raw = json.dumps({"story": story, "policy": policy}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def group_content_hash(texts: List[str], fingerprint: str) -> str:
+    """グループの AC テキスト集合（順不同） + fingerprint のハッシュ"""
+    h = hashlib.sha1(fingerprint.encode("utf-8"))
+    for t in sorted(normalize_text(x) for x in texts):
+        h.update(b"\x00")
+        h.update(t.encode("utf-8"))
+    return h.hexdigest()
+
+
+def group_hashes(
+    *, grouping: Dict[str, Any], ac_map: Dict[str, str], fingerprint: str
+) -> Dict[str, str]:
+    out: Dict[str, str] = {}
+    for g in (grouping.get("groups") or []) if isinstance(grouping, dict) else []:
+        if isinstance(g, dict):
+            ids = [a for a in (g.get("ac_ids") or []) if a in ac_map]
+            out[str(g.get("group_id", ""))] = group_content_hash([ac_map[a] for a in ids], fingerprint)
+    return out
+
+
+@dataclass
+class IncrementalPlan:
+    """
+    reused_groups / reused_results: 新しい AC ID に付け替え済みの grouping.groups / group_results
+    affected_ids: 再計画する AC（新 ID、ac_map の順）
+    report: meta.incremental に入れる差分レポート
+    """
+
+    reused_groups: List[Dict[str, Any]] = field(default_factory=list)
+    reused_results: List[Dict[str, Any]] = field(default_factory=list)
+    affected_ids: List[str] = field(default_factory=list)
+    report: Dict[str, Any] = field(default_factory=dict)
+
+
+def _match_acs(prev_ac_map: Dict[str, str], ac_map: Dict[str, str]) -> Dict[str, str]:
+    """旧 ID → 新 ID（正規化テキストが同じもの。同文が複数あれば出現順に対応させる）"""
+    free: Dict[str, List[str]] = {}
+    for a, t in ac_map.items():
+        free.setdefault(normalize_text(t), []).append(a)
+    out: Dict[str, str] = {}
+    for a, t in prev_ac_map.items():
+        lst = free.get(normalize_text(t))
+        if lst:
+            out[a] = lst.pop(0)
+    return out
+
+
+def _remap(ids: Any, old_to_new: Dict[str, str]) -> Any:
+    if not isinstance(ids, list):
+        return ids
+    return [old_to_new.get(a, a) for a in ids]
+
+
+def plan_incremental(
+    prev: Dict[str, Any],
+    *,
+    ac_map: Dict[str, str],
+    fingerprint: str,
+) -> IncrementalPlan:
+    """
+    前回出力 prev（run.py の出力 JSON）と今回の ac_map から、再利用するグループと再計画する AC を決める
+    再利用の条件:
+      - prev が fallback 出力でなく、plan_fingerprint が一致
+      - グループの全 AC が今回も（正規化テキストで）存在
+      - group_result が劣化モードでなく、タスクがグループ外の AC を持たない（task dedup で他グループと統合済みでない）
+    """
+    plan = IncrementalPlan()
+    all_ids = list(ac_map)
+    prev_meta = prev.get("meta") if isinstance(prev.get("meta"), dict) else {}
+    prev_ac_map = prev.get("ac_map") if isinstance(prev.get("ac_map"), dict) else {}
+
+    old_to_new = _match_acs(prev_ac_map, ac_map)
+    new_matched = set(old_to_new.values())
+    acs_report = {
+        "unchanged": len(old_to_new),
+        "added": len(ac_map) - len(new_matched),
+        "removed": len(prev_ac_map) - len(old_to_new),
+    }
+
+    reason = ""
+    if not prev_ac_map:
+        reason = "no_previous_output"
+    elif bool(prev_meta.get("fallback")):
+        reason = "previous_was_fallback"
+    elif prev_meta.get("plan_fingerprint") != fingerprint:
+        reason = "policy_changed"
+    if reason:
+        plan.affected_ids = all_ids
+        plan.report = {"enabled": True, "reason": reason, "acs": acs_report, "groups": {"reused": [], "recomputed": []}}
+        return plan
+
+    results_by_gid = {
+        str(gr.get("group_id")): gr for gr in (prev.get("group_results") or []) if isinstance(gr, dict)
+    }
+    prev_hashes = prev_meta.get("group_hashes") if isinstance(prev_meta.get("group_hashes"), dict) else {}
+
+    claimed: set = set()
+    dropped: List[Dict[str, str]] = []
+    for g in (prev.get("grouping") or {}).get("groups") or []:
+        if not isinstance(g, dict):
+            continue
+        gid = str(g.get("group_id", ""))
+        ids = [a for a in (g.get("ac_ids") or []) if isinstance(a, str)]
+        gr = results_by_gid.get(gid)
+
+        why = ""
+        if not ids or any(a not in old_to_new for a in ids):
+            why = "acs_changed"
+        elif gr is None or str((gr.get("meta") or {}).get("mode", "")) in _DEGRADED_MODES:
+            why = "degraded"
+        elif not bool((gr.get("validate") or {}).get("pass", True)):
+            why = "not_validated"
+        elif any(
+            a not in ids
+            for t in (gr.get("tasks") or [])
+            if isinstance(t, dict)
+            for a in (t.get("ac_ids") or [])
+        ):
+            why = "cross_group_task"
+        elif not set(ids) <= {
+            a for t in (gr.get("tasks") or []) if isinstance(t, dict) for a in (t.get("ac_ids") or [])
+        }:
+            # タスクを他グループへ統合された側（--dedup-tasks）。自分のタスクだけでは AC を覆えない
+            why = "tasks_incomplete"
+        elif gid in prev_hashes and prev_hashes[gid] != group_content_hash(
+            [prev_ac_map[a] for a in ids], fingerprint
+        ):
+            why = "hash_mismatch"
+        if why:
+            dropped.append({"group_id": gid, "reason": why})
+            continue
+
+        new_g = copy.deepcopy(g)
+        new_g["ac_ids"] = _remap(ids, old_to_new)
+        new_gr = copy.deepcopy(gr)
+        if "ac_ids" in new_gr:
+            new_gr["ac_ids"] = _remap(new_gr.get("ac_ids"), old_to_new)
+        for t in new_gr.get("tasks") or []:
+            if isinstance(t, dict):
+                t["ac_ids"] = _remap(t.get("ac_ids"), old_to_new)
+        new_gr.setdefault("meta", {})["incremental"] = "reused"
+        plan.reused_groups.append(new_g)
+        plan.reused_results.append(new_gr)
+        claimed.update(new_g["ac_ids"])
+
+    plan.affected_ids = [a for a in all_ids if a not in claimed]
+    plan.report = {
+        "enabled": True,
+        "reason": "",
+        "acs": {**acs_report, "recomputed": len(plan.affected_ids), "reused": len(claimed)},
+        "groups": {
+            "reused": [str(g.get("group_id")) for g in plan.reused_groups],
+            "dropped": dropped,
+            "recomputed": [],
+        },
+        "tasks_reused": sum(len(gr.get("tasks") or []) for gr in plan.reused_results),
+    }
+    return plan
+
+
+def renumber_new_groups(new_groups: List[Dict[str, Any]], reused_groups: List[Dict[str, Any]]) -> None:
+    """
+    影響範囲の clustering 結果は G01.. から振られるので、再利用グループと被らない ID に振り直す（in-place）
+    """
+    used = {str(g.get("group_id")) for g in reused_groups}
+    n = max([int(m.group(1)) for m in (_GID_RE.match(u) for u in used) if m] or [0])
+    for g in new_groups:
+        if not isinstance(g, dict):
+            continue
+        n += 1
+        while f"G{n:02d}" in used:
+            n += 1
+        g["group_id"] = f"G{n:02d}"
+        used.add(g["group_id"])
+
+
+def sort_groups_by_ac_order(groups: List[Dict[str, Any]], ac_map: Dict[str, str]) -> List[Dict[str, Any]]:
+    """再利用グループと新グループを、先頭 AC の順（ストーリー内の位置）で並べる"""
+    pos = {a: i for i, a in enumerate(ac_map)}
+
+    def _first(g: Dict[str, Any]) -> int:
+        return min([pos.get(a, len(pos)) for a in (g.get("ac_ids") or [])] or [len(pos)])
+
+    return sorted(groups, key=_first)
+
+
+def load_previous(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            obj = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return obj if isinstance(obj, dict) else None
@@ -0,0 +1,173 @@
+# src/task_planning/keywords.py
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, Tuple
+
+
+# =========================
+# Keyword tables
+# =========================
+# 各テーブルは (label, keywords) のルール列。先に一致したルールが勝つ（判定順が重要）。
+# 一致は「lower() した AC 文に部分文字列として含まれるか」で、従来の any(k in t ...) と同じ。
+@dataclass(frozen=True)
+class KeywordTable:
+    name: str
+    rules: Tuple[Tuple[str, Tuple[str, ...]], ...]
+    default: str
+
+
+# ログ分離バリデーション用（audit 優先 → security → log）
+LOG_KIND = KeywordTable(
+    name="log_kind",
+    rules=(
+        ("audit", ("audit", "tamper", "改ざん", "耐改ざん")),
+        ("security", ("security log", "セキュリティログ", "ブルート", "brute")),
+        ("log", ("log", "ログ")),
+    ),
+    default="other",
+)
+
+# simple_fallback_grouping のバケット（"log" は LOG_KIND で細分する）
+FALLBACK_BUCKET = KeywordTable(
+    name="fallback_bucket",
+    rules=(
+        ("token_jwt", ("jwt", "token")),
+        ("password_hash", ("password", "bcrypt", "hash", "ソルト")),
+        ("email_validation", ("email", "domain")),
+        ("lockout", ("lock", "ロック", "failed", "失敗")),
+        ("session_csrf", ("csrf", "session fixation")),
+        ("rate_limit", ("rate", "429")),
+        ("log", ("log", "ログ")),
+        ("ui", ("ui", "mask", "画面")),
+    ),
+    default="other",
+)
+
+# failsafe_taskgen.ac_map_to_min_tasks の subcategory
+FAILSAFE_SUBCATEGORY = KeywordTable(
+    name="failsafe_subcategory",
+    rules=(
+        ("Security", ("sql injection", "sqli", "xss", "sanitize", "csrf", "security")),
+        ("Audit", ("audit", "tamper", "監査", "改ざん", "耐改ざん")),
+        ("Logging", ("log", "ログ", "history")),
+        ("DB", ("db", "schema", "migration", "index", "table")),
+        ("UI", ("ui", "screen", "responsive", "layout", "widget")),
+        (
+            "API",
+            ("api", "rest", "endpoint", "rate limit", "caching", "cache", "performance", "ms", "sec"),
+        ),
+        ("Validation", ("validation", "invalid", "format", "error when", "must reject")),
+    ),
+    default="General",
+)
+
+# grouped_taskgen.fallback_ac_tasks の subcategory
+FALLBACK_SUBCATEGORY = KeywordTable(
+    name="fallback_subcategory",
+    rules=(
+        (
+            "Logging/Audit",
+            (
+                "tamper", "immutable", "audit log", "audit", "監査", "耐改ざん", "改ざん",
+                "security log", "セキュリティログ", "log", "logging", "ログ",
+            ),
+        ),
+        (
+            "Auth/Permission",
+            (
+                "authenticated", "authentication", "auth", "login", "jwt", "session",
+                "permission", "role", "rbac", "authorize", "authorization",
+            ),
+        ),
+        (
+            "Security/Validation",
+            (
+                "sql injection", "sqli", "xss", "sanitize", "sanitise", "csrf", "validation",
+                "rate limit", "ratelimit", "throttle", "brute",
+            ),
+        ),
+        (
+            "Performance/Cache",
+            (
+                "cache", "caching", "latency", "performance", "throughput", "p95",
+                " ms", "ms.", "milliseconds", " second", "seconds", "1 second",
+            ),
+        ),
+        ("API", ("api", "rest", "endpoint", "http", "response")),
+        ("UI/UX", ("responsive", "mobile", "layout", "widget", "screen", "ui", "ux")),
+        ("Export/Report", ("export", "csv", "pdf", "report")),
+    ),
+    default="General",
+)
+
+TABLES: Tuple[KeywordTable, ...] = (LOG_KIND, FALLBACK_BUCKET, FAILSAFE_SUBCATEGORY, FALLBACK_SUBCATEGORY)
+
+
+# =========================
+# Automaton (1 regex for all tables)
+# =========================
+def _trie_pattern(words: Iterable[str]) -> str:
+    """
+    キーワード集合を trie 形の正規表現にする（共通 prefix を1回だけ辿る）
+    終端ノードは (?:...)? にするので、同じ開始位置では最長一致が先に試される
+    """
+    trie: Dict[str, dict] = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+def _compile(tables: Tuple[KeywordTable, ...]) -> Tuple["re.Pattern[str]", Dict[str, FrozenSet[str]]]:
+    words = sorted({k for tb in tables for _, kws in tb.rules for k in kws})
+    # 各開始位置で最長のキーワードだけ拾われるので、
+    # それに含まれる短いキーワード（"audit log" ⊃ "audit","log"）は closure で補う
+    closure = {w: frozenset(k for k in words if k in w) for w in words}
+    # lookahead なので重なり合う出現もすべて拾える
+    pattern = re.compile(f"(?=({_trie_pattern(words)}))")
+    return pattern, closure
+
+
+_PATTERN, _CLOSURE = _compile(TABLES)
+_EMPTY: FrozenSet[str] = frozenset()
+
+
+@lru_cache(maxsize=131072)
+def keyword_hits(text: str) -> FrozenSet[str]:
+    """
+    text に含まれる全キーワード（全テーブル分）を1回の走査で返す（AC 文ごとにキャッシュ）
+    """
+    found = set(_PATTERN.findall((text or "").lower()))
+    if not found:
+        return _EMPTY
+    return frozenset().union(*(_CLOSURE[w] for w in found))
+
+
+def classify(text: str, table: KeywordTable) -> str:
+    hits = keyword_hits(text or "")
+    if hits:
+        for label, kws in table.rules:
+            if not hits.isdisjoint(kws):
+                return label
+    return table.default
+
+
+def classify_all(text: str) -> Dict[str, str]:
+    """
+    全テーブルのラベルをまとめて返す（走査は keyword_hits の1回だけ）
+    """
+    return {tb.name: classify(text, tb) for tb in TABLES}
+
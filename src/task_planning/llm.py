@@ -1,8 +1,19 @@
 import os
 import json
-from typing import Any, Dict, List
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from openai import OpenAI
+from openai import APIConnectionError, APITimeoutError, InternalServerError, OpenAI, RateLimitError
+
+from .circuit_breaker import shared_breaker
+from .deadline import Deadline, current_deadline
+from .hedging import shared_hedger
+
+# breaker の失敗として数えるのはプロバイダ側の障害だけ（接続/timeout、5xx、429）
+_PROVIDER_ERRORS = (APIConnectionError, InternalServerError, RateLimitError)
+
+# 締め切りが無い時の1回分の timeout
+CALL_TIMEOUT_S = 60.0
 
 
 def _require_env(name: str) -> str:
@@ -12,11 +23,58 @@ def _require_env(name: str) -> str:
     return v
 
 
-client = OpenAI(
-    api_key=_require_env("OPENAI_API_KEY"),
-    timeout=60.0,
-    max_retries=2,
-)
+# client は最初の呼び出しで作る（--dry-run / テストは API キー無しで import できる）
+_client: Optional[OpenAI] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> OpenAI:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OpenAI(
+                api_key=_require_env("OPENAI_API_KEY"),
+                timeout=CALL_TIMEOUT_S,
+                max_retries=2,
+            )
+        return _client
+
+
+# stage ごとのトークン使用量（run.py が meta.llm_usage に出し、estimate.py が次回の見積もりに使う）
+_usage: Dict[str, Dict[str, int]] = {}
+_usage_lock = threading.Lock()
+
+
+def _record_usage(stage: str, usage: Any) -> None:
+    if usage is None:
+        return
+    with _usage_lock:
+        st = _usage.setdefault(stage, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+        st["calls"] += 1
+        st["prompt_tokens"] += int(getattr(usage, "prompt_tokens", 0) or 0)
+        st["completion_tokens"] += int(getattr(usage, "completion_tokens", 0) or 0)
+
+
+def usage_stats() -> Dict[str, Dict[str, int]]:
+    with _usage_lock:
+        return {k: dict(v) for k, v in _usage.items()}
+
+
+def _with_deadline(c: OpenAI, dl: Optional[Deadline]) -> Tuple[OpenAI, bool]:
+    """
+    締め切りがあれば timeout を残り時間に合わせ、リトライはしない（超過しそうなら呼ばずに例外）
+    戻り値の bool は「timeout を締め切りで縮めたか」
+    """
+    if dl is None:
+        return c, False
+    timeout = dl.call_timeout(CALL_TIMEOUT_S)
+    return c.with_options(timeout=timeout, max_retries=0), timeout < CALL_TIMEOUT_S
+
+
+def _provider_failed(e: Exception, *, deadline_capped: bool) -> bool:
+    # 締め切りで縮めた timeout による打ち切りは呼び出し側の都合（プロバイダの障害ではない）。
+    # breaker の状態は /tasks の全プロセスで共有なので、1リクエストの短い deadline_s で open させない
+    return not (deadline_capped and isinstance(e, APITimeoutError))
 
 
 def call_llm_json(
@@ -25,19 +83,91 @@ def call_llm_json(
     messages: List[Dict[str, str]],
     temperature: float = 0.0,
     max_tokens: int = 1400,
+    deadline: Optional[Deadline] = None,
+    stage: str = "default",
 ) -> Dict[str, Any]:
-    print(f"[LLM] request -> model={model}, max_tokens={max_tokens}", flush=True)
-    resp = client.chat.completions.create(
-        model=model,
-        messages=messages,
-        temperature=temperature,
-        max_tokens=max_tokens,
-        response_format={"type": "json_object"},
-    )
-    text = resp.choices[0].message.content or "{}"
-    print("[LLM] response <- ok", flush=True)
+    """
+    stage: レイテンシ統計/hedging の単位（cluster, taskgen, describe ...）
+    """
+    c, capped = _with_deadline(get_client(), deadline or current_deadline())
+
+    def _attempt() -> str:
+        # 障害中は breaker が即 CircuitOpenError を投げ、呼び出し側の failsafe がすぐ動く
+        breaker = shared_breaker()
+        breaker.before_call()
+
+        print(f"[LLM] request -> model={model}, max_tokens={max_tokens}, stage={stage}", flush=True)
+        try:
+            resp = c.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                response_format={"type": "json_object"},
+            )
+        except _PROVIDER_ERRORS as e:
+            breaker.record(not _provider_failed(e, deadline_capped=capped))
+            raise
+        except Exception:
+            breaker.record(True)
+            raise
+        breaker.record(True)
+        _record_usage(stage, getattr(resp, "usage", None))
+        print("[LLM] response <- ok", flush=True)
+        return resp.choices[0].message.content or "{}"
+
+    # hedging 有効時は、stage の p90 を過ぎても返らなければ複製を1本送って早い方を使う
+    text = shared_hedger().run(stage, _attempt)
 
     try:
         return json.loads(text)
     except json.JSONDecodeError:
         return {"_raw": text}
+
+
+def stream_llm_text(
+    *,
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float = 0.0,
+    max_tokens: int = 1400,
+    deadline: Optional[Deadline] = None,
+    stage: str = "default",
+) -> Iterator[str]:
+    """
+    JSON 出力をトークン列のまま返す（clustering の stream モード用。呼び出し側が組み立てて json.loads する）
+    breaker / deadline / usage は call_llm_json と同じ。途中で複製しても意味がないので hedging はしない
+    """
+    c, capped = _with_deadline(get_client(), deadline or current_deadline())
+
+    breaker = shared_breaker()
+    breaker.before_call()
+    print(f"[LLM] stream -> model={model}, max_tokens={max_tokens}, stage={stage}", flush=True)
+    ok = True
+    stream = None
+    try:
+        stream = c.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            response_format={"type": "json_object"},
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                _record_usage(stage, chunk.usage)
+            for choice in chunk.choices or []:
+                if choice.delta and choice.delta.content:
+                    yield choice.delta.content
+    except _PROVIDER_ERRORS as e:
+        ok = not _provider_failed(e, deadline_capped=capped)
+        raise
+    finally:
+        # 呼び出し側が途中で close しても（GeneratorExit）接続を閉じて結果は必ず記録する
+        # （記録しないと half-open の probe が戻らず breaker が詰まる）
+        if stream is not None and hasattr(stream, "close"):
+            stream.close()
+        breaker.record(ok)
+    print("[LLM] stream <- done", flush=True)
@@ -0,0 +1,200 @@
+# src/task_planning/llm_cache.py
+from __future__ import annotations
+
+import copy
+import hashlib
+import random
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .similarity import lsh_keys, minhash_signature, normalize_text, shingles
+
+
+# -------------------------
+# Settings
+# -------------------------
+DEFAULT_MAX_ENTRIES = 2000
+DEFAULT_NEAR_THRESHOLD = 0.9
+
+# 近似 tier の署名（128 perm を 16 band x 8 row に分ける）
+# Jaccard 0.9 のペアはほぼ確実に候補に上がり、0.5 程度だと ~6% しか上がらない
+NEAR_PERM = 128
+NEAR_BANDS = 16
+NEAR_SHINGLE = 5
+
+
+@dataclass(frozen=True)
+class StagePolicy:
+    """
+    ステージごとのキャッシュ方針（近似再利用はここで明示的に opt-in したステージだけ）
+    - near: 近似 tier を使うか
+    - threshold: 推定 Jaccard の下限
+    - audit_rate: 近似ヒット時に本物も計算して比べる割合（false reuse の監査）
+    - same: audit 時に「再利用して問題なかったか」を判定する関数（None なら ==）
+    """
+
+    near: bool = False
+    threshold: float = DEFAULT_NEAR_THRESHOLD
+    audit_rate: float = 0.0
+    same: Optional[Callable[[Any, Any], bool]] = None
+
+
+def _exact_key(stage: str, context: str, body: str) -> str:
+    h = hashlib.sha256()
+    for part in (stage, context, body):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def _context_key(stage: str, context: str) -> str:
+    return hashlib.sha1(f"{stage}\x00{context}".encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    プロセス内の2段キャッシュ（外部サービス不要）
+    - exact: (stage, context, body) の sha256
+    - near : context は完全一致、body は MinHash/LSH で近いものを再利用
+      （context = model + system prompt など「変わったら別物」の部分、body = 入力本文）
+    LRU で max_entries を超えたら古いものから捨てる。
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        policies: Optional[Dict[str, StagePolicy]] = None,
+        seed: int = 0,
+    ) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self.policies: Dict[str, StagePolicy] = dict(policies or {})
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._bands: Dict[Tuple[str, int, Tuple[int, ...]], List[str]] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    # -------------------------
+    # Internals
+    # -------------------------
+    def _stat(self, stage: str, name: str) -> None:
+        st = self._stats.setdefault(
+            stage, {"exact_hits": 0, "near_hits": 0, "misses": 0, "audits": 0, "false_reuse": 0, "stored": 0}
+        )
+        st[name] += 1
+
+    @staticmethod
+    def _signature(body: str) -> Tuple[int, ...]:
+        sh = shingles(normalize_text(body), k=NEAR_SHINGLE, normalized=True)
+        return minhash_signature(sh, num_perm=NEAR_PERM)
+
+    def _near_lookup(self, ctx: str, sig: Tuple[int, ...], threshold: float) -> Optional[str]:
+        best, best_est = None, 0.0
+        seen = set()
+        for band_i, band in lsh_keys(sig, bands=NEAR_BANDS):
+            for key in self._bands.get((ctx, band_i, band), ()):
+                if key in seen or key not in self._entries:
+                    continue
+                seen.add(key)
+                other = self._entries[key]["sig"]
+                est = sum(1 for x, y in zip(sig, other) if x == y) / float(len(sig))
+                if est >= threshold and est > best_est:
+                    best, best_est = key, est
+        return best
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_entries:
+            key, entry = self._entries.popitem(last=False)
+            if entry.get("sig") is None:
+                continue
+            for band_i, band in lsh_keys(entry["sig"], bands=NEAR_BANDS):
+                lst = self._bands.get((entry["ctx"], band_i, band))
+                if lst and key in lst:
+                    lst.remove(key)
+
+    # -------------------------
+    # API
+    # -------------------------
+    def lookup(self, stage: str, *, context: str, body: str) -> Tuple[Optional[Any], str]:
+        """
+        戻り値: (value, kind)  kind = "exact" | "near" | "miss"
+        value は deepcopy（呼び出し側が書き換えてもキャッシュは壊れない）
+        """
+        pol = self.policies.get(stage, StagePolicy())
+        key = _exact_key(stage, context, body)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return copy.deepcopy(self._entries[key]["value"]), "exact"
+            if pol.near:
+                near = self._near_lookup(_context_key(stage, context), self._signature(body), pol.threshold)
+                if near is not None:
+                    self._entries.move_to_end(near)
+                    return copy.deepcopy(self._entries[near]["value"]), "near"
+        return None, "miss"
+
+    def store(self, stage: str, *, context: str, body: str, value: Any) -> None:
+        pol = self.policies.get(stage, StagePolicy())
+        key = _exact_key(stage, context, body)
+        ctx = _context_key(stage, context)
+        sig = self._signature(body) if pol.near else None
+        with self._lock:
+            self._entries[key] = {"value": copy.deepcopy(value), "ctx": ctx, "sig": sig}
+            self._entries.move_to_end(key)
+            if sig is not None:
+                for band_i, band in lsh_keys(sig, bands=NEAR_BANDS):
+                    self._bands.setdefault((ctx, band_i, band), []).append(key)
+            self._stat(stage, "stored")
+            self._evict()
+
+    def call(self, stage: str, *, context: str, body: str, compute: Callable[[], Any]) -> Any:
+        """
+        キャッシュ経由で compute() を呼ぶ
+        近似ヒットは audit_rate の割合で本物も計算し、policy.same で食い違えば false_reuse として数える
+        （その場合は本物の値を返してキャッシュも置き換える）
+        """
+        pol = self.policies.get(stage, StagePolicy())
+        value, kind = self.lookup(stage, context=context, body=body)
+
+        if kind == "exact":
+            with self._lock:
+                self._stat(stage, "exact_hits")
+            return value
+
+        if kind == "near":
+            with self._lock:
+                self._stat(stage, "near_hits")
+                audit = pol.audit_rate > 0 and self._rng.random() < pol.audit_rate
+            if not audit:
+                return value
+            fresh = compute()
+            same = pol.same(value, fresh) if pol.same else value == fresh
+            with self._lock:
+                self._stat(stage, "audits")
+                if not same:
+                    self._stat(stage, "false_reuse")
+            self.store(stage, context=context, body=body, value=fresh)
+            return fresh
+
+        with self._lock:
+            self._stat(stage, "misses")
+        fresh = compute()
+        self.store(stage, context=context, body=body, value=fresh)
+        return fresh
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        ステージ別カウンタ + reuse_rate / false_reuse_rate（audit した近似ヒットに対する割合）
+        """
+        with self._lock:
+            out: Dict[str, Dict[str, Any]] = {}
+            for stage, st in self._stats.items():
+                s: Dict[str, Any] = dict(st)
+                total = st["exact_hits"] + st["near_hits"] + st["misses"]
+                s["reuse_rate"] = round((st["exact_hits"] + st["near_hits"]) / total, 4) if total else 0.0
+                s["false_reuse_rate"] = round(st["false_reuse"] / st["audits"], 4) if st["audits"] else 0.0
+                out[stage] = s
+            return out
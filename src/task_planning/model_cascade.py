@@ -0,0 +1,97 @@
+# src/task_planning/model_cascade.py
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+# ステージごとのモデル cascade（安いモデルから試し、検証に落ちたら上位モデルでやり直す）
+# 指定の書式: "cluster=gpt-4.1-nano>gpt-4o-mini;taskgen=gpt-4.1-nano>gpt-4o-mini;*=gpt-4o-mini"
+#   - ">" で左から右へ昇格、"*" は未指定ステージの既定
+# task_planning のステージ: cluster / taskgen / describe
+# story_refinement のステージ: refine_classify / refine_issues / refine_suggest
+
+
+def parse_routes(spec: str) -> Dict[str, Tuple[str, ...]]:
+    routes: Dict[str, Tuple[str, ...]] = {}
+    for part in (spec or "").replace("\n", ";").split(";"):
+        if "=" not in part:
+            continue
+        stage, _, chain = part.partition("=")
+        tiers = tuple(m.strip() for m in chain.split(">") if m.strip())
+        if stage.strip() and tiers:
+            routes[stage.strip()] = tiers
+    return routes
+
+
+class ModelCascade:
+    """
+    - tiers(stage): 試す順のモデル列（routes に無ければ "*"、それも無ければ default_model 1段）
+    - record(stage, model, ok): 各 tier の一発目が検証を通ったか
+    - run(stage, attempt, valid=...): 下位 tier の例外/不合格は次の tier へ。最上位の結果はそのまま返す
+    stats() はステージ×モデルごとの成功率と昇格回数
+    """
+
+    def __init__(self, routes: Optional[Dict[str, Sequence[str]]] = None, *, default_model: str) -> None:
+        self.routes: Dict[str, Tuple[str, ...]] = {k: tuple(v) for k, v in (routes or {}).items() if v}
+        self.default_model = default_model
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Dict[str, int]]] = {}
+        self._escalations: Dict[str, int] = {}
+
+    def tiers(self, stage: str) -> Tuple[str, ...]:
+        return self.routes.get(stage) or self.routes.get("*") or (self.default_model,)
+
+    def route_key(self, stage: str) -> str:
+        """キャッシュの context 等に使う（tier 構成が変われば別物）"""
+        return ">".join(self.tiers(stage))
+
+    def record(self, stage: str, model: str, ok: bool) -> None:
+        with self._lock:
+            st = self._stats.setdefault(stage, {}).setdefault(model, {"attempts": 0, "ok": 0})
+            st["attempts"] += 1
+            st["ok"] += int(bool(ok))
+
+    def escalate(self, stage: str) -> None:
+        with self._lock:
+            self._escalations[stage] = self._escalations.get(stage, 0) + 1
+
+    def run(self, stage: str, attempt: Callable[[str], T], *, valid: Callable[[T], bool] = lambda _r: True) -> T:
+        tiers = self.tiers(stage)
+        for i, model in enumerate(tiers):
+            last = i == len(tiers) - 1
+            try:
+                result = attempt(model)
+            except Exception:
+                self.record(stage, model, False)
+                if last:
+                    raise
+                self.escalate(stage)
+                continue
+            ok = bool(valid(result))
+            self.record(stage, model, ok)
+            if ok or last:
+                return result
+            self.escalate(stage)
+        raise RuntimeError(f"no model configured for stage {stage!r}")  # pragma: no cover
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = {}
+            for stage, per_model in self._stats.items():
+                out[stage] = {
+                    "tiers": list(self.tiers(stage)),
+                    "escalations": self._escalations.get(stage, 0),
+                    "models": {
+                        m: {**st, "success_rate": round(st["ok"] / float(st["attempts"]), 4) if st["attempts"] else 0.0}
+                        for m, st in per_model.items()
+                    },
+                }
+            return out
+
+
+def cascade_from_env(name: str, *, default_model: str) -> ModelCascade:
+    return ModelCascade(parse_routes(os.getenv(name, "")), default_model=default_model)
@@ -3,17 +3,47 @@ from __future__ import annotations
 
 import argparse
 import json
+import os
+import sys
 from datetime import datetime
-from typing import Any, Dict, List, Tuple
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
 
 from src.task_planning.grouping.cluster_agent import cluster_acs
-from .grouped_taskgen.taskgen_agent import generate_tasks_for_group
+from src.task_planning.grouping.policy import (
+    POLICY_MODES,
+    cost_model_from_history,
+    tune_grouping_policy,
+)
+from .grouped_taskgen.taskgen_agent import _task_bounds, generate_tasks_for_group, generate_tasks_for_group_pack
+from .grouped_taskgen.packer import pack_small_groups
+from .grouped_taskgen.describe_agent import apply_descriptions, fill_group_descriptions
+from .grouped_taskgen.task_dedup import TASK_DUP_THRESHOLD, dedup_tasks_across_groups
+from .grouped_taskgen.template_store import TemplateStore, reuse_group_tasks
 
 # ✅ new: failsafe
 from .failsafe_taskgen import ac_map_to_min_tasks
 
 # ✅ new: traceability
 from .traceability import enforce_ac_traceability
+from .validate import validate_group_tasks
+
+from .ac_dedup import NEAR_DUP_THRESHOLD, dedup_ac_map, expand_duplicates
+from .deadline import CLUSTER_SHARE, RESERVE_S, Deadline, DeadlineExceeded, bind_deadline
+from .hedging import MAX_EXTRA_RATIO, shared_hedger
+from .estimate import estimate_run, load_history
+from .event_stream import EventStream
+from .llm import usage_stats
+from .model_cascade import ModelCascade, parse_routes
+from .checkpoint import CHECKPOINT_SUFFIX, CheckpointJournal, checkpoint_key
+from .incremental import (
+    IncrementalPlan,
+    group_hashes,
+    load_previous,
+    plan_fingerprint,
+    plan_incremental,
+    renumber_new_groups,
+    sort_groups_by_ac_order,
+)
 
 
 def _load_json(path: str) -> Dict[str, Any]:
@@ -85,39 +115,6 @@ def _select_range(all_acs: List[str], *, start: int, limit: int) -> List[str]:
     return selected
 
 
-def _auto_tune_grouping_policy(
-    n_acs: int,
-    *,
-    max_ac_per_group: int,
-    target_groups_min: int,
-    target_groups_max: int,
-    max_groups: int,
-    min_group_size: int,
-) -> Dict[str, int]:
-    max_ac_per_group = max(1, int(max_ac_per_group))
-    min_group_size = max(2, int(min_group_size))
-
-    feasible_max_groups = max(1, n_acs // min_group_size)
-    max_groups = min(int(max_groups), feasible_max_groups)
-
-    tmin = int(target_groups_min)
-    tmax = int(target_groups_max)
-    if tmin > max_groups:
-        tmin = max(1, max_groups - 2)
-    if tmax > max_groups:
-        tmax = max_groups
-    if tmin > tmax:
-        tmin = max(1, tmax)
-
-    return {
-        "max_ac_per_group": max_ac_per_group,
-        "target_groups_min": tmin,
-        "target_groups_max": tmax,
-        "max_groups": max_groups,
-        "min_group_size": min_group_size,
-    }
-
-
 def _make_failsafe_output(
     *,
     story: Dict[str, Any],
@@ -207,11 +204,77 @@ def main():
     p.add_argument("--max-ac-per-task", type=int, default=2)
     p.add_argument("--max-repairs", type=int, default=2)
 
+    # clustering 出力形式: full(groups JSON全体) / edit(seed + edit ops) / local(LLMなし)
+    p.add_argument("--cluster-mode", choices=["full", "edit", "local", "stream"], default="full")
+    # 小さいストーリー（群数が自明）でも必ず LLM clustering したい場合
+    p.add_argument("--no-fast-path", action="store_true")
+
     # ✅ new: 並列数
     p.add_argument("--workers", type=int, default=4)
 
+    # グループ数/サイズの決め方: fixed(8-12 既定) / throughput(--workers とコストモデルで期待 makespan 最小)
+    # throughput は --history があれば実測の出力速度 / repair 率でコストモデルを合わせる
+    p.add_argument("--policy-mode", choices=list(POLICY_MODES), default="fixed")
+
+    # taskgen: full(1回で完全なタスク) / two_phase(骨格→description並列) / skeleton(骨格のみ。descriptionはAPIで後から)
+    p.add_argument("--taskgen-mode", choices=["full", "two_phase", "skeleton"], default="full")
+
+    # 小さいグループを1回の taskgen 呼び出しに束ねる（呼び出し数/重複コンテキスト削減）
+    p.add_argument("--pack-small-groups", action="store_true")
+    p.add_argument("--pack-max-acs", type=int, default=4)
+    p.add_argument("--pack-token-budget", type=int, default=1500)
+
+    # 言い回し違いの重複 AC を代表1件に畳んでから計画する（重複は最後に同じタスクへ戻す）
+    p.add_argument("--dedup-acs", action="store_true")
+    p.add_argument("--dedup-threshold", type=float, default=NEAR_DUP_THRESHOLD)
+
+    # ストーリー横断のタスクテンプレ（既知の AC は検証済みタスクを再利用し、新規 AC だけ LLM へ）
+    p.add_argument("--template-store", default="")
+    p.add_argument("--template-store-max", type=int, default=5000)
+
+    # 並列 taskgen 後にグループ間の近似重複タスクを1つにまとめる（ac_ids は和集合）
+    p.add_argument("--dedup-tasks", action="store_true")
+    p.add_argument("--task-dedup-threshold", type=float, default=TASK_DUP_THRESHOLD)
+
+    # 前回の出力 JSON を渡すと、AC/方針が変わっていないグループはそのまま再利用し、影響範囲だけ作り直す
+    p.add_argument("--incremental", default="")
+
+    # 途中経過（grouping / 完了グループ）を JSONL に追記し、--resume で続きから再開する
+    p.add_argument("--checkpoint", default="")  # 既定: <output>.ckpt.jsonl（正常終了で削除）
+    p.add_argument("--resume", action="store_true")
+
+    # 実行全体の時間予算（秒）。間に合わない clustering/グループは安い経路に落として meta.deadline に記録
+    p.add_argument("--deadline", type=float, default=0.0)
+
+    # stage の p90 を過ぎても返らない LLM 呼び出しに複製を送る（追加呼び出しは全体の --hedge-max-extra まで）
+    p.add_argument("--hedge", action="store_true")
+    p.add_argument("--hedge-max-extra", type=float, default=MAX_EXTRA_RATIO)
+
+    # ステージごとに安いモデルから試し、検証に落ちたら上位モデルへ昇格する
+    # 例: "cluster=gpt-4.1-nano>gpt-4o-mini;taskgen=gpt-4.1-nano>gpt-4o-mini;describe=gpt-4.1-nano"
+    # 未指定なら env TASK_MODEL_CASCADE、それも無ければ全ステージ --model のみ
+    p.add_argument("--cascade", default="")
+
+    # API を呼ばずに呼び出し数 / トークン / 所要時間（--workers 並列）を見積もって JSON を出力する
+    # --history に過去の出力 JSON を渡すと、ステージ別の実測レイテンシ/出力トークン/repair 率を使う
+    p.add_argument("--dry-run", action="store_true")
+    p.add_argument("--history", action="append", default=[])
+
+    # NDJSON で grouping → 完了したグループ → trace/meta の順に stdout へ流す（-o のファイルも従来どおり書く）
+    p.add_argument("--stream", action="store_true")
+
     args = p.parse_args()
 
+    # --stream: stdout はイベント専用にし、ログ（[LLM] ... / [OK] wrote）は stderr へ逃がす
+    events: Optional[EventStream] = None
+    if args.stream:
+        events = EventStream(sys.stdout)
+        sys.stdout = sys.stderr
+    shared_hedger().configure(enabled=bool(args.hedge), max_extra_ratio=float(args.hedge_max_extra))
+    run_deadline = Deadline(float(args.deadline)) if float(args.deadline) > 0 else None
+    cascade_routes = parse_routes(args.cascade or os.getenv("TASK_MODEL_CASCADE", ""))
+    cascade = ModelCascade(cascade_routes, default_model=args.model) if cascade_routes else None
+
     input_obj = _load_json(args.input)
     story, all_acs = extract_story_and_acs(input_obj)
     if not all_acs:
@@ -220,121 +283,498 @@ def main():
     selected_acs = _select_range(all_acs, start=args.start, limit=args.limit)
     ac_map = build_ac_map(selected_acs, ac_prefix="AC")
 
-    tuned = _auto_tune_grouping_policy(
-        n_acs=len(ac_map),
+    # グループ構成/タスク内容に効く方針（incremental の再利用判定に使う）
+    fingerprint = plan_fingerprint(
+        story,
+        {
+            "model": args.model,
+            "score": int(args.score),
+            "max_ac_per_group": int(args.max_ac_per_group),
+            "target_groups": [int(args.target_groups_min), int(args.target_groups_max)],
+            "max_groups": int(args.max_groups),
+            "min_group_size": int(args.min_group_size),
+            "max_ac_per_task": int(args.max_ac_per_task),
+            "cluster_mode": args.cluster_mode,
+            "taskgen_mode": args.taskgen_mode,
+            "dedup_acs": bool(args.dedup_acs),
+            "cascade": {k: list(v) for k, v in sorted(cascade_routes.items())},
+            # throughput だと workers で群構成が変わる（fixed は従来の fingerprint のまま）
+            **({"policy_mode": f"throughput:{int(args.workers)}"} if args.policy_mode == "throughput" else {}),
+        },
+    )
+
+    # incremental: 再利用できるグループの AC を除いた「影響範囲」だけを計画する
+    inc: Optional[IncrementalPlan] = None
+    region_ac_map = ac_map
+    if args.incremental:
+        inc = plan_incremental(load_previous(args.incremental) or {}, ac_map=ac_map, fingerprint=fingerprint)
+        region_ac_map = {a: ac_map[a] for a in inc.affected_ids}
+
+    # clustering / taskgen は plan_ac_map（代表 AC）だけで行う
+    plan_ac_map = region_ac_map
+    duplicate_of: Dict[str, str] = {}
+    if args.dedup_acs:
+        plan_ac_map, duplicate_of = dedup_ac_map(region_ac_map, threshold=float(args.dedup_threshold))
+
+    history = load_history(args.history)
+    tuned, policy_tuning = tune_grouping_policy(
+        len(plan_ac_map),
+        mode=args.policy_mode,
         max_ac_per_group=args.max_ac_per_group,
         target_groups_min=args.target_groups_min,
         target_groups_max=args.target_groups_max,
         max_groups=args.max_groups,
         min_group_size=args.min_group_size,
+        workers=int(args.workers),
+        max_repairs=int(args.max_repairs),
+        cost_model=cost_model_from_history(history, skeleton=args.taskgen_mode != "full"),
     )
 
-    # -------------------------
-    # 1) grouping
-    # -------------------------
-    try:
-        grouping = cluster_acs(
-            model=args.model,
+    if args.dry_run:
+        est = estimate_run(
             story=story,
-            ac_map=ac_map,
-            max_ac_per_group=tuned["max_ac_per_group"],
-            target_groups_min=tuned["target_groups_min"],
-            target_groups_max=tuned["target_groups_max"],
-            max_groups=tuned["max_groups"],
-            min_group_size=tuned["min_group_size"],
+            ac_map=plan_ac_map,
+            tuned=tuned,
+            max_tasks_per_ac=max_tasks_from_score(int(args.score)),
             max_repairs=int(args.max_repairs),
+            cluster_mode=args.cluster_mode,
+            taskgen_mode=args.taskgen_mode,
+            fast_path=not args.no_fast_path,
+            pack_small_groups_enabled=bool(args.pack_small_groups),
+            pack_max_acs=int(args.pack_max_acs),
+            pack_token_budget=int(args.pack_token_budget),
+            workers=int(args.workers),
+            history=history,
         )
-    except Exception:
-        return _make_failsafe_output(
-            story=story,
-            ac_map=ac_map,
-            tuned_policy=tuned,
-            output_path=args.output,
-            model=args.model,
+        est["model"] = args.model
+        est["policy_tuning"] = policy_tuning
+        est["ac_count_selected"] = len(selected_acs)
+        print(json.dumps(est, ensure_ascii=False, indent=2))
+        return
+
+    # checkpoint: --resume なら前回のジャーナルから grouping / 完了済みグループを戻す
+    journal = CheckpointJournal(
+        args.checkpoint or args.output + CHECKPOINT_SUFFIX,
+        key=checkpoint_key(fingerprint=fingerprint, ac_map=ac_map),
+    )
+    resumed = journal.load() if args.resume else None
+    grouping_restored = resumed is not None and resumed.grouping is not None
+
+    # taskgen の実行関数（--cluster-mode stream は clustering の途中から使うので先に用意する）
+    import concurrent.futures
+
+    max_tasks_per_ac = max_tasks_from_score(int(args.score))
+    workers = max(1, int(args.workers))
+
+    def _failsafe_group(g: Dict[str, Any], e: Exception, *, degraded: str = "") -> Dict[str, Any]:
+        g_ac_ids = g.get("ac_ids") or []
+        if not isinstance(g_ac_ids, list):
+            g_ac_ids = []
+        sub_ac_map = {aid: plan_ac_map[aid] for aid in g_ac_ids if aid in plan_ac_map}
+        tasks = ac_map_to_min_tasks(sub_ac_map)
+
+        return {
+            "group_id": g.get("group_id", "G??"),
+            "tasks": tasks,
+            "meta": {
+                "mode": "failsafe_group",
+                "error": f"{type(e).__name__}: {e}",
+                **({"degraded": degraded} if degraded else {}),
+            },
+        }
+
+    def _taskgen_one_group(g: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return generate_tasks_for_group(
+                model=args.model,
+                story=story,
+                group=g,
+                ac_map=plan_ac_map,
+                max_ac_per_task=int(args.max_ac_per_task),
+                max_tasks_per_ac=int(max_tasks_per_ac),
+                max_repairs=int(args.max_repairs),
+                skeleton_only=args.taskgen_mode != "full",
+                cascade=cascade,
+            )
+        except Exception as e:
+            return _failsafe_group(g, e)
+
+    def _taskgen_unit(unit: List[Tuple[int, Dict[str, Any]]]) -> Dict[int, Dict[str, Any]]:
+        if len(unit) == 1:
+            i, g = unit[0]
+            return {i: _taskgen_one_group(g)}
+        try:
+            results = generate_tasks_for_group_pack(
+                model=args.model,
+                story=story,
+                groups=[g for _i, g in unit],
+                ac_map=plan_ac_map,
+                max_ac_per_task=int(args.max_ac_per_task),
+                max_tasks_per_ac=int(max_tasks_per_ac),
+                max_repairs=int(args.max_repairs),
+                skeleton_only=args.taskgen_mode != "full",
+                cascade=cascade,
+            )
+            return {i: gr for (i, _g), gr in zip(unit, results)}
+        except Exception:
+            return {i: _taskgen_one_group(g) for i, g in unit}
+
+    # --cluster-mode stream: clustering の出力から閉じたグループを先に taskgen へ流す
+    # （template store / pack はグループ構成が揃ってから組むので、その場合は先行 dispatch しない）
+    early_by_acs: Dict[FrozenSet[str], concurrent.futures.Future] = {}
+    taskgen_ex: Optional[concurrent.futures.ThreadPoolExecutor] = None
+    on_group: Optional[Callable[[Dict[str, Any]], None]] = None
+    if (
+        args.cluster_mode == "stream"
+        and not grouping_restored
+        and not args.template_store
+        and not args.pack_small_groups
+    ):
+        taskgen_ex = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers, initializer=bind_deadline, initargs=(run_deadline,)
         )
 
-    if not isinstance(grouping, dict):
-        return _make_failsafe_output(
+        def on_group(g: Dict[str, Any]) -> None:
+            assert taskgen_ex is not None
+            early_by_acs[frozenset(g["ac_ids"])] = taskgen_ex.submit(_taskgen_unit, [(-1, g)])
+
+    def _failsafe_exit() -> Any:
+        # 先行 dispatch した taskgen は捨てる
+        if taskgen_ex is not None:
+            taskgen_ex.shutdown(wait=False, cancel_futures=True)
+        out = _make_failsafe_output(
             story=story,
             ac_map=ac_map,
             tuned_policy=tuned,
             output_path=args.output,
             model=args.model,
         )
+        if events is not None:
+            events.grouping(out["grouping"])
+            events.group(0, out["group_results"][0])
+            events.finish(
+                grouping=out["grouping"], group_results=out["group_results"], trace=out["trace"], meta=out["meta"]
+            )
+        return out
+
+    # -------------------------
+    # 1) grouping
+    # -------------------------
+    try:
+        grouping = {"groups": [], "meta": {}}
+        if resumed is not None and resumed.grouping is not None:
+            grouping = resumed.grouping
+        elif plan_ac_map:
+            grouping = cluster_acs(
+                model=args.model,
+                story=story,
+                ac_map=plan_ac_map,
+                max_ac_per_group=tuned["max_ac_per_group"],
+                target_groups_min=tuned["target_groups_min"],
+                target_groups_max=tuned["target_groups_max"],
+                max_groups=tuned["max_groups"],
+                min_group_size=tuned["min_group_size"],
+                max_repairs=int(args.max_repairs),
+                output_mode=args.cluster_mode,
+                fast_path=not args.no_fast_path,
+                deadline=run_deadline.sub(CLUSTER_SHARE) if run_deadline is not None else None,
+                cascade=cascade,
+                on_group=on_group,
+            )
+    except Exception:
+        return _failsafe_exit()
+
+    if not isinstance(grouping, dict):
+        return _failsafe_exit()
 
     grouping.setdefault("meta", {})
     grouping["meta"].setdefault("policy_used", tuned)
     groups = grouping.get("groups", [])
+    if inc is not None and isinstance(groups, list):
+        # 復元した grouping は incremental のマージ済み
+        if not grouping_restored:
+            renumber_new_groups(groups, inc.reused_groups)
+            groups = sort_groups_by_ac_order(inc.reused_groups + groups, ac_map)
+            grouping["groups"] = groups
+        reused_gids = {str(g.get("group_id")) for g in inc.reused_groups}
+        inc.report["groups"]["recomputed"] = [
+            str(g.get("group_id")) for g in groups if isinstance(g, dict) and str(g.get("group_id")) not in reused_gids
+        ]
     if not isinstance(groups, list) or not groups:
-        return _make_failsafe_output(
-            story=story,
-            ac_map=ac_map,
-            tuned_policy=tuned,
-            output_path=args.output,
-            model=args.model,
-        )
+        return _failsafe_exit()
 
-    if bool((grouping.get("meta") or {}).get("fallback")):
-        return _make_failsafe_output(
-            story=story,
-            ac_map=ac_map,
-            tuned_policy=tuned,
-            output_path=args.output,
-            model=args.model,
-        )
+    # 締め切りで落ちた clustering はキーワードバケットのまま taskgen に進む。
+    # ローカルクラスタリングの fallback も検証を通っていれば taskgen に進む（それ以外の fallback は全体 failsafe）
+    cluster_meta = grouping.get("meta") or {}
+    cluster_degraded = bool(cluster_meta.get("deadline_exceeded"))
+    if bool(cluster_meta.get("fallback")) and not cluster_degraded and not cluster_meta.get("fallback_valid"):
+        return _failsafe_exit()
+
+    journal.open(resume=resumed is not None)
+    if not grouping_restored:
+        journal.record_grouping(grouping)
 
     # -------------------------
     # 2) taskgen per group (PARALLEL)
     # -------------------------
-    import concurrent.futures
-
-    max_tasks_per_ac = max_tasks_from_score(int(args.score))
-    workers = max(1, int(args.workers))
+    indexed_groups = [(i, g) for i, g in enumerate(groups) if isinstance(g, dict)]
+    results_by_index: Dict[int, Dict[str, Any]] = {}
+    # --stream の index は最終 group_results の位置
+    position = {i: k for k, (i, _g) in enumerate(indexed_groups)}
+
+    def _emit_group(i: int, gr: Dict[str, Any]) -> None:
+        if events is not None:
+            events.group(position[i], gr)
+
+    if events is not None:
+        events.grouping(grouping)
+
+    # incremental で再利用するグループは taskgen しない
+    reused_results = {str(gr.get("group_id")): gr for gr in (inc.reused_results if inc is not None else [])}
+
+    # resume: ジャーナルに完了済みのグループは作り直さない
+    restored = resumed.results if resumed is not None else {}
+    for i, g in indexed_groups:
+        if str(g.get("group_id")) in restored:
+            results_by_index[i] = restored[str(g.get("group_id"))]
+            _emit_group(i, results_by_index[i])
+        elif str(g.get("group_id")) in reused_results:
+            _emit_group(i, reused_results[str(g.get("group_id"))])
+    gen_groups = [
+        (i, g)
+        for i, g in indexed_groups
+        if str(g.get("group_id")) not in reused_results and str(g.get("group_id")) not in restored
+    ]
 
-    def _taskgen_one_group(g: Dict[str, Any]) -> Dict[str, Any]:
-        try:
-            return generate_tasks_for_group(
-                model=args.model,
-                story=story,
-                group=g,
-                ac_map=ac_map,
-                max_ac_per_task=int(args.max_ac_per_task),
-                max_tasks_per_ac=int(max_tasks_per_ac),
-                max_repairs=int(args.max_repairs),
+    # テンプレ再利用: 既知 AC のタスクは store から組み立て、novel AC だけ残して LLM に回す
+    store = (
+        TemplateStore(args.template_store, max_entries=int(args.template_store_max))
+        if args.template_store
+        else None
+    )
+    reused_by_index: Dict[int, Dict[str, Any]] = {}
+    # 部分再利用のヒットは合流後の検証を通ってから数える（捨てた再利用で hit_rate を水増ししない）
+    reuse_hits: Dict[int, List[Tuple[str, str]]] = {}
+    llm_groups = gen_groups
+    if store is not None:
+        llm_groups = []
+        for i, g in gen_groups:
+            g_ids = [a for a in (g.get("ac_ids") or []) if isinstance(a, str)]
+            _lo, hi = _task_bounds(len(g_ids), max_tasks_per_ac)
+            reused, novel, hits = reuse_group_tasks(
+                store, g, plan_ac_map, max_tasks=hi, max_ac_per_task=int(args.max_ac_per_task)
             )
-        except Exception as e:
-            g_ac_ids = g.get("ac_ids") or []
-            if not isinstance(g_ac_ids, list):
-                g_ac_ids = []
-            sub_ac_map = {aid: ac_map[aid] for aid in g_ac_ids if aid in ac_map}
-            tasks = ac_map_to_min_tasks(sub_ac_map)
-
-            return {
+            if not reused:
+                llm_groups.append((i, g))
+                continue
+            reused_by_index[i] = {
                 "group_id": g.get("group_id", "G??"),
-                "tasks": tasks,
-                "meta": {
-                    "mode": "failsafe_group",
-                    "error": f"{type(e).__name__}: {e}",
-                },
+                "label": g.get("label", ""),
+                "ac_ids": g_ids,
+                "validate": {"pass": True, "issues": [], "issue_codes": [], "repairs_used": 0, "local_fixes": []},
+                "tasks": reused,
+                "meta": {"template_reuse": {"reused_acs": len(g_ids) - len(novel), "novel_acs": len(novel)}},
             }
+            if novel:
+                llm_groups.append((i, {**g, "ac_ids": novel}))
+                reuse_hits[i] = hits
+            else:
+                store.accept_hits(hits)
+                _emit_group(i, reused_by_index[i])
+
+    def _merge_reused(i: int, gr: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # novel AC 分の LLM 結果にテンプレ再利用分を合流させる
+        # （ジャーナルには合流後を書く。resume で復元したグループは再利用の対象外なので、ここで揃えておく）
+        # 合流後のグループが検証（件数上限/coverage/形式）を通らなければ再利用をやめて None を返す
+        reused_gr = reused_by_index.get(i)
+        if reused_gr is None or store is None:
+            return gr
+        tasks = reused_gr["tasks"] + list(gr.get("tasks") or [])
+        _lo, hi = _task_bounds(len(reused_gr["ac_ids"]), max_tasks_per_ac)
+        ok, _issues = validate_group_tasks(
+            {"tasks": tasks},
+            max_tasks=hi,
+            group_ac_ids=reused_gr["ac_ids"],
+            max_ac_per_task=int(args.max_ac_per_task),
+        )
+        if not ok:
+            store.count("groups_reuse_rejected")
+            del reused_by_index[i]
+            return None
+        store.count("groups_partial")
+        store.accept_hits(reuse_hits.get(i, []))
+        gr["tasks"] = tasks
+        gr["ac_ids"] = reused_gr["ac_ids"]
+        gr.setdefault("meta", {}).update(reused_gr["meta"])
+        return gr
+
+    # taskgen の実行単位（通常は1グループ=1単位、--pack-small-groups なら小グループを束ねる）
+    units: List[List[Tuple[int, Dict[str, Any]]]] = [[ig] for ig in llm_groups]
+    if args.pack_small_groups:
+        packs = pack_small_groups(
+            [g for _i, g in llm_groups],
+            plan_ac_map,
+            max_group_acs=int(args.pack_max_acs),
+            token_budget=int(args.pack_token_budget),
+        )
+        units = [[llm_groups[j] for j in pack] for pack in packs]
+
+    # stream: 最終 grouping と同じ AC 集合のグループは先行 dispatch の結果を使い、残りだけ投げる
+    # （repair / cascade 昇格で形が変わったグループの先行分は捨てる）
+    early_units: Dict[concurrent.futures.Future, List[Tuple[int, Dict[str, Any]]]] = {}
+    early_dispatched = len(early_by_acs)
+    if early_by_acs:
+        rest: List[List[Tuple[int, Dict[str, Any]]]] = []
+        for unit in units:
+            fut = early_by_acs.pop(frozenset(unit[0][1].get("ac_ids") or []), None) if len(unit) == 1 else None
+            if fut is None:
+                rest.append(unit)
+            else:
+                early_units[fut] = unit
+        units = rest
+        for fut in early_by_acs.values():
+            fut.cancel()
+
+    # 締め切りがあれば、ワーカーの LLM 呼び出しも残り時間で打ち切られる（initializer で deadline を張る）
+    def _wait_timeout() -> Any:
+        return max(0.0, run_deadline.remaining() - RESERVE_S) if run_deadline is not None else None
+
+    def _deadline_failsafe(g: Dict[str, Any]) -> Dict[str, Any]:
+        return _failsafe_group(g, DeadlineExceeded("taskgen did not finish before the deadline"), degraded="deadline")
+
+    full_by_index = dict(indexed_groups)
+    rejected: List[int] = []
+    degraded_groups: List[str] = []
+    ex = taskgen_ex or concurrent.futures.ThreadPoolExecutor(
+        max_workers=workers, initializer=bind_deadline, initargs=(run_deadline,)
+    )
+    try:
+        future_map = {ex.submit(_taskgen_unit, unit): unit for unit in units}
+        future_map.update(early_units)
+        pending = set(future_map)
+        try:
+            for fut in concurrent.futures.as_completed(future_map, timeout=_wait_timeout()):
+                pending.discard(fut)
+                done = fut.result()
+                if fut in early_units:
+                    # 先行分は index -1 で投げているので、最終 grouping の位置 / group_id に付け替える
+                    ((i, g),) = early_units[fut]
+                    gr = done[-1]
+                    gr["group_id"] = g.get("group_id", gr.get("group_id"))
+                    gr["label"] = g.get("label", gr.get("label", ""))
+                    gr.setdefault("meta", {})["streamed"] = True
+                    done = {i: gr}
+                for i, gr in done.items():
+                    merged = _merge_reused(i, gr)
+                    if merged is None:
+                        rejected.append(i)
+                        continue
+                    results_by_index[i] = merged
+                    journal.record_group(merged)
+                    _emit_group(i, merged)
+        except concurrent.futures.TimeoutError:
+            # 間に合わなかった単位は AC→タスクの failsafe に落とす（ジャーナルには残さない）
+            for fut, unit in future_map.items():
+                if fut not in pending:
+                    continue
+                for i, g in unit:
+                    results_by_index[i] = _merge_reused(i, _deadline_failsafe(g)) or _deadline_failsafe(full_by_index[i])
+                    degraded_groups.append(str(g.get("group_id", "G??")))
+                    _emit_group(i, results_by_index[i])
+
+        # 合流後の検証に落ちたグループは、テンプレ再利用なしで全 AC から作り直す
+        if rejected:
+            retry_map = {ex.submit(_taskgen_one_group, full_by_index[i]): i for i in rejected}
+            try:
+                for fut in concurrent.futures.as_completed(retry_map, timeout=_wait_timeout()):
+                    i = retry_map[fut]
+                    gr = fut.result()
+                    gr.setdefault("meta", {})["template_reuse"] = {"rejected": True}
+                    results_by_index[i] = gr
+                    journal.record_group(gr)
+                    _emit_group(i, gr)
+            except concurrent.futures.TimeoutError:
+                for i in rejected:
+                    if i in results_by_index:
+                        continue
+                    results_by_index[i] = _deadline_failsafe(full_by_index[i])
+                    degraded_groups.append(str(full_by_index[i].get("group_id", "G??")))
+                    _emit_group(i, results_by_index[i])
+    finally:
+        ex.shutdown(wait=run_deadline is None, cancel_futures=True)
+
+    # 2段階目: skeleton の description を並列で埋める（two_phase のみ）
+    if args.taskgen_mode == "two_phase":
+        ex = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers, initializer=bind_deadline, initargs=(run_deadline,)
+        )
+        submitted: List[Tuple[Dict[str, Any], concurrent.futures.Future]] = []
+        done_desc: Any = set()
+        try:
+            for gr in results_by_index.values():
+                submitted.extend(
+                    fill_group_descriptions(
+                        model=args.model,
+                        story=story,
+                        group_result=gr,
+                        ac_map=plan_ac_map,
+                        executor=ex,
+                        cascade=cascade,
+                    )
+                )
+            # 間に合わなかった description は pending のまま（/tasks/describe で後から埋められる）
+            done_desc, _ = concurrent.futures.wait([f for _t, f in submitted], timeout=_wait_timeout())
+        finally:
+            ex.shutdown(wait=run_deadline is None, cancel_futures=True)
+        # ワーカーはコピーを埋めるので、ここで終わった分だけ反映する（走り続けるワーカーは出力に触らない）
+        apply_descriptions(submitted, done_desc)
+        for gr in results_by_index.values():
+            journal.record_group(gr)
+
+    # LLM で作った検証済みタスクを store に覚えさせ（登録済み AC は上書きしない）、全部再利用のグループを戻す
+    if store is not None:
+        for gr in results_by_index.values():
+            store.record_group(gr, plan_ac_map)
+        for i, reused_gr in reused_by_index.items():
+            if i not in results_by_index:
+                store.count("groups_reused")
+                store.accept_hits(reuse_hits.get(i, []))
+                results_by_index[i] = reused_gr
+        try:
+            store.save()
+        except OSError:
+            pass
 
-    indexed_groups = [(i, g) for i, g in enumerate(groups) if isinstance(g, dict)]
-    results_by_index: Dict[int, Dict[str, Any]] = {}
+    for i, g in indexed_groups:
+        if str(g.get("group_id")) in reused_results:
+            results_by_index[i] = reused_results[str(g.get("group_id"))]
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as ex:
-        future_map = {ex.submit(_taskgen_one_group, g): i for i, g in indexed_groups}
-        for fut in concurrent.futures.as_completed(future_map):
-            i = future_map[fut]
-            results_by_index[i] = fut.result()
+    group_results: List[Dict[str, Any]] = [
+        results_by_index.get(i) or {"group_id": "G??", "tasks": [], "meta": {"mode": "empty"}}
+        for i, _g in indexed_groups
+    ]
+
+    # グループ間の近似重複タスクを統合（expand_duplicates/traceability より前に行う）
+    task_dedup: Dict[str, Any] = {"enabled": False}
+    if args.dedup_tasks:
+        task_dedup = dedup_tasks_across_groups(
+            group_results, threshold=float(args.task_dedup_threshold), max_ac_per_task=int(args.max_ac_per_task)
+        )
 
-    group_results: List[Dict[str, Any]] = []
     total_tasks = 0
-    for i, _g in indexed_groups:
-        gr = results_by_index.get(i) or {"group_id": "G??", "tasks": [], "meta": {"mode": "empty"}}
-        group_results.append(gr)
+    description_status: Dict[str, int] = {}
+    for gr in group_results:
         tasks = gr.get("tasks", [])
         if isinstance(tasks, list):
             total_tasks += len(tasks)
+            for t in tasks:
+                st = t.get("description_status") if isinstance(t, dict) else None
+                if st:
+                    description_status[st] = description_status.get(st, 0) + 1
+
+    # 重複 AC を代表と同じグループ/タスクへ戻してから、全 AC で traceability を確認する
+    expand_duplicates(grouping=grouping, group_results=group_results, duplicate_of=duplicate_of)
+    hashes = group_hashes(grouping=grouping, ac_map=ac_map, fingerprint=fingerprint)
 
     # ✅ traceability (NEW)
     trace = enforce_ac_traceability(
@@ -343,6 +783,7 @@ def main():
         group_results=group_results,
         mode="attach",
     )
+    trace["duplicate_of"] = duplicate_of
 
     # -------------------------
     # 3) output
@@ -364,8 +805,48 @@ def main():
             "min_group_size": int(tuned["min_group_size"]),
             "max_ac_per_task": int(args.max_ac_per_task),
             "max_repairs": int(args.max_repairs),
+            "cluster_mode": args.cluster_mode,
+            "taskgen_mode": args.taskgen_mode,
+            "description_status": description_status,
+            "taskgen_calls_planned": len(units),
+            "template_store": (store.meta() if store is not None else {"enabled": False}),
             "workers": int(workers),
             "ac_count_selected": len(selected_acs),
+            "ac_dedup": {
+                "enabled": bool(args.dedup_acs),
+                "acs_planned": len(plan_ac_map),
+                "duplicates": len(duplicate_of),
+            },
+            "task_dedup": task_dedup,
+            "incremental": (inc.report if inc is not None else {"enabled": False}),
+            "plan_fingerprint": fingerprint,
+            "policy_tuning": policy_tuning,
+            "cluster_stream": {
+                "enabled": taskgen_ex is not None,
+                "early_dispatched": early_dispatched,
+                "early_used": len(early_units),
+                "early_discarded": early_dispatched - len(early_units),
+            },
+            "hedging": shared_hedger().stats(),
+            "llm_usage": usage_stats(),
+            "cascade": (
+                {"enabled": True, "stages": cascade.stats()} if cascade is not None else {"enabled": False}
+            ),
+            "deadline": {
+                "enabled": run_deadline is not None,
+                "seconds": float(args.deadline),
+                "elapsed": round(run_deadline.elapsed(), 3) if run_deadline is not None else None,
+                "clustering_degraded": cluster_degraded,
+                "degraded_groups": degraded_groups,
+                "descriptions_pending": int(description_status.get("pending", 0)) if run_deadline is not None else 0,
+            },
+            "checkpoint": {
+                "path": journal.path,
+                "resumed": resumed is not None,
+                "grouping_restored": bool(grouping_restored),
+                "groups_restored": sum(1 for _i, g in indexed_groups if str(g.get("group_id")) in restored),
+            },
+            "group_hashes": hashes,
             "group_count": len(groups),
             "total_tasks": int(total_tasks),
             "fallback": False,
@@ -375,6 +856,9 @@ def main():
 
     with open(args.output, "w", encoding="utf-8") as f:
         json.dump(out, f, ensure_ascii=False, indent=2)
+    journal.finish()
+    if events is not None:
+        events.finish(grouping=grouping, group_results=group_results, trace=trace, meta=out["meta"])
 
     print(
         f"[OK] wrote: {args.output} "
@@ -0,0 +1,163 @@
+# src/task_planning/similarity.py
+from __future__ import annotations
+
+import re
+import unicodedata
+import zlib
+from functools import lru_cache
+from typing import FrozenSet, List, Tuple
+
+import numpy as np
+
+from .trace_index import _CJK
+
+
+# -------------------------
+# Normalize
+# -------------------------
+_PUNCT_RE = re.compile(r"[^\w\s]+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    比較用の正規化（NFKC + lower + 記号除去 + 空白畳み込み）
+    言い回しの差ではなく表記ゆれ（全角/半角、句読点、大小文字）を吸収する
+    """
+    t = unicodedata.normalize("NFKC", text or "").lower()
+    t = _PUNCT_RE.sub(" ", t)
+    return _SPACE_RE.sub(" ", t).strip()
+
+
+# -------------------------
+# Shingles / Jaccard
+# -------------------------
+def shingles(text: str, *, k: int = 3, normalized: bool = False) -> FrozenSet[str]:
+    """
+    文字 k-gram の集合（空白区切りの無い日本語でもそのまま使える）
+    k 文字未満のテキストは全体を1要素にする
+    """
+    t = text if normalized else normalize_text(text)
+    if len(t) <= k:
+        return frozenset([t]) if t else frozenset()
+    return frozenset(t[i : i + k] for i in range(len(t) - k + 1))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    inter = len(a & b)
+    if not inter:
+        return 0.0
+    return inter / float(len(a) + len(b) - inter)
+
+
+# -------------------------
+# Lexical guard (near-duplicate 判定用)
+# -------------------------
+# 文字 shingle だけだと "export/import", "AND/OR", "success/failure" のような
+# 1語違いの別要件も高スコアになる。違う語が「語形変化 or 機能語」だけなら同一とみなす。
+# ※ and/or/not/no は意味が変わるので機能語に入れない
+_FUNCTION_WORDS = frozenset(
+    """a an the is are be been being must should shall will can could may
+    with using by via for of to in on at from into as that which when""".split()
+)
+
+
+# 日本語の格助詞/係助詞（差が助詞だけなら言い回しの違い）
+_JA_PARTICLES = frozenset("は が を に で の と も へ や から まで より には では とは にて".split())
+
+# 語の切り出しは BM25 と同じ CJK 判定（trace_index._CJK）。CJK の連なりは空白が無いので、
+# さらに文字種（ひらがな/カタカナ/漢字/ハングル）の境目で区切って語の代わりにする
+_WORD_RE = re.compile(rf"[{_CJK}]+|[^\W_{_CJK}]+")
+_SCRIPT_RE = re.compile(r"[぀-ゟ]+|[゠-ヿ]+|[㐀-䶿一-鿿]+|[가-힯]+")
+
+
+def words(norm: str) -> List[str]:
+    """
+    正規化済みテキストを語に分ける（英語/ベトナム語は単語、CJK は文字種の境目で区切った塊）
+    """
+    out: List[str] = []
+    for m in _WORD_RE.finditer(norm):
+        w = m.group(0)
+        if w[0].isascii() or not _SCRIPT_RE.match(w):
+            out.append(w)
+        else:
+            out.extend(_SCRIPT_RE.findall(w))
+    return out
+
+
+def _same_stem(a: str, b: str) -> bool:
+    if a == b:
+        return True
+    # 語形変化の判定は英字の語だけ（日本語は1文字違いで否定/別動詞になるので完全一致のみ）
+    if not (a.isascii() and b.isascii()):
+        return False
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n >= 4 and n >= min(len(a), len(b)) - 3
+
+
+def content_text(norm: str) -> str:
+    """
+    正規化済みテキストから機能語を落とす（shingle を内容語に集中させる）
+    """
+    return " ".join(w for w in norm.split() if w not in _FUNCTION_WORDS)
+
+
+def only_wording_differs(a_norm: str, b_norm: str) -> bool:
+    """
+    正規化済みテキスト2つの語の差分が、語形変化（password/passwords）か機能語（日本語は助詞）だけか
+    数字・固有の語が1つでも食い違えば False
+    """
+    wa = set(words(a_norm))
+    wb = set(words(b_norm))
+    da = [w for w in wa - wb if w not in _FUNCTION_WORDS and w not in _JA_PARTICLES]
+    db = [w for w in wb - wa if w not in _FUNCTION_WORDS and w not in _JA_PARTICLES]
+    for w in da:
+        if w.isdigit() or not any(_same_stem(w, v) for v in db):
+            return False
+    for w in db:
+        if w.isdigit() or not any(_same_stem(w, v) for v in da):
+            return False
+    return True
+
+
+# -------------------------
+# MinHash / LSH
+# -------------------------
+_MH_PRIME = (1 << 31) - 1
+MINHASH_PERM = 64
+LSH_BANDS = 16  # 16 band x 4 row: Jaccard 0.7 のペアが候補に上がる確率 ~0.99
+
+
+@lru_cache(maxsize=8)
+def _minhash_params(num_perm: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _MH_PRIME, size=num_perm, dtype=np.int64)
+    b = rng.integers(0, _MH_PRIME, size=num_perm, dtype=np.int64)
+    return a, b
+
+
+def minhash_signature(sh: FrozenSet[str], *, num_perm: int = MINHASH_PERM, seed: int = 1) -> Tuple[int, ...]:
+    """
+    shingle 集合の MinHash 署名（同じ num_perm/seed なら実行をまたいで同じ値）
+    空集合は全要素 _MH_PRIME
+    """
+    if not sh:
+        return (_MH_PRIME,) * num_perm
+    a, b = _minhash_params(num_perm, seed)
+    h = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in sh), dtype=np.int64, count=len(sh))
+    # (a*h + b) mod p は int64 に収まる（a,b < 2^31, h < 2^32）
+    return tuple(int(x) for x in ((np.outer(a, h) + b[:, None]) % _MH_PRIME).min(axis=1))
+
+
+def lsh_keys(sig: Tuple[int, ...], *, bands: int = LSH_BANDS) -> List[Tuple[int, Tuple[int, ...]]]:
+    """
+    署名を band に分けたバケットキー。どれか1つでも一致すれば近似重複の候補。
+    """
+    rows = max(1, len(sig) // bands)
+    return [(i, sig[i * rows : (i + 1) * rows]) for i in range(bands)]
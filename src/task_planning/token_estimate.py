@@ -0,0 +1,19 @@
+# src/task_planning/token_estimate.py
+from __future__ import annotations
+
+import re
+from typing import Any
+
+# CJK（漢字/かな/ハングル）は 1文字≒1トークン、それ以外は 4文字≒1トークン の粗い見積もり
+_CJK_RE = re.compile(r"[぀-ヿ㐀-鿿가-힯＀-￯]")
+
+
+def estimate_tokens(text: Any) -> int:
+    """
+    tokenizer を使わない概算トークン数（パッキング/見積もり用。正確さより速さ優先）
+    """
+    s = text if isinstance(text, str) else str(text or "")
+    if not s:
+        return 0
+    cjk = len(_CJK_RE.findall(s))
+    return cjk + (len(s) - cjk + 3) // 4
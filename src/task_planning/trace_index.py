@@ -0,0 +1,123 @@
+# src/task_planning/trace_index.py
+from __future__ import annotations
+
+import math
+import re
+from bisect import bisect_left
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# -------------------------
+# Tokenizer (EN / JA / VI)
+# -------------------------
+# CJK（かな/漢字/ハングル）は空白で区切られないので文字 bigram にする
+_CJK = "぀-ヿ㐀-䶿一-鿿가-힯"
+_TOKEN_RE = re.compile(rf"(?P<cjk>[{_CJK}]+)|(?P<word>[^\W_]+)")
+
+_STOPWORDS = frozenset(
+    """a an and are as at be by for from has have if in into is it its must not of on or
+    should such that the their then there these this to was were when which will with""".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    BM25 用トークナイズ
+    - NFKC + lower（全角英数も半角に寄せる）
+    - 英語/ベトナム語: 単語（声調記号付きの音節もそのまま1語）
+    - 日本語などCJK: 文字 bigram（1文字だけの連なりは unigram）
+    """
+    t = unicodedata.normalize("NFKC", text or "").lower()
+    out: List[str] = []
+    for m in _TOKEN_RE.finditer(t):
+        cjk = m.group("cjk")
+        if cjk:
+            if len(cjk) == 1:
+                out.append(cjk)
+            else:
+                out.extend(cjk[i : i + 2] for i in range(len(cjk) - 1))
+            continue
+        w = m.group("word")
+        if w in _STOPWORDS or (len(w) < 2 and not w.isdigit()):
+            continue
+        out.append(w)
+    return out
+
+
+# -------------------------
+# Inverted index + BM25
+# -------------------------
+class BM25Index:
+    """
+    文書（タスク）を1回だけトークナイズして転置インデックスにする。
+    検索はクエリ語のポスティングだけを走査するので、文書数に対してほぼ線形にならない。
+    ポスティングは doc_id 順なので、doc_range 指定時は二分探索で [lo, hi) の区間だけを見る。
+    """
+
+    def __init__(self, docs: Iterable[str], *, k1: float = 1.2, b: float = 0.75) -> None:
+        self.k1 = float(k1)
+        self.b = float(b)
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.doc_len: List[int] = []
+
+        for doc_id, text in enumerate(docs):
+            toks = tokenize(text)
+            self.doc_len.append(len(toks))
+            tf: Dict[str, int] = {}
+            for tok in toks:
+                tf[tok] = tf.get(tok, 0) + 1
+            for tok, c in tf.items():
+                self.postings.setdefault(tok, []).append((doc_id, c))
+
+        n = len(self.doc_len)
+        self.n_docs = n
+        self.avgdl = (sum(self.doc_len) / n) if n else 0.0
+        # 範囲ごとの平均文書長を O(1) で出すための累積和
+        self._len_prefix: List[int] = [0]
+        for dl in self.doc_len:
+            self._len_prefix.append(self._len_prefix[-1] + dl)
+
+    def scores(self, query: str, *, doc_range: Optional[Tuple[int, int]] = None) -> Dict[int, float]:
+        """
+        query に対する BM25 スコア（スコア>0 の文書だけ）。
+        doc_range=(lo, hi) を渡すと lo <= doc_id < hi に限定する。
+        IDF / 平均文書長も範囲内の文書だけで計算する（グループ内での語の珍しさで比べる）。
+        """
+        lo, hi = doc_range if doc_range else (0, self.n_docs)
+        lo, hi = max(0, lo), min(self.n_docs, hi)
+        out: Dict[int, float] = {}
+        n = hi - lo
+        if n <= 0:
+            return out
+        avgdl = ((self._len_prefix[hi] - self._len_prefix[lo]) / n) or 1.0
+        for tok in set(tokenize(query)):
+            plist = self.postings.get(tok)
+            if not plist:
+                continue
+            i = bisect_left(plist, (lo,))
+            j = bisect_left(plist, (hi,), i)
+            if i >= j:
+                continue
+            df = j - i
+            idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            for doc_id, tf in plist[i:j]:
+                dl = self.doc_len[doc_id]
+                denom = tf + self.k1 * (1.0 - self.b + self.b * dl / avgdl)
+                out[doc_id] = out.get(doc_id, 0.0) + idf * tf * (self.k1 + 1.0) / denom
+        return out
+
+    def best(self, query: str, *, doc_range: Optional[Tuple[int, int]] = None) -> Tuple[int, float]:
+        """
+        最良文書 (doc_id, score)。一致が無ければ範囲の先頭文書をスコア0で返す。
+        範囲が空なら (-1, 0.0)
+        """
+        lo, hi = doc_range if doc_range else (0, self.n_docs)
+        if hi <= lo:
+            return -1, 0.0
+        sc = self.scores(query, doc_range=(lo, hi))
+        if not sc:
+            return lo, 0.0
+        # 同点は若い doc_id（元のタスク順）を優先
+        doc_id = min(sc, key=lambda d: (-sc[d], d))
+        return doc_id, sc[doc_id]
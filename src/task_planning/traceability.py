@@ -1,6 +1,11 @@
 from __future__ import annotations
 from typing import Any, Dict, List, Set, Tuple
 
+from .trace_index import BM25Index
+
+# これ未満の BM25 スコアで付けた AC は「弱い紐付け」として監査対象にする
+WEAK_MATCH_SCORE = 1.0
+
 def _flatten_tasks(group_results: List[Dict[str, Any]]) -> List[Tuple[int, int, Dict[str, Any]]]:
     """(group_index, task_index, task_obj)"""
     out = []
@@ -11,28 +16,28 @@ def _flatten_tasks(group_results: List[Dict[str, Any]]) -> List[Tuple[int, int,
     return out
 
 def _task_text(task: Dict[str, Any]) -> str:
-    # 近さ判定用の雑テキスト（高速）
-    return f"{task.get('title','')} {task.get('description','')}".lower()
+    # 近さ判定用のテキスト（title + description）
+    return f"{task.get('title','')} {task.get('description','')}"
 
-def _choose_best_task(tasks: List[Dict[str, Any]], ac_text: str) -> int:
+def _build_task_index(
+    group_results: List[Dict[str, Any]],
+) -> Tuple[BM25Index, Dict[int, Tuple[int, int]], List[Tuple[int, Dict[str, Any]]]]:
     """
-    超簡易スコア: AC文のキーワードが title/description にどれだけ含まれるか
-    0件なら先頭タスクに寄せる
+    全タスクを1回だけトークナイズして BM25 インデックス化する。
+    - group index -> (lo, hi) の doc 範囲（グループ内のタスクは連続）
+    - doc_id -> (group_index, task_obj)
     """
-    ac = (ac_text or "").lower()
-    keys = [k for k in ac.replace("(", " ").replace(")", " ").replace("/", " ").split() if len(k) >= 4]
-    if not tasks:
-        return -1
-
-    best_i = 0
-    best = -1
-    for i, t in enumerate(tasks):
-        txt = _task_text(t)
-        score = sum(1 for k in keys[:12] if k in txt)  # 上限つける
-        if score > best:
-            best = score
-            best_i = i
-    return best_i
+    docs: List[str] = []
+    ranges: Dict[int, Tuple[int, int]] = {}
+    owners: List[Tuple[int, Dict[str, Any]]] = []
+    for gi, gr in enumerate(group_results or []):
+        lo = len(docs)
+        for t in (gr.get("tasks") or []) if isinstance(gr, dict) else []:
+            if isinstance(t, dict):
+                docs.append(_task_text(t))
+                owners.append((gi, t))
+        ranges[gi] = (lo, len(docs))
+    return BM25Index(docs), ranges, owners
 
 def enforce_ac_traceability(
     *,
@@ -40,11 +45,14 @@ def enforce_ac_traceability(
     grouping: Dict[str, Any],
     group_results: List[Dict[str, Any]],
     mode: str = "attach",  # "attach" or "create_task"
+    weak_score: float = WEAK_MATCH_SCORE,
 ) -> Dict[str, Any]:
     """
     すべてのACが tasks のどこかに必ず現れるようにする。
-    - attach: 既存タスクの ac_ids に追記
+    - attach: 既存タスクの ac_ids に追記（グループ内タスクから BM25 で最も近いものを選ぶ）
     - create_task: 未割当ACだけまとめたタスクをグループごとに追加
+    attach の紐付けは attachments に AC ごとのスコア付きで残し、
+    weak_score 未満のものは weak_ac_ids に挙げる（監査用）
     """
     all_ac_ids: List[str] = list(ac_map.keys())
     covered: Set[str] = set()
@@ -63,6 +71,8 @@ def enforce_ac_traceability(
             "missing_ac_ids": [],
             "mode": mode,
             "changed": False,
+            "attachments": [],
+            "weak_ac_ids": [],
         }
 
     # AC→group を引けるように
@@ -82,6 +92,7 @@ def enforce_ac_traceability(
             gid_to_index[gr["group_id"]] = i
 
     changed = False
+    attachments: List[Dict[str, Any]] = []
 
     if mode == "create_task":
         # グループごとに未割当ACをまとめてタスク1個追加
@@ -115,6 +126,8 @@ def enforce_ac_traceability(
 
     else:
         # attach: 既存タスクへ “追記” して完全カバーにする
+        index, ranges, owners = _build_task_index(group_results)
+
         for a in missing:
             gid = ac_to_group.get(a, "")
             gi = gid_to_index.get(gid)
@@ -124,25 +137,34 @@ def enforce_ac_traceability(
             if gi is None:
                 continue
 
-            gr = group_results[gi]
-            tasks = (gr.get("tasks") or []) if isinstance(gr, dict) else []
-            tasks = [t for t in tasks if isinstance(t, dict)]
-            if not tasks:
-                continue
-
-            best_i = _choose_best_task(tasks, ac_map.get(a, ""))
-            if best_i < 0:
+            doc_id, score = index.best(ac_map.get(a, ""), doc_range=ranges.get(gi, (0, 0)))
+            if doc_id < 0:
                 continue
+            _gi, task = owners[doc_id]
+            lo, _hi = ranges[gi]
 
-            ac_ids = tasks[best_i].setdefault("ac_ids", [])
+            ac_ids = task.setdefault("ac_ids", [])
             if not isinstance(ac_ids, list):
-                tasks[best_i]["ac_ids"] = ac_ids = []
+                task["ac_ids"] = ac_ids = []
             if a not in ac_ids:
                 ac_ids.append(a)
                 changed = True
 
+            attachments.append(
+                {
+                    "ac_id": a,
+                    "group_id": str((group_results[gi] or {}).get("group_id", "")),
+                    "task_index": doc_id - lo,
+                    "task_title": str(task.get("title", "")),
+                    "score": round(float(score), 4),
+                    "weak": bool(score < float(weak_score)),
+                }
+            )
+
     return {
         "missing_ac_ids": missing,
         "mode": mode,
         "changed": changed,
-    }
\ No newline at end of file
+        "attachments": attachments,
+        "weak_ac_ids": [x["ac_id"] for x in attachments if x["weak"]],
+    }
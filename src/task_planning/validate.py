@@ -1,5 +1,6 @@
 from __future__ import annotations
-from typing import Any, Dict, List, Tuple
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
 
 REQUIRED_TASK_KEYS = [
     "title",
@@ -12,44 +13,136 @@ REQUIRED_TASK_KEYS = [
     "description",
 ]
 
-def validate_tasks_obj(tasks_obj: Dict[str, Any], *, max_tasks: int) -> Tuple[bool, List[str]]:
-    errors: List[str] = []
+REQUIRED_DESC_SECTIONS = ["Goal:", "Changes:", "Acceptance checks:"]
+
+
+# -------------------------
+# Structured issues
+# -------------------------
+# issue code（local fixer / repair prompt はこれを見て動く。文字列を再パースしない）
+TASKS_EMPTY = "tasks_empty"
+TOO_MANY_TASKS = "too_many_tasks"
+TASK_NOT_OBJECT = "task_not_object"
+MISSING_KEY = "missing_key"
+EMPTY_TITLE = "empty_title"
+EMPTY_DESCRIPTION = "empty_description"
+ESTIMATE_NOT_NUMBER = "estimate_not_number"
+ESTIMATE_OUT_OF_RANGE = "estimate_out_of_range"
+RELATED_NOT_LIST = "related_not_list"
+DESC_SECTION_MISSING = "desc_section_missing"
+AC_IDS_EMPTY = "ac_ids_empty"
+TOO_MANY_ACS = "too_many_acs"
+UNKNOWN_AC = "unknown_ac"
+COVERAGE_MISSING = "coverage_missing"
+
+
+@dataclass(frozen=True)
+class TaskIssue:
+    code: str
+    message: str
+    task_index: Optional[int] = None  # 1-origin（tasks 全体の issue は None）
+    detail: Tuple[str, ...] = ()  # 対象のキー / AC ID など
+
+    def __str__(self) -> str:
+        return self.message
 
-    tasks = tasks_obj.get("tasks")
+
+def issue_messages(issues: Iterable[TaskIssue]) -> List[str]:
+    return [x.message for x in issues]
+
+
+def validate_group_tasks(
+    tasks_obj: Dict[str, Any],
+    *,
+    max_tasks: int,
+    group_ac_ids: Optional[List[str]] = None,
+    group_set: Optional[FrozenSet[str]] = None,
+    max_ac_per_task: int = 0,
+) -> Tuple[bool, List[TaskIssue]]:
+    """
+    タスク形式チェックとグループ coverage を1パスでまとめて行う
+    - 各タスクは1回だけ走査する（形式 → ac_ids の順）
+    - group_set は呼び出し側で1回作って使い回せる（repair ループ中は不変）
+    - group_ac_ids=None なら coverage は見ない（validate_tasks_obj と同じ）
+    戻り値の issue は TaskIssue（message は従来の文字列と同じ）
+    """
+    tasks = tasks_obj.get("tasks") if isinstance(tasks_obj, dict) else None
     if not isinstance(tasks, list) or len(tasks) == 0:
-        return False, ["tasks must be a non-empty list"]
+        return False, [TaskIssue(TASKS_EMPTY, "tasks must be a non-empty list")]
+
+    check_cov = group_ac_ids is not None
+    if check_cov and group_set is None:
+        group_set = frozenset(group_ac_ids or [])
+
+    shape: List[TaskIssue] = []
+    cov: List[TaskIssue] = []
+    covered: set = set()
 
     if max_tasks > 0 and len(tasks) > max_tasks:
-        errors.append(f"tasks exceeds max_tasks ({len(tasks)} > {max_tasks})")
+        shape.append(TaskIssue(TOO_MANY_TASKS, f"tasks exceeds max_tasks ({len(tasks)} > {max_tasks})"))
 
     for i, task in enumerate(tasks, start=1):
         if not isinstance(task, dict):
-            errors.append(f"tasks[{i}] must be an object")
+            shape.append(TaskIssue(TASK_NOT_OBJECT, f"tasks[{i}] must be an object", i))
+            if check_cov:
+                cov.append(TaskIssue(TASK_NOT_OBJECT, f"tasks[{i}] must be object", i))
             continue
 
         for k in REQUIRED_TASK_KEYS:
             if k not in task:
-                errors.append(f"tasks[{i}].{k} is missing")
+                shape.append(TaskIssue(MISSING_KEY, f"tasks[{i}].{k} is missing", i, (k,)))
 
         if not str(task.get("title", "")).strip():
-            errors.append(f"tasks[{i}].title is empty")
-        if not str(task.get("description", "")).strip():
-            errors.append(f"tasks[{i}].description is empty")
+            shape.append(TaskIssue(EMPTY_TITLE, f"tasks[{i}].title is empty", i))
+        desc = str(task.get("description", ""))
+        if not desc.strip():
+            shape.append(TaskIssue(EMPTY_DESCRIPTION, f"tasks[{i}].description is empty", i))
 
         eh = task.get("estimate_hours")
         if not isinstance(eh, (int, float)):
-            errors.append(f"tasks[{i}].estimate_hours must be number")
-        else:
-            if not (1 <= float(eh) <= 4):
-                errors.append(f"tasks[{i}].estimate_hours must be 1-4 (got {eh})")
+            shape.append(TaskIssue(ESTIMATE_NOT_NUMBER, f"tasks[{i}].estimate_hours must be number", i))
+        elif not (1 <= float(eh) <= 4):
+            shape.append(TaskIssue(ESTIMATE_OUT_OF_RANGE, f"tasks[{i}].estimate_hours must be 1-4 (got {eh})", i))
 
-        rtt = task.get("related_task_titles")
-        if not isinstance(rtt, list):
-            errors.append(f"tasks[{i}].related_task_titles must be list")
+        if not isinstance(task.get("related_task_titles"), list):
+            shape.append(TaskIssue(RELATED_NOT_LIST, f"tasks[{i}].related_task_titles must be list", i))
 
-        desc = str(task.get("description", ""))
-        for kw in ["Goal:", "Changes:", "Acceptance checks:"]:
+        for kw in REQUIRED_DESC_SECTIONS:
             if kw not in desc:
-                errors.append(f"tasks[{i}].description should include '{kw}'")
+                shape.append(TaskIssue(DESC_SECTION_MISSING, f"tasks[{i}].description should include '{kw}'", i, (kw,)))
+
+        if not check_cov:
+            continue
+
+        ac_ids = task.get("ac_ids")
+        if not isinstance(ac_ids, list) or not ac_ids:
+            cov.append(TaskIssue(AC_IDS_EMPTY, f"tasks[{i}].ac_ids must be non-empty list", i))
+            continue
+
+        if max_ac_per_task > 0 and len(ac_ids) > int(max_ac_per_task):
+            cov.append(
+                TaskIssue(
+                    TOO_MANY_ACS,
+                    f"tasks[{i}].ac_ids exceeds max_ac_per_task ({len(ac_ids)} > {max_ac_per_task})",
+                    i,
+                )
+            )
 
-    return (len(errors) == 0), errors
+        for a in ac_ids:
+            if a in group_set:
+                covered.add(a)
+            else:
+                cov.append(TaskIssue(UNKNOWN_AC, f"tasks[{i}].ac_ids contains unknown id: {a}", i, (str(a),)))
+
+    if check_cov:
+        missing = [a for a in group_ac_ids or [] if a not in covered]
+        if missing:
+            cov.append(TaskIssue(COVERAGE_MISSING, f"coverage missing ACs: {missing}", None, tuple(missing)))
+
+    issues = shape + cov
+    return (len(issues) == 0), issues
+
+
+def validate_tasks_obj(tasks_obj: Dict[str, Any], *, max_tasks: int) -> Tuple[bool, List[str]]:
+    ok, issues = validate_group_tasks(tasks_obj, max_tasks=max_tasks)
+    return ok, issue_messages(issues)
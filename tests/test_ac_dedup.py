@@ -0,0 +1,41 @@
+import json
+import os
+
+from src.task_planning.ac_dedup import dedup_ac_map, expand_duplicates
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def test_dedup_collapses_rewording_but_keeps_distinct_requirements():
+    ac_map = {
+        "AC-001": "Passwords must be hashed with bcrypt.",
+        "AC-002": "Password is hashed using bcrypt",
+        "AC-003": "Reports can be exported in CSV format.",
+        "AC-004": "Reports can be exported in PDF format.",
+        "AC-005": "パスワードはbcryptでハッシュ化されること。",
+        "AC-006": "パスワードは bcrypt でハッシュ化されること",
+        "AC-007": "Multiple condition AND search is possible.",
+        "AC-008": "Multiple condition OR search is possible.",
+    }
+    reduced, duplicate_of = dedup_ac_map(ac_map)
+    assert duplicate_of == {"AC-002": "AC-001", "AC-006": "AC-005"}
+    assert list(reduced) == ["AC-001", "AC-003", "AC-004", "AC-005", "AC-007", "AC-008"]
+
+
+def test_expand_puts_duplicates_on_canonical_tasks():
+    grouping = {"groups": [{"group_id": "G01", "ac_ids": ["AC-001", "AC-003"]}]}
+    group_results = [
+        {"group_id": "G01", "ac_ids": ["AC-001", "AC-003"], "tasks": [{"title": "t", "ac_ids": ["AC-001"]}]}
+    ]
+    expand_duplicates(grouping=grouping, group_results=group_results, duplicate_of={"AC-002": "AC-001"})
+    assert grouping["groups"][0]["ac_ids"] == ["AC-001", "AC-002", "AC-003"]
+    assert group_results[0]["tasks"][0]["ac_ids"] == ["AC-001", "AC-002"]
+
+
+def test_dedup_collapses_unspaced_japanese_particle_rewording():
+    with open(os.path.join(FIXTURES, "login_ja001.json"), encoding="utf-8") as f:
+        acs = json.load(f)["acceptance_criteria"]
+    ac_map = {f"AC-{i:03d}": t for i, t in enumerate(acs, start=1)}
+    _reduced, duplicate_of = dedup_ac_map(ac_map)
+    # 助詞（は/を）だけの違いは畳む。文字数（8/12）や否定（する/しない）の違いは残す
+    assert duplicate_of == {"AC-004": "AC-003"}
@@ -0,0 +1,26 @@
+import os
+
+from src.task_planning.checkpoint import CheckpointJournal
+
+
+def test_journal_resumes_completed_groups_and_skips_torn_line(tmp_path):
+    path = str(tmp_path / "out.json.ckpt.jsonl")
+    j = CheckpointJournal(path, key="k1")
+    j.open(resume=False)
+    j.record_grouping({"groups": [{"group_id": "G01"}, {"group_id": "G02"}]})
+    j.record_group({"group_id": "G01", "tasks": [{"title": "a"}]})
+    j._f.write('{"kind": "group", "group_id": "G02", "res')  # 書き込み途中で落ちた行
+    j._f.close()
+
+    state = CheckpointJournal(path, key="k1").load()
+    assert state is not None
+    assert [g["group_id"] for g in state.grouping["groups"]] == ["G01", "G02"]
+    assert list(state.results) == ["G01"]
+    assert CheckpointJournal(path, key="other").load() is None
+
+    j2 = CheckpointJournal(path, key="k1")
+    j2.open(resume=True)
+    j2.record_group({"group_id": "G02", "tasks": []})
+    assert sorted(CheckpointJournal(path, key="k1").load().results) == ["G01", "G02"]
+    j2.finish()
+    assert not os.path.exists(path)
@@ -0,0 +1,111 @@
+import pytest
+
+from src.task_planning.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+def test_opens_on_failures_then_half_open_probe_closes_it(tmp_path):
+    now = [1000.0]
+    path = str(tmp_path / "breaker.json")
+    b = CircuitBreaker(path, min_calls=4, failure_rate=0.5, cooldown_s=30, clock=lambda: now[0])
+
+    for ok in (True, False, True, False):
+        b.before_call()
+        b.record(ok)
+    # 別プロセス相当（同じ状態ファイルを読む別インスタンス）でも open が見える
+    other = CircuitBreaker(path, cooldown_s=30, clock=lambda: now[0])
+    with pytest.raises(CircuitOpenError):
+        other.before_call()
+    assert other.snapshot()["state"] == "open"
+
+    now[0] += 31
+    b.before_call()  # probe
+    with pytest.raises(CircuitOpenError):
+        other.before_call()  # probe は1本だけ
+    b.record(False)
+    assert b.snapshot()["state"] == "open"
+
+    now[0] += 31
+    b.before_call()
+    b.record(True)
+    other.before_call()
+    assert other.snapshot()["state"] == "closed"
+
+
+def test_stream_records_result_when_consumer_closes_early(monkeypatch):
+    from types import SimpleNamespace
+
+    from src.task_planning import llm
+
+    def _chunk(text):
+        return SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+    class _Stream:
+        closed = False
+
+        def __iter__(self):
+            return iter([_chunk('{"groups"'), _chunk(": []}")])
+
+        def close(self):
+            _Stream.closed = True
+
+    class _Breaker:
+        recorded = []
+
+        def before_call(self):
+            pass
+
+        def record(self, ok):
+            self.recorded.append(ok)
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **kw: _Stream())))
+    monkeypatch.setattr(llm, "get_client", lambda: client)
+    monkeypatch.setattr(llm, "shared_breaker", lambda: _Breaker())
+
+    gen = llm.stream_llm_text(model="m", messages=[{"role": "user", "content": "x"}])
+    assert next(gen) == '{"groups"'
+    gen.close()  # GeneratorExit（呼び出し側が途中で読むのをやめた）
+    assert _Breaker.recorded == [True] and _Stream.closed
+
+
+def test_deadline_capped_timeout_is_not_a_provider_failure(monkeypatch):
+    from types import SimpleNamespace
+
+    import httpx
+    from openai import APITimeoutError
+
+    from src.task_planning import llm
+    from src.task_planning.deadline import Deadline
+
+    class _Client:
+        def with_options(self, **kw):
+            return self
+
+        def _create(self, **kw):
+            raise APITimeoutError(request=httpx.Request("POST", "https://api.invalid/v1/chat/completions"))
+
+    class _Breaker:
+        def __init__(self):
+            self.recorded = []
+
+        def before_call(self):
+            pass
+
+        def record(self, ok):
+            self.recorded.append(ok)
+
+    client = _Client()
+    client.chat = SimpleNamespace(completions=SimpleNamespace(create=client._create))
+    breaker = _Breaker()
+    monkeypatch.setattr(llm, "get_client", lambda: client)
+    monkeypatch.setattr(llm, "shared_breaker", lambda: breaker)
+    messages = [{"role": "user", "content": "x"}]
+
+    # deadline で timeout を縮めた呼び出しの timeout は成功扱い（共有 breaker を open させない）
+    with pytest.raises(APITimeoutError):
+        llm.call_llm_json(model="m", messages=messages, deadline=Deadline(10.0))
+    with pytest.raises(APITimeoutError):
+        list(llm.stream_llm_text(model="m", messages=messages, deadline=Deadline(10.0)))
+    # 締め切り無しの timeout はプロバイダ障害として数える
+    with pytest.raises(APITimeoutError):
+        llm.call_llm_json(model="m", messages=messages)
+    assert breaker.recorded == [True, True, False]
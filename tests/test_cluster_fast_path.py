@@ -0,0 +1,53 @@
+from src.task_planning.grouping import cluster_agent
+from src.task_planning.grouping.cluster_agent import FAST_PATH_MAX_GROUPS, cluster_acs
+
+STORY = {"domain": "auth", "persona": "user", "action": "log in", "reason": "security"}
+
+# 6 AC / min_group_size 3 → 実現可能な群数は 2（fast path の対象）
+AC_MAP = {
+    "AC-001": "Users log in with email and password.",
+    "AC-002": "Passwords are compared as bcrypt hashes.",
+    "AC-003": "Login fails for unknown email addresses.",
+    "AC-004": "Sessions expire after 30 minutes of inactivity.",
+    "AC-005": "Logout destroys the server-side session.",
+    "AC-006": "Session cookies are HttpOnly and Secure.",
+}
+POLICY = dict(max_ac_per_group=10, target_groups_min=1, target_groups_max=2, max_groups=FAST_PATH_MAX_GROUPS)
+
+
+def test_fast_path_skips_llm_when_local_grouping_is_valid(monkeypatch):
+    def _no_llm(**kw):
+        raise AssertionError("LLM must not be called on the fast path")
+
+    monkeypatch.setattr(cluster_agent, "call_llm_json", _no_llm)
+    grouping = cluster_acs(model="m", story=STORY, ac_map=AC_MAP, **POLICY)
+
+    assert grouping["meta"]["fast_path"]["used"] is True
+    assert grouping["meta"].get("fallback") is not True
+    assert sorted(a for g in grouping["groups"] for a in g["ac_ids"]) == sorted(AC_MAP)
+
+
+def test_fast_path_falls_through_to_llm_when_local_grouping_fails(monkeypatch):
+    calls = []
+
+    def _llm(**kw):
+        calls.append(kw.get("stage"))
+        return {
+            "groups": [
+                {"group_id": "G01", "ac_ids": ["AC-001", "AC-002", "AC-003"], "label": "login"},
+                {"group_id": "G02", "ac_ids": ["AC-004", "AC-005", "AC-006"], "label": "session"},
+            ]
+        }
+
+    # ローカル結果が AC を取りこぼす（ハード制約違反）→ fast path は使わない
+    broken = {"groups": [{"group_id": "G01", "ac_ids": ["AC-001", "AC-002", "AC-003"]}], "meta": {}}
+    monkeypatch.setattr(cluster_agent, "_local_grouping", lambda *a, **kw: broken)
+    monkeypatch.setattr(cluster_agent, "call_llm_json", _llm)
+    grouping = cluster_acs(model="m", story=STORY, ac_map=AC_MAP, **POLICY)
+
+    assert calls == ["cluster"]
+    assert grouping["meta"]["fast_path"]["used"] is False
+    assert [g["ac_ids"] for g in grouping["groups"]] == [
+        ["AC-001", "AC-002", "AC-003"],
+        ["AC-004", "AC-005", "AC-006"],
+    ]
@@ -0,0 +1,19 @@
+import pytest
+
+from src.task_planning.deadline import MIN_CALL_S, RESERVE_S, Deadline, DeadlineExceeded
+
+
+def test_call_timeout_shrinks_with_budget_and_sub_never_outlives_parent():
+    now = [100.0]
+    d = Deadline(30.0, clock=lambda: now[0])
+    assert d.call_timeout(60.0) == 30.0 - RESERVE_S
+
+    child = d.sub(0.5)
+    assert child.remaining() == 15.0
+    now[0] += 20.0
+    assert child.expired() and not d.expired()
+    assert d.call_timeout(60.0) == 10.0 - RESERVE_S
+
+    now[0] += 10.0 - RESERVE_S - MIN_CALL_S + 0.5
+    with pytest.raises(DeadlineExceeded):
+        d.call_timeout(60.0)
@@ -0,0 +1,164 @@
+import concurrent.futures
+import json
+import sys
+import threading
+import time
+
+from src.task_planning import run
+from src.task_planning.grouped_taskgen import describe_agent
+from src.task_planning.grouped_taskgen.taskgen_agent import PENDING_DESCRIPTION
+
+DESC = "Goal: g\nChanges: c\nAcceptance checks: a"
+
+
+def _skeleton(ac_id):
+    return {
+        "title": f"do {ac_id}",
+        "ac_ids": [ac_id],
+        "estimate_hours": 2,
+        "description": PENDING_DESCRIPTION,
+        "description_status": "pending",
+    }
+
+
+def test_two_phase_deadline_leaves_in_flight_descriptions_pending(tmp_path, monkeypatch):
+    groups = [{"group_id": "G01", "ac_ids": ["AC-001", "AC-002", "AC-003"], "label": "login"}]
+    story = {"domain": "d", "persona": "p", "action": "a", "reason": "r", "acceptance_criteria": ["x", "y", "z"]}
+    in_path, out_path = tmp_path / "in.json", tmp_path / "out.json"
+    in_path.write_text(json.dumps(story), encoding="utf-8")
+
+    release = threading.Event()
+    finished = threading.Event()
+    held = []
+
+    def _llm(**kw):
+        if '"AC-003"' in kw["messages"][-1]["content"]:
+            # 締め切りを過ぎても返らない describe（ワーカーは出力の後も走り続ける）
+            release.wait(10)
+            finished.set()
+        return {"description": DESC}
+
+    def _one(**kw):
+        g = kw["group"]
+        held.extend(_skeleton(a) for a in g["ac_ids"])
+        return {"group_id": g["group_id"], "ac_ids": g["ac_ids"], "tasks": list(held), "meta": {}}
+
+    monkeypatch.setattr(run, "cluster_acs", lambda **kw: {"groups": groups, "meta": {}})
+    monkeypatch.setattr(run, "generate_tasks_for_group", _one)
+    monkeypatch.setattr(describe_agent, "call_llm_json", _llm)
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["run", "-i", str(in_path), "-o", str(out_path), "--taskgen-mode", "two_phase", "--deadline", "2.5"],
+    )
+    try:
+        run.main()
+    finally:
+        release.set()
+    assert finished.wait(5)
+    time.sleep(0.1)
+
+    tasks = json.loads(out_path.read_text(encoding="utf-8"))["group_results"][0]["tasks"]
+    status = {t["ac_ids"][0]: (t["description_status"], t["description"]) for t in tasks}
+    assert status["AC-001"] == ("generated", DESC) and status["AC-002"] == ("generated", DESC)
+    # 間に合わなかった分は pending のまま（説明文と状態が食い違わない）
+    assert status["AC-003"] == ("pending", PENDING_DESCRIPTION)
+    # 出力後に終わったワーカーも run が持っているタスクは書き換えない
+    assert held[2]["description_status"] == "pending" and "description_error" not in held[2]
+
+
+AC_MAP = {"AC-001": "Users log in with email.", "AC-002": "Passwords are hashed."}
+STORY = {"domain": "auth", "persona": "employee", "action": "log in", "reason": "security"}
+
+
+def test_skeleton_taskgen_marks_descriptions_pending(monkeypatch):
+    from src.task_planning.grouped_taskgen import taskgen_agent
+
+    def _llm(**kw):
+        tasks = [{"title": f"do {a}", "subcategory": "[Code][BE]", "estimate_hours": 2, "ac_ids": [a]} for a in AC_MAP]
+        return {"tasks": tasks}
+
+    monkeypatch.setattr(taskgen_agent, "call_llm_json", _llm)
+    gr = taskgen_agent.generate_tasks_for_group(
+        model="m",
+        story=STORY,
+        group={"group_id": "G01", "ac_ids": list(AC_MAP)},
+        ac_map=AC_MAP,
+        skeleton_only=True,
+    )
+    assert [(t["description"], t["description_status"]) for t in gr["tasks"]] == [
+        (PENDING_DESCRIPTION, "pending"),
+        (PENDING_DESCRIPTION, "pending"),
+    ]
+
+
+def test_describe_task_checks_sections_escalates_and_falls_back(monkeypatch):
+    from src.task_planning.model_cascade import ModelCascade
+
+    replies = {"nano": {"description": "Goal: only a goal"}, "mini": {"description": DESC}}
+    models = []
+
+    def _llm(**kw):
+        models.append(kw["model"])
+        return replies[kw["model"]]
+
+    monkeypatch.setattr(describe_agent, "call_llm_json", _llm)
+    task = _skeleton("AC-001")
+
+    # 下位 tier が3セクションを揃えなければ上位 tier で作り直す。元の task は書き換えない
+    cascade = ModelCascade({"describe": ["nano", "mini"]}, default_model="mini")
+    out = describe_agent.describe_task(model="mini", story=STORY, task=task, ac_map=AC_MAP, cascade=cascade)
+    assert models == ["nano", "mini"]
+    assert (out["description"], out["description_status"]) == (DESC, "generated")
+    assert task["description_status"] == "pending"
+
+    # セクション不足（cascade 無し）→ テンプレ description
+    out = describe_agent.describe_task(model="nano", story=STORY, task=task, ac_map=AC_MAP)
+    assert out["description_status"] == "fallback"
+    assert "missing required sections" in out["description_error"]
+    assert out["description"].startswith("Goal: do AC-001")
+    assert "AC-001: Users log in with email." in out["description"]
+
+
+def test_fill_group_descriptions_only_fills_pending_tasks(monkeypatch):
+    monkeypatch.setattr(describe_agent, "call_llm_json", lambda **kw: {"description": DESC})
+    done = {"title": "done", "ac_ids": ["AC-002"], "description": "Goal: x", "description_status": "generated"}
+    group_result = {"group_id": "G01", "tasks": [_skeleton("AC-001"), done]}
+
+    submitted = describe_agent.fill_group_descriptions(model="m", story=STORY, group_result=group_result, ac_map=AC_MAP)
+    assert submitted == []
+    assert group_result["tasks"][0]["description_status"] == "generated"
+    assert group_result["tasks"][1]["description"] == "Goal: x"
+
+    # executor あり: 終わった future だけ apply_descriptions で反映する
+    group_result = {"group_id": "G01", "tasks": [_skeleton("AC-001"), _skeleton("AC-002")]}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as ex:
+        submitted = describe_agent.fill_group_descriptions(
+            model="m", story=STORY, group_result=group_result, ac_map=AC_MAP, executor=ex
+        )
+        first = submitted[0][1]
+        first.result()
+    assert group_result["tasks"][0]["description_status"] == "pending"
+    assert describe_agent.apply_descriptions(submitted, {first}) == 1
+    assert [t["description_status"] for t in group_result["tasks"]] == ["generated", "pending"]
+
+
+def test_describe_endpoint_numbers_acs_like_run(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import src.main as main
+
+    seen = {}
+
+    def _describe(**kw):
+        seen.update(kw)
+        return {**kw["task"], "description": DESC, "description_status": "generated"}
+
+    monkeypatch.setattr(describe_agent, "describe_task", _describe)
+    story = {**STORY, "acceptance_criteria": ["Users log in with email.", "   ", "Passwords are hashed."]}
+    r = TestClient(main.app).post("/tasks/describe", json={"story": story, "task": _skeleton("AC-002")})
+
+    assert r.status_code == 200 and r.json()["task"]["description_status"] == "generated"
+    # 空の AC は詰めてから採番する（run.py と同じ AC-002）
+    assert seen["ac_map"] == AC_MAP
+    assert seen["story"] == STORY
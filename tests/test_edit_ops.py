@@ -0,0 +1,71 @@
+from src.task_planning.grouping.edit_ops import apply_grouping_edits
+
+AC_MAP = {f"AC-{i:03d}": f"criterion {i}" for i in range(1, 10)}
+
+
+def _seed():
+    return {
+        "groups": [
+            {"group_id": "G01", "ac_ids": ["AC-001", "AC-002", "AC-003"], "label": "login"},
+            {"group_id": "G02", "ac_ids": ["AC-004", "AC-005", "AC-006"], "label": "session"},
+            {"group_id": "G03", "ac_ids": ["AC-007", "AC-008", "AC-009"], "label": "logs"},
+        ]
+    }
+
+
+def _ids(grouping):
+    return {g["group_id"]: g["ac_ids"] for g in grouping["groups"]}
+
+
+def test_move_merge_split_rename_and_labels():
+    seed = _seed()
+    edits = {
+        "ops": [
+            {"op": "move", "ac_ids": ["AC-003"], "to": "G02"},
+            {"op": "move", "ac_id": "AC-001", "to": "G09", "label": "new"},
+            {"op": "merge", "into": "G02", "from": ["G03"]},
+            {"op": "split", "group_id": "G02", "ac_ids": ["AC-007", "AC-008"], "new_group_id": "G04", "label": "audit"},
+            {"op": "rename", "group_id": "G01", "label": "password", "tags": ["auth"], "rationale": "same screen"},
+        ],
+        "labels": {"G02": "session and logs"},
+    }
+    out, report = apply_grouping_edits(seed, edits, ac_map=AC_MAP)
+
+    assert report == {"ops_total": 5, "ops_applied": 5, "ops_skipped": []}
+    assert _ids(out) == {
+        "G01": ["AC-002"],
+        "G02": ["AC-004", "AC-005", "AC-006", "AC-003", "AC-009"],
+        "G09": ["AC-001"],
+        "G04": ["AC-007", "AC-008"],
+    }
+    by_id = {g["group_id"]: g for g in out["groups"]}
+    assert by_id["G01"]["label"] == "password" and by_id["G01"]["tags"] == ["auth"]
+    assert by_id["G01"]["rationale"] == "same screen"
+    assert by_id["G02"]["label"] == "session and logs"
+    assert by_id["G09"]["label"] == "new" and by_id["G04"]["label"] == "audit"
+    # merge で空になった G03 は除去される。seed 自体は書き換えない
+    assert "G03" not in by_id and _ids(seed)["G03"] == ["AC-007", "AC-008", "AC-009"]
+
+
+def test_invalid_ops_are_skipped_and_reported():
+    edits = {
+        "ops": [
+            "move AC-001",
+            {"op": "move", "ac_ids": ["AC-404"], "to": "G02"},
+            {"op": "move", "ac_ids": ["AC-001"]},
+            {"op": "merge", "into": "G09", "from": ["G01"]},
+            {"op": "split", "group_id": "G01", "ac_ids": ["AC-004"]},
+            {"op": "rename", "group_id": "G09", "label": "x"},
+            {"op": "delete", "group_id": "G01"},
+            {"op": "split", "group_id": "G01", "ac_ids": ["AC-001"], "new_group_id": "G02"},
+        ]
+    }
+    out, report = apply_grouping_edits(_seed(), edits, ac_map=AC_MAP)
+
+    assert report["ops_total"] == 8 and report["ops_applied"] == 1
+    assert [s["index"] for s in report["ops_skipped"]] == [1, 2, 3, 4, 5, 6, 7]
+    assert report["ops_skipped"][6]["reason"] == "unsupported op"
+    # 既存の group_id と衝突する new_group_id は採番し直す
+    ids = _ids(out)
+    assert ids["G01"] == ["AC-002", "AC-003"] and ids["G02"] == ["AC-004", "AC-005", "AC-006"]
+    assert ["AC-001"] in [v for k, v in ids.items() if k not in {"G01", "G02", "G03"}]
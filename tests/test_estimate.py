@@ -0,0 +1,64 @@
+import json
+
+from src.task_planning.estimate import estimate_run, load_history
+
+STORY = {"domain": "Shop", "persona": "Buyer", "action": "check out", "reason": "buy items"}
+AC_MAP = {
+    f"AC-{i:03d}": text
+    for i, text in enumerate(
+        [
+            "Cart shows item price and quantity",
+            "Cart total updates when quantity changes",
+            "Checkout requires a shipping address",
+            "Checkout validates the postal code format",
+            "Payment by credit card is supported",
+            "Payment failure shows an error message",
+            "Order confirmation email is sent",
+            "Order history lists past orders",
+            "Audit log records every payment attempt",
+            "Admin can refund an order",
+            "Refund updates the order status",
+            "Stock is reserved during checkout",
+        ],
+        start=1,
+    )
+}
+TUNED = {"max_ac_per_group": 4, "target_groups_min": 3, "target_groups_max": 5, "max_groups": 6, "min_group_size": 2}
+
+
+def test_estimate_counts_calls_and_scales_with_workers():
+    est = estimate_run(
+        story=STORY, ac_map=AC_MAP, tuned=TUNED, max_tasks_per_ac=2, max_repairs=1, taskgen_mode="two_phase", workers=2
+    )
+    calls = est["llm_calls"]["by_stage"]
+    assert calls["cluster"]["calls"] == 1.0
+    assert calls["taskgen"]["calls"] == est["taskgen_units"] == est["groups_estimated"]
+    assert calls["describe"]["calls"] == est["tasks_estimated"]
+    assert est["tokens"]["input"] > 0 and est["tokens"]["output"] > 0
+
+    wall = est["wall_clock_s"]["by_workers"]
+    assert wall["1"] >= wall["2"] >= wall["4"] and est["wall_clock_s"]["total"] == wall["2"]
+
+
+def test_history_overrides_latency_and_repair_rate(tmp_path):
+    prev = {
+        "ac_map": {"AC-001": "x", "AC-002": "y"},
+        "grouping": {"meta": {"repairs_used": 1, "fast_path": {"used": False}}},
+        "group_results": [{"validate": {"repairs_used": 0}, "tasks": [{}, {}, {}, {}]}],
+        "meta": {
+            "hedging": {"stages": {"taskgen": {"calls": 4, "p50_s": 3.0, "p90_s": 5.0}}},
+            "llm_usage": {"taskgen": {"calls": 4, "prompt_tokens": 4000, "completion_tokens": 2000}},
+        },
+    }
+    path = tmp_path / "prev.json"
+    path.write_text(json.dumps(prev), encoding="utf-8")
+
+    hist = load_history([str(path), str(tmp_path / "missing.json")])
+    assert hist["files"] == 1
+    assert hist["stages"]["taskgen"] == {"p50_s": 3.0, "p90_s": 5.0, "calls": 4, "out_tokens": 500.0}
+    assert hist["repair_rate"] == {"cluster": 1.0, "taskgen": 0.0} and hist["tasks_per_ac"] == 2.0
+
+    est = estimate_run(story=STORY, ac_map=AC_MAP, tuned=TUNED, max_tasks_per_ac=2, max_repairs=1, workers=1, history=hist)
+    assert est["wall_clock_s"]["taskgen"] == 3.0 * est["taskgen_units"]
+    assert "taskgen_repair" not in est["llm_calls"]["by_stage"]
+    assert est["llm_calls"]["by_stage"]["cluster_repair"]["calls"] == 1.0
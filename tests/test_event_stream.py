@@ -0,0 +1,30 @@
+import io
+import json
+
+from src.task_planning.event_stream import EventStream
+
+
+def test_events_resend_only_groups_changed_after_emit():
+    buf = io.StringIO()
+    ev = EventStream(buf)
+    grouping = {"groups": [{"group_id": "G1"}, {"group_id": "G2"}], "meta": {}}
+    g1 = {"group_id": "G1", "tasks": [{"title": "a", "description_status": "pending"}]}
+    g2 = {"group_id": "G2", "tasks": [{"title": "b"}]}
+
+    ev.grouping(grouping)
+    ev.group(1, g2)
+    ev.group(0, g1)
+    # 後処理で G1 の description が埋まる（送った後の in-place 変更）
+    g1["tasks"][0]["description_status"] = "filled"
+    ev.finish(grouping=grouping, group_results=[g1, g2], trace={"ok": True}, meta={"total_tasks": 2})
+
+    lines = [json.loads(line) for line in buf.getvalue().splitlines()]
+    assert [(e["event"], e.get("index"), e.get("revised")) for e in lines] == [
+        ("grouping", None, None),
+        ("group", 1, None),
+        ("group", 0, None),
+        ("group", 0, True),
+        ("done", None, None),
+    ]
+    assert lines[3]["group_result"]["tasks"][0]["description_status"] == "filled"
+    assert lines[-1]["meta"] == {"total_tasks": 2}
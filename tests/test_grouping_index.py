@@ -0,0 +1,63 @@
+from src.task_planning.grouping.schema import ac_log_kinds, build_grouping_index, validate_grouping
+
+AC_MAP = {
+    "AC-001": "Users log in with email.",
+    "AC-002": "Passwords are hashed.",
+    "AC-003": "Login fails for unknown users.",
+    "AC-004": "Audit logs record admin changes.",
+    "AC-005": "Security logs record failed logins.",
+    "AC-006": "Sessions expire after 30 minutes.",
+    "AC-007": "Logout destroys the session.",
+}
+
+# 重複 group_id / 重複割当 / 欠け / 未知 AC / サイズ超過 / audit+security 混在 / group_id 空 を全部含む
+GROUPING = {
+    "groups": [
+        {"group_id": "G01", "ac_ids": ["AC-001", "AC-002", "AC-003"]},
+        {"group_id": "G01", "ac_ids": ["AC-003", "AC-006", "AC-099"]},
+        {"group_id": "G03", "ac_ids": ["AC-004", "AC-005", "AC-001", "AC-002"]},
+        {"group_id": "", "ac_ids": []},
+    ]
+}
+POLICY = dict(max_ac_per_group=3, target_groups_min=2, target_groups_max=3, max_groups=4, min_group_size=3)
+
+# GroupingIndex 導入前の validate_grouping が出していた issue（順序も同じ）
+EXPECTED_ISSUES = [
+    "duplicate group_id: G01",
+    "groups[3] size exceeds max_ac_per_group (4 > 3)",
+    "groups[4].group_id is missing/empty",
+    "missing ACs (not assigned): ['AC-007']",
+    "unknown AC ids (invented): ['AC-099']",
+    "duplicate assignment (AC appears in multiple groups): ['AC-001', 'AC-002', 'AC-003']",
+    "log groups must be split (audit vs security). mixed_groups=['G03']",
+    "warning: groups_count=4 not in target range [2,3]",
+]
+
+
+def test_index_reports_the_same_issues_as_before():
+    kinds = ac_log_kinds(AC_MAP)
+    assert kinds["AC-004"] == "audit" and kinds["AC-005"] == "security" and kinds["AC-006"] == "other"
+
+    idx = build_grouping_index(GROUPING, ac_map=AC_MAP, log_kinds=kinds)
+    assert idx.duplicate_group_ids == ("G01",)
+    assert idx.duplicate_ids == ("AC-001", "AC-002", "AC-003")
+    assert idx.missing_ids == ("AC-007",) and idx.unknown_ids == ("AC-099",)
+    assert idx.mixed_log_groups == ("G03",)
+    assert idx.group_sizes == [3, 3, 4, 0]
+    assert idx.ac_to_group["AC-003"] == "G01"
+
+    # index を渡しても渡さなくても同じ結果（self_check / cluster_support が使い回す前提）
+    assert validate_grouping(GROUPING, ac_map=AC_MAP, **POLICY) == (False, EXPECTED_ISSUES)
+    assert validate_grouping(GROUPING, ac_map=AC_MAP, index=idx, **POLICY) == (False, EXPECTED_ISSUES)
+
+
+def test_valid_grouping_has_no_issues():
+    grouping = {
+        "groups": [
+            {"group_id": "G01", "ac_ids": ["AC-001", "AC-002", "AC-003", "AC-004"]},
+            {"group_id": "G02", "ac_ids": ["AC-005", "AC-006", "AC-007"]},
+        ]
+    }
+    idx = build_grouping_index(grouping, ac_map=AC_MAP)
+    assert not (idx.duplicate_ids or idx.missing_ids or idx.unknown_ids or idx.mixed_log_groups)
+    assert validate_grouping(grouping, ac_map=AC_MAP, index=idx, **{**POLICY, "max_ac_per_group": 4}) == (True, [])
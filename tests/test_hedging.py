@@ -0,0 +1,29 @@
+import threading
+import time
+
+from src.task_planning.hedging import Hedger
+
+
+def test_slow_call_is_hedged_and_fast_duplicate_wins():
+    h = Hedger(enabled=True, min_samples=3, max_extra_ratio=0.5)
+    for _ in range(3):
+        assert h.run("taskgen", lambda: "ok") == "ok"
+
+    calls = []
+    release = threading.Event()
+
+    def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(2.0)  # 1本目だけ詰まる
+            return "slow"
+        return "fast"
+
+    t0 = time.monotonic()
+    assert h.run("taskgen", flaky) == "fast"
+    assert time.monotonic() - t0 < 1.0
+    release.set()
+
+    st = h.stats()["stages"]["taskgen"]
+    assert st["calls"] == 4 and st["hedged"] == 1 and st["hedge_wins"] == 1
+    assert h.stats()["extra_calls"] == 1
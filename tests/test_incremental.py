@@ -0,0 +1,59 @@
+from src.task_planning.incremental import group_hashes, plan_fingerprint, plan_incremental
+
+
+def _prev(fp):
+    ac_map = {"AC-001": "Login with email", "AC-002": "Lock after 5 failures", "AC-003": "Reset password by mail"}
+    grouping = {
+        "groups": [
+            {"group_id": "G01", "ac_ids": ["AC-001", "AC-002"]},
+            {"group_id": "G02", "ac_ids": ["AC-003"]},
+        ]
+    }
+    group_results = [
+        {"group_id": "G01", "validate": {"pass": True}, "tasks": [{"title": "Login API", "ac_ids": ["AC-001", "AC-002"]}]},
+        {"group_id": "G02", "validate": {"pass": True}, "tasks": [{"title": "Reset flow", "ac_ids": ["AC-003"]}]},
+    ]
+    meta = {"plan_fingerprint": fp, "group_hashes": group_hashes(grouping=grouping, ac_map=ac_map, fingerprint=fp)}
+    return {"ac_map": ac_map, "grouping": grouping, "group_results": group_results, "meta": meta}
+
+
+def test_reuses_unchanged_groups_with_remapped_ids():
+    fp = plan_fingerprint({"action": "login"}, {"model": "m"})
+    # 先頭に AC を挿入（ID がずれる）し、AC-003 の文面を変更
+    ac_map = {
+        "AC-001": "Show login page",
+        "AC-002": "Login with email",
+        "AC-003": "Lock after 5 failures",
+        "AC-004": "Reset password by SMS",
+    }
+    plan = plan_incremental(_prev(fp), ac_map=ac_map, fingerprint=fp)
+
+    assert [g["group_id"] for g in plan.reused_groups] == ["G01"]
+    assert plan.reused_groups[0]["ac_ids"] == ["AC-002", "AC-003"]
+    assert plan.reused_results[0]["tasks"][0]["ac_ids"] == ["AC-002", "AC-003"]
+    assert plan.affected_ids == ["AC-001", "AC-004"]
+    assert plan.report["groups"]["dropped"] == [{"group_id": "G02", "reason": "acs_changed"}]
+
+
+def test_policy_change_recomputes_everything():
+    fp = plan_fingerprint({"action": "login"}, {"model": "m"})
+    ac_map = {"AC-001": "Login with email", "AC-002": "Lock after 5 failures", "AC-003": "Reset password by mail"}
+    plan = plan_incremental(_prev(fp), ac_map=ac_map, fingerprint=plan_fingerprint({"action": "login"}, {"model": "x"}))
+    assert plan.report["reason"] == "policy_changed"
+    assert plan.affected_ids == list(ac_map) and not plan.reused_groups
+
+
+def test_group_whose_tasks_were_merged_away_is_not_reused():
+    fp = plan_fingerprint({"action": "login"}, {"model": "m"})
+    prev = _prev(fp)
+    # G02 のタスクは G01 側へ統合済み（--dedup-tasks）。G01 は cross_group_task、G02 は自前のタスクが無い
+    prev["group_results"][0]["tasks"][0]["ac_ids"].append("AC-003")
+    prev["group_results"][1]["tasks"] = []
+
+    plan = plan_incremental(prev, ac_map=dict(prev["ac_map"]), fingerprint=fp)
+    assert plan.reused_groups == []
+    assert plan.report["groups"]["dropped"] == [
+        {"group_id": "G01", "reason": "cross_group_task"},
+        {"group_id": "G02", "reason": "tasks_incomplete"},
+    ]
+    assert plan.affected_ids == ["AC-001", "AC-002", "AC-003"]
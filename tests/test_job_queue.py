@@ -0,0 +1,113 @@
+import sqlite3
+import threading
+import time
+
+from src.job_queue import JobQueue
+
+
+def _wait(q, job_id, statuses, timeout=10.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        job = q.get(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(q.get(job_id))
+
+
+def test_dedup_run_fail_and_cancel(tmp_path):
+    gate = threading.Event()
+
+    def slow(ctx):
+        ctx.set_partial({"step": 1})
+        while not gate.wait(0.05):
+            ctx.check()
+        return {"echo": ctx.payload["x"]}
+
+    def boom(ctx):
+        raise ValueError("bad input")
+
+    q = JobQueue(str(tmp_path / "jobs.sqlite3"), runners={"slow": slow, "boom": boom}, workers=1)
+
+    a, dup_a = q.submit("slow", {"x": 1})
+    b, dup_b = q.submit("slow", {"x": 1})
+    c, _ = q.submit("slow", {"x": 2})
+    assert not dup_a and dup_b and b["job_id"] == a["job_id"] and c["job_id"] != a["job_id"]
+
+    # queued のまま cancel → 実行されない
+    assert q.cancel(c["job_id"])["status"] == "cancelled"
+
+    q.start()
+    try:
+        gate.set()
+        done = _wait(q, a["job_id"], {"done"})
+        assert done["result"] == {"echo": 1} and done["partial"] == {"step": 1}
+        assert q.get(c["job_id"])["started_at"] is None
+
+        # 終わったジョブとは重複排除しない
+        assert q.submit("slow", {"x": 1})[1] is False
+
+        f, _ = q.submit("boom", {})
+        assert _wait(q, f["job_id"], {"failed"})["error"] == "ValueError: bad input"
+
+        # running の cancel は runner の check() で止まる
+        gate.clear()
+        r, _ = q.submit("slow", {"x": 3})
+        _wait(q, r["job_id"], {"running"})
+        q.cancel(r["job_id"])
+        assert _wait(q, r["job_id"], {"cancelled"})["cancel_requested"]
+    finally:
+        gate.set()
+        q.stop()
+
+
+def test_restart_requeues_expired_running_jobs(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    q = JobQueue(path, runners={"echo": lambda ctx: {"x": ctx.payload["x"]}}, workers=1)
+    job, _ = q.submit("echo", {"x": 7})
+
+    # 前のプロセスが running のまま死んだ（lease 切れ）状態を作る
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE jobs SET status = 'running', attempts = 1, lease_until = 0 WHERE id = ?", (job["job_id"],))
+    conn.commit()
+    conn.close()
+
+    q2 = JobQueue(path, runners={"echo": lambda ctx: {"x": ctx.payload["x"]}}, workers=1)
+    q2.start()
+    try:
+        done = _wait(q2, job["job_id"], {"done"})
+        assert done["result"] == {"x": 7} and done["attempts"] == 2
+    finally:
+        q2.stop()
+
+
+def test_stale_worker_cannot_overwrite_a_reclaimed_job(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    q = JobQueue(path, runners={"echo": lambda ctx: {}}, workers=1)
+    job, _ = q.submit("echo", {"x": 1})
+
+    first = q._claim()
+    # 1本目のワーカーが lease を延長できないまま止まり、別プロセスが拾い直す
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE jobs SET lease_until = 0 WHERE id = ?", (job["job_id"],))
+    conn.commit()
+    conn.close()
+    second = JobQueue(path, runners={"echo": lambda ctx: {}}, workers=1)._claim()
+    assert (first.attempt, second.attempt) == (1, 2)
+
+    # 遅れて終わった1本目の結果 / partial は捨てられ、2本目の実行は running のまま
+    first.set_partial({"stale": True})
+    assert not q._finish(first, "done", result={"from": "first"})
+    running = q.get(job["job_id"])
+    assert running["status"] == "running" and running["result"] is None and running["partial"] is None
+
+    assert q._finish(second, "done", result={"from": "second"})
+    assert q.get(job["job_id"])["result"] == {"from": "second"}
+
+    # 終わった（cancelled 等の）ジョブも上書きしない
+    c, _ = q.submit("echo", {"x": 2})
+    ctx = q._claim()
+    q.cancel(c["job_id"])
+    assert q._finish(ctx, "cancelled")
+    assert not q._finish(ctx, "done", result={"late": True})
+    assert q.get(c["job_id"])["status"] == "cancelled"
@@ -0,0 +1,13 @@
+from src.task_planning.keywords import FALLBACK_SUBCATEGORY, LOG_KIND, classify, classify_all, keyword_hits
+
+
+def test_single_scan_finds_overlapping_keywords_and_keeps_rule_order():
+    # "audit log" の中の "audit"/"log" も拾う（最長一致だけで取りこぼさない）
+    assert {"audit log", "audit", "log"} <= keyword_hits("Write an AUDIT LOG entry")
+    assert classify("セキュリティログにブルートフォースを記録", LOG_KIND) == "security"
+    assert classify("監査ログは改ざんできない", LOG_KIND) == "audit"
+    # 先に定義したルールが勝つ（login より log が先）
+    assert classify("Login page", FALLBACK_SUBCATEGORY) == "Logging/Audit"
+    labels = classify_all("Password is hashed with bcrypt")
+    assert labels["fallback_bucket"] == "password_hash"
+    assert labels["log_kind"] == "other"
@@ -0,0 +1,49 @@
+from src.task_planning.llm_cache import LLMCache, StagePolicy
+
+STORY = (
+    "Domain: Login. Persona: registered user. Action: log into the system with email and password. "
+    "Reason: access my account. Acceptance criteria: passwords are hashed with bcrypt; the account is locked "
+    "for 30 minutes after 5 failed attempts; a JWT is issued on success and expires after 60 minutes; "
+    "login attempts are written to the security log with the source IP address."
+)
+
+
+def test_near_tier_reuses_trivially_edited_prompt_only_for_opted_in_stage():
+    calls = []
+
+    def compute(v):
+        def _f():
+            calls.append(v)
+            return {"score": v}
+        return _f
+
+    cache = LLMCache(policies={"persona_score": StagePolicy(near=True, threshold=0.8)})
+    edited = STORY.replace("registered user", "registered customer")
+
+    assert cache.call("persona_score", context="sys", body=STORY, compute=compute(60)) == {"score": 60}
+    assert cache.call("persona_score", context="sys", body=edited, compute=compute(61)) == {"score": 60}
+    # context（system prompt / model）が違えば再利用しない
+    assert cache.call("persona_score", context="other", body=edited, compute=compute(62)) == {"score": 62}
+    # opt-in していないステージは exact のみ
+    cache.call("taskgen", context="sys", body=STORY, compute=compute(1))
+    assert cache.call("taskgen", context="sys", body=edited, compute=compute(2)) == {"score": 2}
+
+    st = cache.stats()
+    assert st["persona_score"]["near_hits"] == 1
+    assert st["taskgen"]["near_hits"] == 0
+    assert calls == [60, 62, 1, 2]
+
+
+def test_audit_counts_false_reuse():
+    cache = LLMCache(
+        policies={
+            "persona_score": StagePolicy(
+                near=True, threshold=0.8, audit_rate=1.0, same=lambda a, b: abs(a["score"] - b["score"]) <= 5
+            )
+        }
+    )
+    cache.call("persona_score", context="sys", body=STORY, compute=lambda: {"score": 40})
+    edited = STORY.replace("30 minutes", "15 minutes")
+    assert cache.call("persona_score", context="sys", body=edited, compute=lambda: {"score": 80}) == {"score": 80}
+    st = cache.stats()["persona_score"]
+    assert st["audits"] == 1 and st["false_reuse"] == 1
@@ -0,0 +1,77 @@
+import json
+import os
+
+from src.task_planning.grouping.cluster_support import derive_effective_policy
+from src.task_planning.grouping.local_cluster import local_constrained_grouping
+from src.task_planning.grouping.schema import validate_grouping
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def _ac_map(name: str):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        obj = json.load(f)
+    return {f"AC-{i:03d}": t for i, t in enumerate(obj["acceptance_criteria"], start=1)}
+
+
+def test_local_grouping_satisfies_hard_constraints():
+    for name in ["login_us001.json", "login_us007.json", "login_us019.json"]:
+        ac_map = _ac_map(name)
+        eff = derive_effective_policy(
+            n_acs=len(ac_map), target_groups_min=8, target_groups_max=12, max_groups=15, min_group_size=3
+        )
+        grouping = local_constrained_grouping(
+            ac_map,
+            max_ac_per_group=10,
+            min_group_size=eff.min_group_size,
+            target_groups_min=eff.target_min,
+            target_groups_max=eff.target_max,
+            max_groups=eff.max_groups,
+        )
+        ok, issues = validate_grouping(
+            grouping,
+            ac_map=ac_map,
+            max_ac_per_group=10,
+            target_groups_min=eff.target_min,
+            target_groups_max=eff.target_max,
+            max_groups=eff.max_groups,
+            min_group_size=eff.min_group_size,
+        )
+        assert ok, issues
+
+
+def test_local_grouping_splits_audit_and_security_logs():
+    ac_map = {
+        "AC-001": "Security logs record brute-force attempts.",
+        "AC-002": "Security logs include the source IP.",
+        "AC-003": "Security log entries are retained for 90 days.",
+        "AC-004": "Audit logs must be tamper-evident.",
+        "AC-005": "Audit log entries include the operator id.",
+        "AC-006": "Audit logs are exported daily.",
+    }
+    grouping = local_constrained_grouping(ac_map, max_ac_per_group=10, min_group_size=3)
+    ok, issues = validate_grouping(
+        grouping, ac_map=ac_map, target_groups_min=1, target_groups_max=2, max_groups=2
+    )
+    assert ok, issues
+    assert len(grouping["groups"]) == 2
+
+
+def test_local_grouping_redistributes_overflow_within_max_groups():
+    # 容量 3 × 2群で audit/security が別クラスタに溢れるケース（溢れ分を再配置して 2 群に収める）
+    ac_map = {
+        "AC-001": "Security log entries are kept 90 days.",
+        "AC-002": "Audit logs are exported daily.",
+        "AC-003": "User can reset password by email.",
+        "AC-004": "Password must be at least 8 characters.",
+        "AC-005": "Session expires after 30 minutes.",
+        "AC-006": "Remember-me keeps user signed in.",
+    }
+    grouping = local_constrained_grouping(
+        ac_map, max_ac_per_group=3, min_group_size=1, target_groups_min=1, target_groups_max=2, max_groups=2
+    )
+    ok, issues = validate_grouping(
+        grouping, ac_map=ac_map, max_ac_per_group=3, target_groups_min=1, target_groups_max=2, max_groups=2, min_group_size=1
+    )
+    assert ok, issues
+    assert len(grouping["groups"]) == 2
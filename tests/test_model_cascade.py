@@ -0,0 +1,39 @@
+import pytest
+
+from src.task_planning.model_cascade import ModelCascade, parse_routes
+
+
+def test_parse_routes_and_default_tiers():
+    routes = parse_routes("cluster=nano > mini; *=mini\ntaskgen=")
+    assert routes == {"cluster": ("nano", "mini"), "*": ("mini",)}
+
+    c = ModelCascade(routes, default_model="base")
+    assert c.tiers("cluster") == ("nano", "mini")
+    assert c.tiers("describe") == ("mini",)
+    assert ModelCascade({}, default_model="base").tiers("cluster") == ("base",)
+    assert c.route_key("cluster") == "nano>mini"
+
+
+def test_run_escalates_on_invalid_or_error_and_tracks_success_rate():
+    c = ModelCascade({"taskgen": ["nano", "mini"]}, default_model="mini")
+
+    # nano が不合格 → mini で作り直す
+    assert c.run("taskgen", lambda m: m, valid=lambda r: r == "mini") == "mini"
+    # nano が合格ならそこで終わり
+    assert c.run("taskgen", lambda m: m) == "nano"
+
+    def boom(m):
+        if m == "nano":
+            raise ValueError("unparseable")
+        return m
+
+    assert c.run("taskgen", boom) == "mini"
+
+    st = c.stats()["taskgen"]
+    assert st["tiers"] == ["nano", "mini"] and st["escalations"] == 2
+    assert st["models"]["nano"] == {"attempts": 3, "ok": 1, "success_rate": 0.3333}
+    assert st["models"]["mini"]["success_rate"] == 1.0
+
+    # 最上位の失敗はそのまま呼び出し元へ
+    with pytest.raises(ValueError):
+        c.run("taskgen", lambda m: (_ for _ in ()).throw(ValueError(m)))
@@ -0,0 +1,60 @@
+import json
+import sys
+
+from src.task_planning import run
+from src.task_planning.grouped_taskgen.packer import group_prompt_tokens, pack_small_groups
+
+AC_MAP = {f"AC-{i:03d}": f"criterion number {i}" for i in range(1, 31)}
+
+
+def _group(gid, *nums):
+    return {"group_id": gid, "ac_ids": [f"AC-{n:03d}" for n in nums], "label": gid}
+
+
+def test_pack_respects_token_budget_and_keeps_large_groups_alone():
+    groups = [_group("G01", 1, 2), _group("G02", 3, 4), _group("G03", 5, 6, 7, 8, 9), _group("G04", 10, 11)]
+    tok = group_prompt_tokens(groups[0], AC_MAP)
+    # 2グループ分ちょうどの予算 → 3つ目の小グループは次のパックへ。5 AC のグループは常に単独（即座に出る）
+    assert pack_small_groups(groups, AC_MAP, max_group_acs=4, token_budget=2 * tok) == [[2], [0, 1], [3]]
+    units = pack_small_groups(groups, AC_MAP, max_group_acs=4, token_budget=tok - 1)
+    assert sorted(units) == [[0], [1], [2], [3]]
+
+
+def test_pack_caps_groups_per_pack_at_four_by_default():
+    groups = [_group(f"G{i:02d}", i) for i in range(1, 7)]
+    assert pack_small_groups(groups, AC_MAP, token_budget=10**6) == [[0, 1, 2, 3], [4, 5]]
+
+
+def test_failed_pack_call_falls_back_to_per_group_taskgen(tmp_path, monkeypatch):
+    groups = [_group("G01", 1, 2, 3), _group("G02", 4, 5, 6), _group("G03", 7, 8, 9)]
+    ac_map = {a: t for a, t in AC_MAP.items() if int(a[3:]) <= 9}
+    story = {"domain": "d", "persona": "p", "action": "a", "reason": "r", "acceptance_criteria": list(ac_map.values())}
+    in_path, out_path = tmp_path / "in.json", tmp_path / "out.json"
+    in_path.write_text(json.dumps(story), encoding="utf-8")
+
+    packed, single = [], []
+
+    def _pack(**kw):
+        packed.append([g["group_id"] for g in kw["groups"]])
+        raise RuntimeError("pack output could not be split")
+
+    def _one(**kw):
+        g = kw["group"]
+        single.append(g["group_id"])
+        tasks = [{"title": f"do {a}", "ac_ids": [a], "estimate_hours": 2} for a in g["ac_ids"]]
+        return {"group_id": g["group_id"], "ac_ids": g["ac_ids"], "tasks": tasks, "meta": {}}
+
+    monkeypatch.setattr(run, "cluster_acs", lambda **kw: {"groups": groups, "meta": {}})
+    monkeypatch.setattr(run, "generate_tasks_for_group_pack", _pack)
+    monkeypatch.setattr(run, "generate_tasks_for_group", _one)
+    monkeypatch.setattr(
+        sys, "argv", ["run", "-i", str(in_path), "-o", str(out_path), "--pack-small-groups", "--workers", "1"]
+    )
+    run.main()
+
+    out = json.loads(out_path.read_text(encoding="utf-8"))
+    # 3グループは1パックで投げられ、失敗したらグループごとに単独 taskgen
+    assert packed == [["G01", "G02", "G03"]]
+    assert sorted(single) == ["G01", "G02", "G03"]
+    assert [len(gr["tasks"]) for gr in out["group_results"]] == [3, 3, 3]
+    assert out["trace"]["missing_ac_ids"] == []
@@ -0,0 +1,26 @@
+from src.task_planning.grouping.policy import CostModel, clamp_grouping_policy, tune_grouping_policy
+
+REQ = dict(max_ac_per_group=10, target_groups_min=8, target_groups_max=12, max_groups=15, min_group_size=3)
+
+
+def test_fixed_mode_only_clamps_to_feasible_range():
+    policy, why = tune_grouping_policy(12, mode="fixed", workers=8, **REQ)
+    assert policy == clamp_grouping_policy(12, **REQ)
+    assert policy["max_groups"] == 4 and policy["target_groups_min"] == 2
+    assert why == {"mode": "fixed"}
+
+
+def test_throughput_mode_fits_output_budget_and_beats_fixed():
+    policy, why = tune_grouping_policy(48, mode="throughput", workers=4, max_repairs=1, cost_model=CostModel(), **REQ)
+    k = why["chosen_groups"]
+
+    # 1群 5 AC まで（5 × 330 tokens <= 1800）に収まる群数だけが候補
+    assert why["size_limit_by_output"] == 5
+    assert policy["max_ac_per_group"] <= 5 and policy["target_groups_min"] * policy["max_ac_per_group"] >= 48
+    assert policy["target_groups_min"] <= k <= policy["target_groups_max"] <= policy["max_groups"]
+    assert why["expected_makespan_s"] <= min(c["makespan_s"] for c in why["candidates"]) * 1.01
+    assert why["expected_makespan_s"] < why["fixed_expected_makespan_s"]
+
+    # ワーカーが増えれば同じか多い群数を選ぶ
+    _p, why8 = tune_grouping_policy(48, mode="throughput", workers=8, max_repairs=1, **REQ)
+    assert why8["chosen_groups"] >= k and why8["expected_makespan_s"] < why["expected_makespan_s"]
@@ -0,0 +1,93 @@
+import json
+
+from fastapi.testclient import TestClient
+
+import src.main as main
+
+STORY = {
+    "domain": "auth",
+    "persona": "employee",
+    "action": "log in",
+    "reason": "security",
+    "acceptance_criteria": ["Users log in with email and password."],
+}
+
+
+class _Logger:
+    saved = 0
+
+    def set_cache_stats(self, stats):
+        pass
+
+    def save(self):
+        _Logger.saved += 1
+
+
+class _Graph:
+    def __init__(self, updates, error=None):
+        self.updates = updates
+        self.error = error
+
+    def stream(self, state, stream_mode):
+        assert stream_mode == "updates"
+        yield from self.updates
+        if self.error is not None:
+            raise self.error
+
+
+def _events(text):
+    out = []
+    for block in text.strip().split("\n\n"):
+        event, data = block.split("\n", 1)
+        out.append((event[len("event: ") :], json.loads(data[len("data: ") :])))
+    return out
+
+
+def _stub(monkeypatch, tmp_path, graph):
+    _Logger.saved = 0
+
+    def _new_run(payload):
+        state = {"us_ac": main.to_nested_usac(payload), "score": None, "issues": None, "iteration": 0}
+        return _Logger(), state, graph, str(tmp_path / "out_refined.json")
+
+    monkeypatch.setattr(main, "_new_refine_run", _new_run)
+
+
+def test_refine_stream_sends_node_updates_in_order(monkeypatch, tmp_path):
+    refined = main.to_nested_usac(main.FlatUSAC(**{**STORY, "acceptance_criteria": ["Login uses bcrypt hashes."]}))
+    graph = _Graph(
+        [
+            {"classifier": {"score": 60, "persona_scores": [{"persona": "qa", "score": 60}]}},
+            {"issue_detection": {"issues": ["too vague"]}},
+            {"suggestion": {"us_ac": refined, "iteration": 1}},
+            {"classifier": {"score": 90}},
+        ]
+    )
+    _stub(monkeypatch, tmp_path, graph)
+
+    r = TestClient(main.app).post("/refine/stream", json=STORY)
+    assert r.status_code == 200 and r.headers["content-type"].startswith("text/event-stream")
+    events = _events(r.text)
+
+    assert [e for e, _ in events] == ["start", "score", "issues", "refined", "score", "done"]
+    assert events[1][1] == {"iteration": 0, "score": 60, "persona_scores": [{"persona": "qa", "score": 60}]}
+    assert events[2][1] == {"iteration": 0, "issues": ["too vague"]}
+    # refined は同じラウンド（iteration 0）の score / issues に揃える
+    assert events[3][1]["iteration"] == 0
+    assert events[3][1]["us_ac"]["acceptance_criteria"] == ["Login uses bcrypt hashes."]
+    assert events[5][1]["score"] == 90 and events[5][1]["iterations"] == 1
+    assert json.loads((tmp_path / "out_refined.json").read_text(encoding="utf-8")) == events[5][1]["us_ac"]
+    assert _Logger.saved == 1
+
+
+def test_refine_stream_reports_graph_failure_as_error_event(monkeypatch, tmp_path):
+    graph = _Graph([{"classifier": {"score": 40}}], error=RuntimeError("llm down"))
+    _stub(monkeypatch, tmp_path, graph)
+
+    r = TestClient(main.app).post("/refine/stream", json=STORY)
+    events = _events(r.text)
+
+    assert [e for e, _ in events] == ["start", "score", "error"]
+    assert events[-1][1] == {"detail": "refine failed: llm down"}
+    assert not (tmp_path / "out_refined.json").exists()
+    assert _Logger.saved == 1
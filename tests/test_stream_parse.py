@@ -0,0 +1,41 @@
+import json
+
+from src.task_planning.grouping.stream_parse import GroupStreamParser, check_streamed_group
+
+
+def test_parser_yields_groups_as_they_close():
+    obj = {
+        "groups": [
+            {"group_id": "G1", "label": "brace } in \"label\" {", "ac_ids": ["AC-001", "AC-002"]},
+            {"group_id": "G2", "label": "pay", "ac_ids": ["AC-003"]},
+        ],
+        "meta": {"notes": [{"group_id": "X"}]},
+    }
+    text = json.dumps(obj)
+    p = GroupStreamParser()
+    seen = []
+    for i in range(0, len(text), 7):
+        for g in p.feed(text[i : i + 7]):
+            seen.append((g["group_id"], i + 7 >= len(text)))
+
+    # meta 内のオブジェクトは拾わない / 最後のチャンクより前に G1, G2 が出ている
+    assert seen == [("G1", False), ("G2", False)]
+    assert p.result() == obj
+
+
+def test_check_streamed_group_rejects_hard_violations():
+    ac_map = {f"AC-{i:03d}": "x" for i in range(1, 7)}
+    kinds = {"AC-005": "audit", "AC-006": "security"}
+    claimed, seen = set(), set()
+    kw = dict(ac_map=ac_map, log_kinds=kinds, claimed=claimed, seen_ids=seen, max_ac_per_group=3, min_group_size=2)
+
+    g = check_streamed_group({"group_id": "G1", "label": "a", "ac_ids": ["AC-001", "AC-002"]}, **kw)
+    assert g is not None and claimed == {"AC-001", "AC-002"}
+
+    assert check_streamed_group({"group_id": "G1", "ac_ids": ["AC-003", "AC-004"]}, **kw) is None  # id 重複
+    assert check_streamed_group({"group_id": "G2", "ac_ids": ["AC-002", "AC-003"]}, **kw) is None  # 既出 AC
+    assert check_streamed_group({"group_id": "G2", "ac_ids": ["AC-099", "AC-003"]}, **kw) is None  # 未知 AC
+    assert check_streamed_group({"group_id": "G2", "ac_ids": ["AC-003"]}, **kw) is None  # min_group_size 未満
+    assert check_streamed_group({"group_id": "G2", "ac_ids": ["AC-003", "AC-004", "AC-005", "AC-006"]}, **kw) is None
+    assert check_streamed_group({"group_id": "G2", "ac_ids": ["AC-005", "AC-006"]}, **kw) is None  # audit+security
+    assert claimed == {"AC-001", "AC-002"} and seen == {"G1"}
@@ -0,0 +1,66 @@
+from src.task_planning.grouped_taskgen.task_dedup import dedup_tasks_across_groups
+
+
+def _task(title, ac_ids, subcategory="Backend", priority="medium", hours=2):
+    return {
+        "title": title,
+        "subcategory": subcategory,
+        "priority": priority,
+        "estimate_hours": hours,
+        "ac_ids": ac_ids,
+        "description": f"Goal: {title}\nChanges: add the handler and its unit tests\nAcceptance checks: covered ACs pass",
+    }
+
+
+def test_merges_duplicate_tasks_across_groups_and_unions_ac_ids():
+    group_results = [
+        {"group_id": "G01", "tasks": [_task("Implement login API endpoint", ["AC-001"])]},
+        {
+            "group_id": "G02",
+            "tasks": [
+                _task("Implement login API endpoints", ["AC-004"], priority="high", hours=3),
+                _task("Implement logout API endpoint", ["AC-005"]),
+            ],
+        },
+        {"group_id": "G03", "tasks": [_task("Export reports as CSV", ["AC-007"])]},
+        {"group_id": "G04", "tasks": [_task("Export reports as PDF", ["AC-008"])]},
+    ]
+    meta = dedup_tasks_across_groups(group_results)
+
+    assert meta["tasks_before"] == 5 and meta["tasks_after"] == 4
+    kept = group_results[0]["tasks"][0]
+    assert kept["ac_ids"] == ["AC-001", "AC-004"]
+    assert kept["priority"] == "high" and kept["estimate_hours"] == 3
+    assert kept["merged_from"] == [{"group_id": "G02", "title": "Implement login API endpoints"}]
+    assert [t["title"] for t in group_results[1]["tasks"]] == ["Implement logout API endpoint"]
+    assert len(group_results[2]["tasks"]) == 1 and len(group_results[3]["tasks"]) == 1
+
+
+def test_merge_respects_max_ac_per_task_and_never_empties_a_group():
+    group_results = [
+        {"group_id": f"G0{n}", "tasks": [_task("Add bcrypt password hashing", [f"AC-{n}1", f"AC-{n}2"])]}
+        for n in (1, 2, 3)
+    ]
+    group_results[2]["tasks"].append(_task("Add login audit log", ["AC-033"]))
+
+    meta = dedup_tasks_across_groups(group_results, max_ac_per_task=4)
+
+    # G02 は唯一のタスクなので残す。G03 は別タスクが残るので統合できる（4 AC まで）
+    assert meta["tasks_merged"] == 1 and meta["merges_skipped"] == 1
+    assert group_results[0]["tasks"][0]["ac_ids"] == ["AC-11", "AC-12", "AC-31", "AC-32"]
+    assert all(gr["tasks"] for gr in group_results)
+
+    # 上限を超える統合はしない
+    group_results = [
+        {
+            "group_id": f"G0{n}",
+            "tasks": [
+                _task("Add bcrypt password hashing", [f"AC-{n}1", f"AC-{n}2"]),
+                _task(f"Other {n}", [f"AC-{n}9"], subcategory=f"S{n}"),
+            ],
+        }
+        for n in (1, 2)
+    ]
+    meta = dedup_tasks_across_groups(group_results, max_ac_per_task=2)
+    assert meta["tasks_merged"] == 0 and meta["merges"] == []
+    assert "merged_from" not in group_results[0]["tasks"][0]
@@ -0,0 +1,65 @@
+from src.task_planning.grouped_taskgen.task_fixer import local_fix_tasks
+from src.task_planning.validate import COVERAGE_MISSING, UNKNOWN_AC, validate_group_tasks
+
+
+def _task(title, ac_ids):
+    return {
+        "title": title,
+        "category": "Task",
+        "subcategory": "[Code][BE]",
+        "status": "Todo",
+        "priority": "Medium",
+        "estimate_hours": 2,
+        "related_task_titles": [],
+        "description": "Goal: x\nChanges: y\nAcceptance checks: z",
+        "ac_ids": ac_ids,
+    }
+
+
+def test_validator_returns_issue_codes():
+    tasks_obj = {"tasks": [_task("A", ["AC-001", "AC-999"])]}
+    ok, issues = validate_group_tasks(
+        tasks_obj, max_tasks=4, group_ac_ids=["AC-001", "AC-002"], max_ac_per_task=2
+    )
+    assert not ok
+    assert {x.code for x in issues} == {UNKNOWN_AC, COVERAGE_MISSING}
+    cov = next(x for x in issues if x.code == COVERAGE_MISSING)
+    assert cov.detail == ("AC-002",)
+
+
+def test_local_fixer_repairs_ac_ids_without_llm():
+    group = ["AC-001", "AC-002", "AC-003"]
+    tasks_obj = {
+        "tasks": [
+            _task("A", ["AC-001", "AC-001", "AC-999"]),
+            _task("B", ["AC-002", "AC-003"]),
+            _task("C", ["AC-998"]),
+        ]
+    }
+    tasks_obj["tasks"][1]["estimate_hours"] = 9
+    kw = dict(max_tasks=6, group_ac_ids=group, max_ac_per_task=2)
+    ok, issues = validate_group_tasks(tasks_obj, **kw)
+    assert not ok
+
+    fixed, fixes = local_fix_tasks(tasks_obj, issues, group_ac_ids=group, max_ac_per_task=2)
+    assert fixes
+    ok2, issues2 = validate_group_tasks(fixed, **kw)
+    assert ok2, issues2
+    # 未知 AC 用に作られたタスク C は消す（他の AC を載せ替えない）
+    assert [(t["title"], t["ac_ids"]) for t in fixed["tasks"]] == [("A", ["AC-001"]), ("B", ["AC-002", "AC-003"])]
+    assert fixed["tasks"][1]["estimate_hours"] == 4
+    # 元の tasks_obj は変更しない
+    assert tasks_obj["tasks"][2]["ac_ids"] == ["AC-998"]
+
+
+def test_local_fixer_leaves_missing_coverage_to_repair():
+    group = ["AC-001", "AC-002", "AC-003"]
+    # AC-003 は上限で切り離すと誰も担わない / B は AC-999 用のタスク → 割り当てずに repair へ
+    tasks_obj = {"tasks": [_task("A", ["AC-001", "AC-002", "AC-003"]), _task("B", ["AC-999"])]}
+    kw = dict(max_tasks=6, group_ac_ids=group, max_ac_per_task=2)
+    _ok, issues = validate_group_tasks(tasks_obj, **kw)
+    assert local_fix_tasks(tasks_obj, issues, group_ac_ids=group, max_ac_per_task=2) == (tasks_obj, [])
+
+    _ok, issues = validate_group_tasks({"tasks": [_task("A", ["AC-001"])]}, **kw)
+    assert COVERAGE_MISSING in {x.code for x in issues}
+    assert local_fix_tasks({"tasks": [_task("A", ["AC-001"])]}, issues, group_ac_ids=group, max_ac_per_task=2)[1] == []
@@ -0,0 +1,46 @@
+import json
+
+from src.task_planning.grouped_taskgen.template_store import TemplateStore, reuse_group_tasks
+
+
+def _result(ac_ids):
+    return {
+        "validate": {"pass": True},
+        "tasks": [
+            {
+                "title": f"Implement {a}",
+                "category": "Task",
+                "subcategory": "[Code][BE]",
+                "status": "Todo",
+                "priority": "Medium",
+                "estimate_hours": 2,
+                "related_task_titles": [],
+                "description": "Goal: x\nChanges: y\nAcceptance checks: z",
+                "ac_ids": [a],
+            }
+            for a in ac_ids
+        ],
+    }
+
+
+def test_store_reuses_tasks_across_stories_and_evicts(tmp_path):
+    path = str(tmp_path / "store.json")
+    s1 = TemplateStore(path, max_entries=2)
+    s1.record_group(_result(["AC-001", "AC-002"]), {"AC-001": "Passwords must be hashed with bcrypt.", "AC-002": "Lockout after 5 failed attempts."})
+    s1.save()
+
+    s2 = TemplateStore(path, max_entries=2)
+    ac_map = {"AC-010": "Password is hashed using bcrypt", "AC-011": "Reports can be exported as PDF."}
+    group = {"group_id": "G01", "ac_ids": ["AC-010", "AC-011"]}
+    tasks, novel, hits = reuse_group_tasks(s2, group, ac_map, max_tasks=4, max_ac_per_task=2)
+    assert novel == ["AC-011"]
+    assert [t["ac_ids"] for t in tasks] == [["AC-010"]]
+    assert s2.meta()["near_hits"] == 0  # 再利用が採用されるまではヒットに数えない
+    s2.accept_hits(hits)
+    assert s2.meta()["near_hits"] == 1
+
+    s2.record_group(_result(["AC-011"]), ac_map)
+    s2.save()
+    entries = json.load(open(path, encoding="utf-8"))["entries"]
+    assert len(entries) == 2  # 一番使われていない lockout が退避される
+    assert all("lockout" not in e["norm"] for e in entries.values())
@@ -0,0 +1,57 @@
+from src.task_planning.trace_index import BM25Index, tokenize
+from src.task_planning.traceability import enforce_ac_traceability
+
+
+def test_tokenize_handles_cjk_and_vietnamese():
+    assert "ログ" in tokenize("監査ログを保存する")
+    assert "đăng" in tokenize("Người dùng phải đăng nhập")
+    assert "password" in tokenize("Password must be hashed")
+
+
+def test_attach_picks_best_task_and_reports_scores():
+    ac_map = {
+        "AC-001": "Passwords are hashed with bcrypt.",
+        "AC-002": "監査ログは改ざんできないこと",
+        "AC-003": "Người dùng có thể xóa task do mình tạo",
+        "AC-004": "Lockout after 5 failed attempts.",
+    }
+    grouping = {"groups": [{"group_id": "G01", "ac_ids": list(ac_map)}]}
+    group_results = [
+        {
+            "group_id": "G01",
+            "tasks": [
+                {"title": "Add lockout counter", "description": "failed attempts", "ac_ids": ["AC-004"]},
+                {"title": "Hash passwords with bcrypt", "description": "", "ac_ids": []},
+                {"title": "監査ログの改ざん防止", "description": "", "ac_ids": []},
+                {"title": "API xóa task", "description": "Người dùng xóa task", "ac_ids": []},
+            ],
+        }
+    ]
+
+    trace = enforce_ac_traceability(ac_map=ac_map, grouping=grouping, group_results=group_results)
+
+    tasks = group_results[0]["tasks"]
+    assert tasks[1]["ac_ids"] == ["AC-001"]
+    assert tasks[2]["ac_ids"] == ["AC-002"]
+    assert tasks[3]["ac_ids"] == ["AC-003"]
+    assert trace["changed"] is True
+    assert {x["ac_id"] for x in trace["attachments"]} == {"AC-001", "AC-002", "AC-003"}
+    assert trace["weak_ac_ids"] == []
+
+
+def test_bm25_best_falls_back_to_first_doc_in_range():
+    index = BM25Index(["alpha beta", "gamma delta", "epsilon"])
+    assert index.best("zeta", doc_range=(1, 3)) == (1, 0.0)
+    assert index.best("delta")[0] == 1
+
+
+def test_bm25_doc_range_scores_like_an_index_of_that_group():
+    docs = ["login form error", "login button", "session timeout", "login session token", "password reset mail"]
+    index = BM25Index(docs)
+    group = BM25Index(docs[2:5])
+    # 範囲内だけで IDF / 平均文書長を計算する（doc_id はずらして比較）
+    for q in ["login session", "password", "missing"]:
+        got = index.scores(q, doc_range=(2, 5))
+        want = {d + 2: s for d, s in group.scores(q).items()}
+        assert got.keys() == want.keys()
+        assert all(abs(got[d] - want[d]) < 1e-9 for d in got)